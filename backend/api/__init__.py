@@ -3,4 +3,4 @@ from flask import Blueprint
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
 from . import auth, posts, users, boards   # noqa: F401, E402
-from . import comments, reactions          # noqa: F401, E402
\ No newline at end of file
+from . import comments, reactions, events  # noqa: F401, E402
\ No newline at end of file
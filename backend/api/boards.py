@@ -5,23 +5,25 @@ api/boards.py — CRUD досок.
   POST   /api/boards/              — создать доску (JWT)
   GET    /api/boards/<id>          — получить одну доску (публично)
   GET    /api/boards/me            — мои доски (JWT)
+  GET    /api/boards/<id>/similar  — похожие публичные доски
   GET    /api/users/<id>/boards    — публичные доски пользователя
   PUT    /api/boards/<id>          — обновить доску (JWT, только владелец)
   DELETE /api/boards/<id>          — удалить доску (JWT, только владелец)
 """
 from typing import Optional
 
-from flask import request, jsonify, g
-from flask_jwt_extended import (
-    verify_jwt_in_request, get_jwt_identity, jwt_required,
-)
+from flask import request, jsonify
+from flask_jwt_extended import get_jwt_identity, jwt_required
 from pydantic import BaseModel, field_validator, ValidationError
 
 from . import api_bp
 from models import db, Board, Post, User
 from utils import get_avatar_url
+from services.feed_cache import invalidate_user_feed
+from services.identity import current_viewer, get_user, prime_users
 from services.recommendation_engine import (
-    rank_boards_personalized, rank_boards_trending, on_board_changed
+    rank_boards_personalized, rank_boards_trending, on_board_changed, on_board_removed,
+    similar_board_ids,
 )
 
 
@@ -29,14 +31,7 @@ from services.recommendation_engine import (
 
 def _get_current_user() -> Optional[User]:
     """JWT или сессия — оба работают."""
-    try:
-        verify_jwt_in_request(optional=True)
-        identity = get_jwt_identity()
-        if identity:
-            return db.session.get(User, int(identity))
-    except Exception:
-        pass
-    return g.current_user
+    return current_viewer()
 
 
 def _pydantic_errors(e: ValidationError) -> list[dict]:
@@ -51,6 +46,7 @@ def board_to_dict(board: Board, current_user: Optional[User] = None) -> dict:
         current_user.is_following_board(board)
         if current_user else False
     )
+    creator = get_user(board.creator_id)
     return {
         'id':           str(board.id),
         'name':         board.name,
@@ -65,8 +61,8 @@ def board_to_dict(board: Board, current_user: Optional[User] = None) -> dict:
         'createdAt':    board.created_at.isoformat() if board.created_at else None,
         'creator': {
             'id':       str(board.creator_id),
-            'username': f'@{board.creator.username}',
-            'avatar':   get_avatar_url(board.creator),
+            'username': f'@{creator.username}',
+            'avatar':   get_avatar_url(creator),
         },
     }
 
@@ -160,6 +156,10 @@ def create_board():
         ).update({'board_id': board.id}, synchronize_session=False)
 
     db.session.commit()
+    try:
+        on_board_changed(board)
+    except Exception:
+        pass
     return jsonify(board_to_dict(board, current_user)), 201
 
 @api_bp.route('/boards/<int:board_id>/posts', methods=['POST'])
@@ -214,6 +214,7 @@ def my_boards():
     boards  = Board.query.filter_by(creator_id=user_id)\
                          .order_by(Board.created_at.desc()).all()
     current_user = db.session.get(User, user_id)
+    prime_users(b.creator_id for b in boards)
     return jsonify([board_to_dict(b, current_user) for b in boards]), 200
 
 
@@ -227,6 +228,31 @@ def get_board(board_id: int):
     return jsonify(board_to_dict(board, current_user)), 200
 
 
+@api_bp.route('/boards/<int:board_id>/similar', methods=['GET'])
+def get_similar_boards(board_id: int):
+    """
+    GET /api/boards/<id>/similar?limit=6
+    Похожие публичные доски. Свои доски зрителя не показываются.
+    """
+    limit = max(1, min(request.args.get('limit', 6, type=int), 50))
+
+    board        = db.session.get(Board, board_id)
+    current_user = _get_current_user()
+    viewer_id    = current_user.id if current_user else None
+    if not board or (not board.is_public and board.creator_id != viewer_id):
+        return jsonify({'error': 'Доска не найдена'}), 404
+
+    ids    = similar_board_ids(board)
+    by_id  = {b.id: b for b in Board.query.filter(Board.id.in_(ids)).all()} if ids else {}
+    result = [
+        by_id[bid] for bid in ids
+        if bid in by_id and by_id[bid].is_public and by_id[bid].creator_id != viewer_id
+    ][:limit]
+
+    prime_users(b.creator_id for b in result)
+    return jsonify({'boards': [board_to_dict(b, current_user) for b in result]}), 200
+
+
 @api_bp.route('/boards/<int:board_id>', methods=['PUT'])
 @jwt_required()
 def update_board(board_id: int):
@@ -273,6 +299,13 @@ def update_board(board_id: int):
             ).update({'board_id': board.id}, synchronize_session=False)
 
     db.session.commit()
+    try:
+        if board.is_public:
+            on_board_changed(board)
+        else:
+            on_board_removed(board.id)
+    except Exception:
+        pass
     current_user = db.session.get(User, user_id)
     return jsonify(board_to_dict(board, current_user)), 200
 
@@ -299,6 +332,10 @@ def delete_board(board_id: int):
 
     db.session.delete(board)
     db.session.commit()
+    try:
+        on_board_removed(board_id)
+    except Exception:
+        pass
     return jsonify({'ok': True, 'unlinked_posts': post_count}), 200
 
 
@@ -321,6 +358,7 @@ def get_user_boards_by_id(user_id: int):
         boards = Board.query.filter_by(creator_id=user_id, is_public=True)\
                             .order_by(Board.created_at.desc()).all()
 
+    prime_users(b.creator_id for b in boards)
     return jsonify({'boards': [board_to_dict(b, current_user) for b in boards]}), 200
 
 
@@ -342,6 +380,7 @@ def get_user_boards_by_username(username: str):
         boards = Board.query.filter_by(creator_id=user.id, is_public=True)\
                             .order_by(Board.created_at.desc()).all()
 
+    prime_users(b.creator_id for b in boards)
     return jsonify({'boards': [board_to_dict(b, current_user) for b in boards]}), 200
 
 
@@ -357,6 +396,7 @@ def follow_board(board_id: int):
         return jsonify({'error': 'Доска не найдена'}), 404
     current_user.follow_board(board)
     db.session.commit()
+    invalidate_user_feed(current_user.id)
     try:
         on_board_changed()
     except Exception:
@@ -374,6 +414,7 @@ def unfollow_board(board_id: int):
         return jsonify({'error': 'Доска не найдена'}), 404
     current_user.unfollow_board(board)
     db.session.commit()
+    invalidate_user_feed(current_user.id)
     try:
         on_board_changed()
     except Exception:
@@ -389,6 +430,7 @@ def get_board_posts(board_id: int):
     if not board:
         return jsonify({'error': 'Доска не найдена'}), 404
     posts = board.posts.order_by(Post.created_at.desc()).all()
+    prime_users(p.user_id for p in posts)
     from .posts import post_to_dict
     return jsonify({'posts': [post_to_dict(p) for p in posts]}), 200
 
@@ -423,6 +465,7 @@ def get_boards():
         ranked = sorted(pool, key=lambda b: b.followers_count, reverse=True)
 
     page_boards = ranked[:limit]
+    prime_users(b.creator_id for b in page_boards)
     return jsonify({'boards': [board_to_dict(b, current_user) for b in page_boards]}), 200
 
 
@@ -443,6 +486,7 @@ def get_recommended_boards():
 
     ranked = rank_boards_personalized(pool, current_user)
     # page_boards = ranked[:limit]  # ← ЗАКОММЕНТИРОВАТЬ
+    prime_users(b.creator_id for b in ranked)
     return jsonify({'boards': [board_to_dict(b, current_user) for b in ranked]}), 200
 
 
@@ -462,6 +506,7 @@ def get_trending_boards():
     ranked = rank_boards_trending(pool)
     current_user = _get_current_user()
     page_boards = ranked[:limit]
+    prime_users(b.creator_id for b in page_boards)
     return jsonify({'boards': [board_to_dict(b, current_user) for b in page_boards]}), 200
 
 @api_bp.route('/boards/subscribed', methods=['GET'])
@@ -483,4 +528,5 @@ def get_subscribed_boards():
         Board.updated_at.desc()
     ).all()  # ← убрали .limit()
     
+    prime_users(b.creator_id for b in subscribed_boards)
     return jsonify({'boards': [board_to_dict(b, current_user) for b in subscribed_boards]}), 200
\ No newline at end of file
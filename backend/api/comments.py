@@ -10,14 +10,13 @@ DELETE /api/comments/<comment_id>      — удалить (только авто
 """
 from __future__ import annotations
 
-from typing import Optional
-
 from flask import request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from pydantic import BaseModel, field_validator, ValidationError
 
 from . import api_bp
 from services.comment_service import CommentService, comment_to_dict
+from services.identity import current_viewer_id
 
 
 # ── Pydantic-схемы ────────────────────────────────────────────────────────────
@@ -94,15 +93,7 @@ def list_comments(post_id: int):
     per_page = min(request.args.get('per_page', 20, type=int), 100)
 
     # Определяем viewer_id опционально (через JWT, если передан)
-    viewer_id: Optional[int] = None
-    try:
-        from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
-        verify_jwt_in_request(optional=True)
-        identity = get_jwt_identity()
-        if identity:
-            viewer_id = int(identity)
-    except Exception:
-        pass
+    viewer_id = current_viewer_id()
 
     try:
         items, meta = CommentService.list_for_post(post_id, page, per_page, viewer_id)
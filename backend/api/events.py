@@ -0,0 +1,127 @@
+"""
+api/events.py
+─────────────
+Приём событий вовлечённости пачками.
+
+POST /api/events/batch  — показы / клики / время просмотра (JWT, сессия или гость)
+
+Запись асинхронная (services/event_buffer.py): ответ 202 означает «принято
+в буфер», а не «записано в БД».
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+from flask import jsonify, request
+from pydantic import BaseModel, ValidationError, field_validator, model_validator
+
+from . import api_bp
+from models import EventTypeEnum
+from services.event_buffer import EVENTS_MAX_BATCH, event_buffer
+from services.identity import current_viewer_id
+
+
+# ── Pydantic-схемы ────────────────────────────────────────────────────────────
+
+_VALID_TYPES = {t.value for t in EventTypeEnum}
+
+EVENT_MAX_AGE    = timedelta(days=1)   # ts клиента старше — время приёма
+DWELL_MAX_MS     = 6 * 60 * 60 * 1000
+
+
+class EventSchema(BaseModel):
+    type: str
+    postId: int
+    dwellMs: Optional[int] = None
+    ts: Optional[int] = None           # мс с эпохи Unix, время клиента
+
+    @field_validator('type')
+    @classmethod
+    def type_valid(cls, v: str) -> str:
+        if v not in _VALID_TYPES:
+            valid = ', '.join(sorted(_VALID_TYPES))
+            raise ValueError(f'Неверный тип события «{v}». Допустимые значения: {valid}')
+        return v
+
+    @field_validator('postId')
+    @classmethod
+    def post_id_valid(cls, v: int) -> int:
+        if v <= 0 or v >= 2 ** 32:
+            raise ValueError('Неверный id поста')
+        return v
+
+    @model_validator(mode='after')
+    def dwell_valid(self) -> 'EventSchema':
+        if self.type == EventTypeEnum.dwell.value:
+            if self.dwellMs is None or not 0 < self.dwellMs <= DWELL_MAX_MS:
+                raise ValueError('Для dwell нужен dwellMs > 0')
+        else:
+            self.dwellMs = None
+        return self
+
+
+class EventBatchSchema(BaseModel):
+    events: list[EventSchema]
+
+    @field_validator('events')
+    @classmethod
+    def events_valid(cls, v: list[EventSchema]) -> list[EventSchema]:
+        if not v:
+            raise ValueError('events не может быть пустым')
+        if len(v) > EVENTS_MAX_BATCH:
+            raise ValueError(f'Максимум {EVENTS_MAX_BATCH} событий за запрос')
+        return v
+
+
+# ── Вспомогательные функции ───────────────────────────────────────────────────
+
+def _pydantic_errors(e: ValidationError) -> list[dict]:
+    return [
+        {'field': '.'.join(str(loc) for loc in err['loc']), 'message': str(err['msg'])}
+        for err in e.errors()
+    ]
+
+
+def _occurred_at(ts: Optional[int], received_at: datetime) -> datetime:
+    """Время клиента, ограниченное [received_at − EVENT_MAX_AGE, received_at]."""
+    if ts is None:
+        return received_at
+    try:
+        at = datetime.utcfromtimestamp(ts / 1000.0)
+    except (OverflowError, OSError, ValueError):
+        return received_at
+    return min(max(at, received_at - EVENT_MAX_AGE), received_at)
+
+
+# ── Эндпоинты ─────────────────────────────────────────────────────────────────
+
+@api_bp.route('/events/batch', methods=['POST'])
+def events_batch():
+    """
+    POST /api/events/batch
+    Body: { "events": [ {"type": "impression", "postId": 1},
+                        {"type": "dwell", "postId": 1, "dwellMs": 4200, "ts": 1760000000000} ] }
+
+    Пачка валидируется целиком: одно неверное событие — 422 на весь запрос.
+    """
+    try:
+        body = EventBatchSchema.model_validate(request.get_json(force=True) or {})
+    except ValidationError as e:
+        errs = _pydantic_errors(e)
+        return jsonify({'error': errs[0]['message'], 'errors': errs}), 422
+
+    user_id = current_viewer_id()
+    received_at = datetime.utcnow()
+    event_buffer.append([
+        {
+            'event_type':  EventTypeEnum(ev.type),
+            'post_id':     ev.postId,
+            'user_id':     user_id,
+            'dwell_ms':    ev.dwellMs,
+            'occurred_at': _occurred_at(ev.ts, received_at),
+            'received_at': received_at,
+        }
+        for ev in body.events
+    ])
+    return jsonify({'accepted': len(body.events)}), 202
@@ -5,7 +5,10 @@ api/posts.py — роуты постов.
   POST   /api/posts/              Создать пост
   GET    /api/posts/feed          Лента (JWT или сессия, или гость)
   GET    /api/posts/me            Мои посты (JWT обязателен)
+  GET    /api/posts/trending      Трендовые посты (top-k по окну и mood)
+  POST   /api/posts/impressions   Отметить посты просмотренными (JWT или сессия)
   GET    /api/posts/<id>          Получить один пост (без авторизации)
+  GET    /api/posts/<id>/similar  Похожие посты (more-like-this)
   PUT    /api/posts/<id>          Обновить пост (JWT, только владелец)
   DELETE /api/posts/<id>          Удалить пост  (JWT, только владелец)
   POST   /api/posts/<id>/image    Загрузить/сменить изображение (JWT, только владелец)
@@ -16,11 +19,36 @@ import time
 from datetime import datetime
 from typing import Optional
 
-from flask import current_app, g, jsonify, request
-from flask_jwt_extended import get_jwt_identity, jwt_required, verify_jwt_in_request
-from models import Board, MoodEnum, Post, Tag, User, VisibilityEnum, db
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from models import Board, ImageStatusEnum, MoodEnum, Post, Tag, User, VisibilityEnum, db
 from pydantic import BaseModel, ValidationError, field_validator
-from services.recommendation_engine import on_post_created, score_and_rank
+from services.feed_cache import (
+    DEGRADED_SNAPSHOT_TTL,
+    feed_snapshots,
+    invalidate_user_feed,
+)
+from services.identity import current_viewer, get_user, prime_users
+from services.popularity import record_event
+from services.renditions import on_image_uploaded, rendition_urls
+from services.seen_filter import IMPRESSIONS_MAX_BATCH, get_seen, mark_seen
+from services.recommendation_engine import (
+    ENGINE_VERSION,
+    TIER_COLD,
+    TIER_FULL,
+    cold_snapshot,
+    is_cold_start,
+    on_post_created,
+    on_post_removed,
+    on_post_updated,
+    score_and_rank,
+    score_and_rank_tiered,
+    similar_post_ids,
+)
+from services import timeline
+from services.trending import (
+    DEFAULT_WINDOW, TRENDING_WINDOWS, on_post_mood_changed, trending_index,
+)
 from sqlalchemy import or_
 from utils import get_avatar_url
 
@@ -115,6 +143,21 @@ class UpdatePostSchema(BaseModel):
         return VisibilityEnum(self.visibility) if self.visibility else None
 
 
+class ImpressionsSchema(BaseModel):
+    postIds: list[int]
+
+    @field_validator("postIds")
+    @classmethod
+    def ids_valid(cls, v: list[int]) -> list[int]:
+        if not v:
+            raise ValueError("postIds не может быть пустым")
+        if len(v) > IMPRESSIONS_MAX_BATCH:
+            raise ValueError(f"Максимум {IMPRESSIONS_MAX_BATCH} постов за запрос")
+        if any(i <= 0 or i >= 2 ** 32 for i in v):
+            raise ValueError("Неверный id поста")
+        return v
+
+
 # ── Вспомогательные функции ───────────────────────────────────────────────────
 
 
@@ -137,49 +180,27 @@ def _resolve_tags(names: list[str]) -> list[Tag]:
     return result
 
 
-def _save_post_image(file, post_id: int) -> tuple[Optional[str], Optional[str]]:
+def _save_post_image(file, post_id: int) -> Optional[str]:
     """
-    Сохранить оригинал + превью.
-    Возвращает (relative_url, preview_relative_url) — пути относительно static/.
-    При ошибке формата возвращает (None, None).
+    Сохранить оригинал (копии считаются в фоне — services/renditions.py).
+    Возвращает relative_url — путь относительно static/.
+    При ошибке формата возвращает None.
     """
-    from PIL import Image
-
     ALLOWED = {"png", "jpg", "jpeg", "gif", "webp"}
     if "." not in (file.filename or ""):
-        return None, None
+        return None
     ext = file.filename.rsplit(".", 1)[-1].lower()
     if ext not in ALLOWED:
-        return None, None
+        return None
 
     timestamp = int(time.time())
     fname = f"post_{post_id}_{timestamp}.{ext}"
-    p_fname = f"post_{post_id}_{timestamp}_preview.{ext}"
 
     upload_dir = os.path.join(current_app.static_folder, "uploads", "posts")
     os.makedirs(upload_dir, exist_ok=True)
 
-    orig_path = os.path.join(upload_dir, fname)
-    preview_path = os.path.join(upload_dir, p_fname)
-
-    file.save(orig_path)
-
-    # Превью 400×400 без exif
-    preview_url: Optional[str] = None
-    try:
-        img = Image.open(orig_path)
-        if img.mode not in ("RGB", "RGBA"):
-            img = img.convert("RGB")
-        # Убираем exif
-        clean = Image.new(img.mode, img.size)
-        clean.putdata(list(img.getdata()))
-        clean.thumbnail((400, 400), Image.Resampling.LANCZOS)
-        clean.save(preview_path, quality=85, optimize=True)
-        preview_url = f"uploads/posts/{p_fname}"
-    except Exception as exc:
-        current_app.logger.warning(f"preview generation failed: {exc}")
-
-    return f"uploads/posts/{fname}", preview_url
+    file.save(os.path.join(upload_dir, fname))
+    return f"uploads/posts/{fname}"
 
 
 def _delete_file(relative_url: Optional[str]) -> None:
@@ -216,7 +237,7 @@ def post_to_dict(post: Post, viewer_id: Optional[int] = None) -> dict:
     viewer_id — id текущего пользователя (для is_own).
     Старые поля сохранены для совместимости с boards.py и users.py.
     """
-    author = post.user
+    author = get_user(post.user_id)
 
     # nested content object (совместимость с post-card.tsx)
     content: dict = {"type": post.post_type}
@@ -226,6 +247,15 @@ def post_to_dict(post: Post, viewer_id: Optional[int] = None) -> dict:
         content["imageUrl"] = f"{post.image_url}"
     if post.image_preview_url:
         content["imagePreviewUrl"] = f"{post.image_preview_url}"
+    if post.image_renditions:
+        # Копии по ширинам (WebP + формат оригинала) — клиент собирает srcset
+        content["srcset"] = [
+            {"url": r["url"], "width": r["width"], "height": r["height"], "type": f"image/{r['format']}"}
+            for r in post.image_renditions
+        ]
+    if post.image_status:
+        # pending — копии ещё считаются (imagePreviewUrl и srcset нет, показывать imageUrl)
+        content["imageStatus"] = post.image_status.value
     if post.content:
         if post.post_type == Post.TYPE_TEXT:
             content["text"] = post.content
@@ -279,14 +309,7 @@ def post_to_dict(post: Post, viewer_id: Optional[int] = None) -> dict:
 
 def _get_current_user() -> Optional[User]:
     """Получить текущего пользователя из JWT или g.current_user (сессия)."""
-    try:
-        verify_jwt_in_request(optional=True)
-        identity = get_jwt_identity()
-        if identity:
-            return db.session.get(User, int(identity))
-    except Exception:
-        pass
-    return g.get("current_user")
+    return current_viewer()
 
 
 # ── Эндпоинты ─────────────────────────────────────────────────────────────────
@@ -295,20 +318,37 @@ def _get_current_user() -> Optional[User]:
 @api_bp.route('/posts/feed', methods=['GET'])
 def feed():
     """
-    GET /api/posts/feed?page=1&mood=calm
+    GET /api/posts/feed?page=1&mood=calm&algo=chronological|ranked&scope=all|following
     Простая и надёжная лента.
+
+    scope=following — только подписки и свои посты, из материализованной
+    ленты timeline_entries (services/timeline.py); требует авторизации.
+
+    algo=ranked — персональное ранжирование движком рекомендаций в пределах
+    бюджета FEED_RANK_BUDGET_MS; в ответе algo = уровень, который успел
+    отработать (hybrid, hybrid-pop, hybrid-nocontent, mood-fresh, popular).
     """
-    page = request.args.get('page', 1, type=int)
+    page = max(request.args.get('page', 1, type=int), 1)
     per_page = current_app.config.get('POSTS_PER_PAGE', 20)
     requested_mood = request.args.get('mood')  # например: joyful, calm и т.д.
+    algo = request.args.get('algo', 'chronological')
+    scope = request.args.get('scope', 'all')
 
     # Валидация mood
     valid_moods = {m.value for m in MoodEnum}
     if requested_mood and requested_mood not in valid_moods:
         return jsonify({'error': f'Неверный mood. Допустимые: {", ".join(sorted(valid_moods))}'}), 400
+    if algo not in ('chronological', 'ranked'):
+        return jsonify({'error': 'Неверный algo. Допустимые: chronological, ranked'}), 400
+    if scope not in ('all', 'following'):
+        return jsonify({'error': 'Неверный scope. Допустимые: all, following'}), 400
 
     current_user = _get_current_user()
     viewer_id = current_user.id if current_user else None
+    if scope == 'following':
+        if not current_user:
+            return jsonify({'error': 'Требуется авторизация'}), 401
+        return _following_feed(current_user, requested_mood, algo, page, per_page)
 
     # Базовый запрос
     query = Post.query
@@ -338,8 +378,12 @@ def feed():
     # Сортировка по новизне
     query = query.order_by(Post.created_at.desc())
 
+    if algo == 'ranked':
+        return _ranked_feed(query, current_user, requested_mood, page, per_page)
+
     # Пагинация
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    prime_users(p.user_id for p in pagination.items)
 
     return jsonify({
         'posts': [post_to_dict(p, viewer_id) for p in pagination.items],
@@ -350,6 +394,146 @@ def feed():
     })
 
 
+def _following_feed(current_user: User, requested_mood: Optional[str], algo: str,
+                    page: int, per_page: int):
+    """
+    ?scope=following: материализованная лента (push) + последние посты
+    авторов-«звёзд» (pull), слитые по created_at — services/timeline.py.
+    """
+    if algo == 'ranked':
+        pool_ids, _, _ = timeline.following_page(
+            current_user.id, 0, current_app.config.get('FEED_RANK_POOL', 300), requested_mood)
+        query = Post.query.filter(Post.id.in_(pool_ids)).order_by(Post.created_at.desc())
+        return _ranked_feed(query, current_user, requested_mood, page, per_page, 'following')
+
+    ids, has_more, total = timeline.following_page(
+        current_user.id, (page - 1) * per_page, per_page, requested_mood)
+    by_id = {p.id: p for p in Post.query.filter(Post.id.in_(ids)).all()} if ids else {}
+    prime_users(p.user_id for p in by_id.values())
+
+    return jsonify({
+        'posts': [post_to_dict(by_id[i], current_user.id) for i in ids if i in by_id],
+        'page': page,
+        'has_more': has_more,
+        'total': total,
+        'algo': 'chronological',
+    })
+
+
+def _ranked_feed(query, current_user: Optional[User], requested_mood: Optional[str],
+                 page: int, per_page: int, scope: str = 'all'):
+    """
+    ?algo=ranked: пул кандидатов ранжируется один раз в снимок
+    (services/feed_cache.py), страницы — срезы снимка. Видимость и mood
+    перепроверяются запросом страницы (пост могли скрыть или удалить).
+    Просмотренные посты (services/seen_filter.py) ранкер не ранжирует:
+    они уходят в конец нового снимка в порядке пула — лента не пустеет.
+    Гости и холодный старт получают общий снимок своего бакета mood
+    (только в scope=all: ленте подписок общий снимок не подходит).
+    """
+    viewer_id = current_user.id if current_user else None
+    key = (viewer_id, requested_mood or '', scope, ENGINE_VERSION)
+    start = (page - 1) * per_page
+    pool_size = current_app.config.get('FEED_RANK_POOL', 300)
+
+    snap = feed_snapshots.get(key) if viewer_id else None
+    if snap is None and scope == 'all' and (current_user is None or is_cold_start(current_user)):
+        snap = cold_snapshot(requested_mood, pool_size)
+    if snap is None:
+        pool = query.limit(pool_size).all()
+        budget_ms = current_app.config.get('FEED_RANK_BUDGET_MS')
+        seen = get_seen(viewer_id) if viewer_id else None
+        ranked, tier = score_and_rank_tiered(pool, current_user, requested_mood,
+                                             budget_ms=budget_ms, seen=seen)
+        if seen is not None and pool:
+            # Просмотренные ранкер отсёк маской; они — в хвост в порядке пула
+            # (лучше повтор, чем пустая лента)
+            shown = seen.contains_many([p.id for p in pool])
+            ranked += [p for p, s in zip(pool, shown) if s]
+        ids = [p.id for p in ranked]
+        if viewer_id:
+            # Урезанную ленту (бюджет не позволил полный расчёт) держим недолго
+            ttl = (current_app.config.get('FEED_SNAPSHOT_TTL', 900)
+                   if tier in (TIER_FULL, TIER_COLD) else DEGRADED_SNAPSHOT_TTL)
+            feed_snapshots.put(key, ids, tier, ttl)
+        page_posts = ranked[start:start + per_page]
+    else:
+        ids, tier = snap.ids, snap.tier
+        page_ids = ids[start:start + per_page]
+        rows = query.filter(Post.id.in_(page_ids)).all() if page_ids else []
+        by_id = {p.id: p for p in rows}
+        page_posts = [by_id[i] for i in page_ids if i in by_id]
+    prime_users(p.user_id for p in page_posts)
+
+    return jsonify({
+        'posts': [post_to_dict(p, viewer_id) for p in page_posts],
+        'page': page,
+        'has_more': start + per_page < len(ids),
+        'total': len(ids),
+        'algo': tier,
+    })
+
+
+@api_bp.route('/posts/trending', methods=['GET'])
+def trending_posts():
+    """
+    GET /api/posts/trending?window=24h&mood=calm&limit=20
+    Публичные посты из top-k индекса тренда (services/trending.py):
+    window (1h | 24h | 7d) — период полураспада затухающего счёта.
+    """
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    window = request.args.get('window', DEFAULT_WINDOW)
+    requested_mood = request.args.get('mood')
+    valid_moods = {m.value for m in MoodEnum}
+    if requested_mood and requested_mood not in valid_moods:
+        return jsonify({'error': f'Неверный mood. Допустимые: {", ".join(sorted(valid_moods))}'}), 400
+    if window not in TRENDING_WINDOWS:
+        return jsonify({'error': f'Неверный window. Допустимые: {", ".join(TRENDING_WINDOWS)}'}), 400
+
+    current_user = _get_current_user()
+    viewer_id = current_user.id if current_user else None
+
+    # С запасом: пост могли скрыть, удалить или сменить ему mood после попадания в индекс
+    ranked = trending_index.top(window, requested_mood, limit * 2)
+    scores = dict(ranked)
+    query = Post.query.filter(Post.id.in_(scores), Post.visibility == VisibilityEnum.public)
+    if requested_mood:
+        query = query.filter(Post.mood == MoodEnum(requested_mood))
+    rows = query.all() if scores else []
+    by_id = {p.id: p for p in rows}
+    posts = [by_id[pid] for pid, _ in ranked if pid in by_id][:limit]
+    prime_users(p.user_id for p in posts)
+
+    return jsonify({
+        'posts': [
+            {**post_to_dict(p, viewer_id), 'trendingScore': round(scores[p.id], 4)}
+            for p in posts
+        ],
+        'window': window,
+    })
+
+
+@api_bp.route('/posts/impressions', methods=['POST'])
+def post_impressions():
+    """
+    POST /api/posts/impressions  {"postIds": [1, 2, 3]}
+    Отметить посты просмотренными: ранжированная лента больше их не
+    предлагает (со следующего снимка).
+    """
+    current_user = _get_current_user()
+    if not current_user:
+        return jsonify({'error': 'Требуется авторизация'}), 401
+
+    try:
+        body = ImpressionsSchema.model_validate(request.get_json(force=True) or {})
+    except ValidationError as e:
+        errs = _pydantic_errors(e)
+        return jsonify({'error': errs[0]['message'], 'errors': errs}), 422
+
+    accepted = mark_seen(current_user.id, body.postIds)
+    return jsonify({'ok': True, 'accepted': accepted}), 200
+
+
 @api_bp.route("/posts/", methods=["POST"])
 def create_post():
     """
@@ -408,9 +592,14 @@ def create_post():
     db.session.commit()
 
     try:
-        on_post_created()
+        on_post_created(post)
+    except Exception:
+        pass
+    try:
+        timeline.on_post_created(post)
     except Exception:
         pass
+    invalidate_user_feed(current_user.id)
 
     return jsonify(post_to_dict(post, current_user.id)), 201
 
@@ -487,6 +676,38 @@ def get_post(post_id: int):
     return jsonify(post_to_dict(post, viewer_id)), 200
 
 
+@api_bp.route("/posts/<int:post_id>/similar", methods=["GET"])
+def get_similar_posts(post_id: int):
+    """
+    GET /api/posts/<id>/similar?limit=12
+    Похожие посты по эмбеддингам. Приватные и свои посты зрителя исключаются.
+    """
+    limit = max(1, min(request.args.get("limit", 12, type=int), 50))
+
+    post = db.session.get(Post, post_id)
+    current_user = _get_current_user()
+    viewer_id = current_user.id if current_user else None
+    if not post or (
+        post.visibility == VisibilityEnum.private and post.user_id != viewer_id
+    ):
+        return jsonify({"error": "Пост не найден"}), 404
+
+    ids = similar_post_ids(post)
+    by_id = {p.id: p for p in Post.query.filter(Post.id.in_(ids)).all()} if ids else {}
+    prime_users(p.user_id for p in by_id.values())
+
+    result = []
+    for pid in ids:
+        p = by_id.get(pid)
+        if p is None or p.visibility == VisibilityEnum.private or p.user_id == viewer_id:
+            continue
+        result.append(post_to_dict(p, viewer_id))
+        if len(result) >= limit:
+            break
+
+    return jsonify({"posts": result}), 200
+
+
 @api_bp.route("/posts/<int:post_id>", methods=["PUT"])
 @jwt_required()
 def update_post(post_id: int):
@@ -528,6 +749,19 @@ def update_post(post_id: int):
     post.updated_at = datetime.utcnow()
     db.session.commit()
 
+    try:
+        if post.visibility == VisibilityEnum.private:
+            on_post_removed(post.id)
+        else:
+            on_post_updated(post)
+    except Exception:
+        pass
+    if mood is not None:
+        try:
+            on_post_mood_changed(post.id, post.mood.value)
+        except Exception:
+            pass
+
     return jsonify(post_to_dict(post, user_id)), 200
 
 
@@ -554,11 +788,21 @@ def delete_post(post_id: int):
 
     # Удалить файлы изображений
     _delete_file(post.image_url)
-    _delete_file(post.image_preview_url)
+    for url in rendition_urls(post):
+        _delete_file(url)
 
     db.session.delete(post)
     db.session.commit()
 
+    try:
+        on_post_removed(post_id)
+    except Exception:
+        pass
+    try:
+        timeline.on_post_deleted(post_id)
+    except Exception:
+        pass
+
     return jsonify({"ok": True}), 200
 
 
@@ -595,22 +839,35 @@ def upload_post_image(post_id: int):
 
     # Удалить старые файлы перед сохранением новых
     _delete_file(post.image_url)
-    _delete_file(post.image_preview_url)
+    for url in rendition_urls(post):
+        _delete_file(url)
 
-    image_url, preview_url = _save_post_image(file, post_id)
+    image_url = _save_post_image(file, post_id)
     if not image_url:
         return jsonify(
             {"error": "Недопустимый формат. Разрешены: png, jpg, jpeg, gif, webp"}
         ), 400
 
     post.image_url = image_url
-    post.image_preview_url = preview_url
+    post.image_preview_url = None
+    post.image_renditions = None
+    post.image_status = ImageStatusEnum.pending
     # Уточняем тип поста
     post.post_type = Post.TYPE_MIXED if post.content else Post.TYPE_IMAGE
     post.updated_at = datetime.utcnow()
 
     db.session.commit()
 
+    # Копии — в пуле процессов; ответ не ждёт декодирования.
+    # Сбой постановки в очередь on_image_uploaded сам переводит пост в failed
+    try:
+        on_image_uploaded(post)
+    except Exception as exc:
+        db.session.rollback()
+        current_app.logger.warning(f"renditions for post {post.id} not queued: {exc}")
+        post.image_status = ImageStatusEnum.failed
+        db.session.commit()
+
     return jsonify(post_to_dict(post, user_id)), 200
 
 
@@ -641,6 +898,8 @@ def repost_post(post_id: int):
         title=original.title,
         image_url=original.image_url,
         image_preview_url=original.image_preview_url,
+        image_status=original.image_status,
+        image_renditions=original.image_renditions,
         mood=original.mood,
         visibility=VisibilityEnum.public,        # ← ИСПРАВЛЕНО: public (маленькими буквами)
         user_id=current_user.id,
@@ -652,6 +911,11 @@ def repost_post(post_id: int):
     current_user.posts_count = (current_user.posts_count or 0) + 1
     db.session.add(repost)
     db.session.commit()
+    try:
+        timeline.on_post_created(repost)
+    except Exception:
+        pass
+    invalidate_user_feed(current_user.id)
 
     return jsonify(post_to_dict(repost, current_user.id)), 201
 
@@ -680,9 +944,15 @@ def save_post(post_id: int):
 
     if existing_save:
         # Убираем из сохранённых
+        saved_id = existing_save.id
         db.session.delete(existing_save)
         current_user.posts_count = max(0, (current_user.posts_count or 1) - 1)
+        record_event(original.id, 'save', added=False, at=existing_save.created_at)
         db.session.commit()
+        try:
+            on_post_removed(saved_id)
+        except Exception:
+            pass
         saves_count = Post.query.filter_by(
             original_post_id=original.id, post_kind="saved"
         ).count()
@@ -695,6 +965,8 @@ def save_post(post_id: int):
             title=original.title,
             image_url=original.image_url,
             image_preview_url=original.image_preview_url,
+            image_status=original.image_status,
+            image_renditions=original.image_renditions,
             mood=original.mood,
             visibility=VisibilityEnum.private,   # ← ИСПРАВЛЕНО: private (маленькими буквами)
             user_id=current_user.id,
@@ -705,6 +977,7 @@ def save_post(post_id: int):
         saved_post.tags = list(original.tags)
         current_user.posts_count = (current_user.posts_count or 0) + 1
         db.session.add(saved_post)
+        record_event(original.id, 'save')
         db.session.commit()
 
         saves_count = Post.query.filter_by(
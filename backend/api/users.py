@@ -15,10 +15,14 @@ api/users.py — управление профилями пользовател
 import os
 import time
 
-from flask import current_app, g, jsonify, request
-from flask_jwt_extended import get_jwt_identity, jwt_required, verify_jwt_in_request
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity, jwt_required
 from models import Board, Post, User, db
 from pydantic import BaseModel, ValidationError, field_validator
+from services.avatars import set_default, set_uploaded
+from services.feed_cache import invalidate_user_feed
+from services.identity import current_viewer, remember_user
+from services.timeline import on_follow, on_unfollow
 from utils import delete_avatar, get_avatar_url
 
 from . import api_bp
@@ -75,16 +79,7 @@ def _pydantic_errors(e):
 
 def _get_optional_user():
     """Возвращает текущего пользователя если JWT передан, иначе None."""
-    try:
-        verify_jwt_in_request(optional=True)
-        from flask_jwt_extended import get_jwt_identity
-
-        identity = get_jwt_identity()
-        if identity:
-            return db.session.get(User, int(identity))
-    except Exception:
-        pass
-    return g.get("current_user")
+    return current_viewer()
 
 
 def _allowed_file(filename):
@@ -133,6 +128,7 @@ def _public_profile(user, current_user=None):
     )
     posts = user.posts.order_by(Post.created_at.desc()).limit(20).all()
     boards = user.boards.order_by(Board.created_at.desc()).all()
+    remember_user(user)   # автор всех постов и досок профиля
 
     return {
         "id": str(user.id),
@@ -272,13 +268,13 @@ def upload_avatar():
         except Exception:
             pass  # не критично если старый файл не нашёлся
 
-    user.avatar = new_path
+    set_uploaded(user, new_path)
     db.session.commit()
 
     avatar_url = get_avatar_url(user)
 
     # cache-buster чтобы браузер не показывал старую картинку
-    avatar_url_busted = f"{avatar_url}?v={int(time.time())}"
+    avatar_url_busted = f"{avatar_url}?v={user.avatar_version}"
 
     return jsonify(
         {
@@ -311,7 +307,7 @@ def delete_avatar_endpoint():
         except Exception:
             pass
 
-    user.avatar = "default_avatar.png"
+    set_default(user)
     db.session.commit()
 
     return jsonify(
@@ -329,6 +325,7 @@ def delete_avatar_endpoint():
 def get_user_posts(username):
     user = User.query.filter_by(username=username).first_or_404()
     posts = user.posts.order_by(Post.created_at.desc()).all()
+    remember_user(user)
     return jsonify({"posts": [post_to_dict(p) for p in posts]}), 200
 
 
@@ -352,6 +349,11 @@ def follow_user(username):
     if not already:
         current_user.follow(user)
         db.session.commit()
+        invalidate_user_feed(current_user.id)
+        try:
+            on_follow(current_user.id, user.id)
+        except Exception:
+            pass
 
     return jsonify(
         {
@@ -379,6 +381,11 @@ def unfollow_user(username):
     if already:
         current_user.unfollow(user)
         db.session.commit()
+        invalidate_user_feed(current_user.id)
+        try:
+            on_unfollow(current_user.id, user.id)
+        except Exception:
+            pass
 
     return jsonify(
         {
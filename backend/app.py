@@ -9,6 +9,7 @@ from flask_wtf.csrf import CSRFProtect
 from config import config
 from models import db, User
 from extensions import limiter, jwt, jwt_blacklist   # ← единственный источник
+from services.identity import remember_user
 
 from docs.swagger import setup_swagger
 
@@ -77,6 +78,7 @@ def create_app(config_name='default'):
             user = db.session.get(User, session['user_id'])
             if user:
                 g.current_user = user
+                remember_user(user)   # JWT того же пользователя не загрузит его повторно
             else:
                 session.clear()
 
@@ -0,0 +1,90 @@
+"""
+bench/_data.py
+──────────────
+Общая обвязка бенчмарков, которым нужна база: приложение на отдельном
+SQLite-файле и синтетические пользователи / доски / посты / реакции.
+
+    from _data import bench_app, seed_synthetic
+    app = bench_app('/tmp/niti_bench.db')
+    seed_synthetic(app, users=500, posts=20000)
+"""
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+WORDS = ('sun sea calm coffee code music travel art mountain city rain night joy '
+         'forest book film photo sketch garden winter summer dream street light').split()
+
+
+def bench_app(db_path: str):
+    """Flask-приложение на указанном SQLite-файле (DATABASE_URI, если задан, важнее)."""
+    os.environ.setdefault('SECRET_KEY', 'bench')
+    os.environ.setdefault('FLASK_ENV', 'development')
+    os.environ.setdefault('DATABASE_URI', 'sqlite:///' + os.path.abspath(db_path))
+    from app import create_app
+    app = create_app('development')
+    app.config['DEBUG'] = False
+    return app
+
+
+def seed_synthetic(app, users: int = 300, posts: int = 5000, boards: int = 200,
+                   likes_per_user: int = 40, follows_per_user: int = 20,
+                   board_follows_per_user: int = 8, seed: int = 1) -> None:
+    """Заполняет пустую базу; если пользователи уже есть — ничего не делает."""
+    from models import db, User, Post, Board, Reaction, MoodEnum, VisibilityEnum, ReactionTypeEnum
+    from models import follows, board_followers
+
+    rnd = random.Random(seed)
+    now = datetime.utcnow()
+    with app.app_context():
+        db.create_all()
+        if db.session.query(User.id).first() is not None:
+            return
+
+        db.session.execute(db.insert(User), [
+            {'username': f'bench{i}', 'email': f'bench{i}@example.com',
+             'password_hash': 'x', 'created_at': now}
+            for i in range(users)
+        ])
+        user_ids = [u for (u,) in db.session.query(User.id)]
+
+        db.session.execute(db.insert(Board), [
+            {'name': f'board {i} ' + ' '.join(rnd.sample(WORDS, 2)),
+             'description': ' '.join(rnd.sample(WORDS, 5)),
+             'tags': rnd.sample(WORDS, 2), 'is_public': i % 5 != 4,
+             'creator_id': rnd.choice(user_ids), 'created_at': now - timedelta(days=rnd.randint(0, 90))}
+            for i in range(boards)
+        ])
+        board_ids = [b for (b,) in db.session.query(Board.id)]
+
+        moods = list(MoodEnum)
+        db.session.execute(db.insert(Post), [
+            {'post_type': 'text', 'title': ' '.join(rnd.sample(WORDS, 2)),
+             'content': ' '.join(rnd.choice(WORDS) for _ in range(12)),
+             'mood': rnd.choice(moods),
+             'visibility': VisibilityEnum.public if i % 6 else VisibilityEnum.private,
+             'user_id': rnd.choice(user_ids),
+             'board_id': rnd.choice(board_ids) if i % 2 else None,
+             'created_at': now - timedelta(minutes=rnd.randint(0, 60 * 24 * 30))}
+            for i in range(posts)
+        ])
+        post_ids = [p for (p,) in db.session.query(Post.id)]
+
+        db.session.execute(db.insert(Reaction), [
+            {'user_id': u, 'post_id': p, 'reaction_type': ReactionTypeEnum.like,
+             'created_at': now - timedelta(minutes=rnd.randint(0, 60 * 24 * 30))}
+            for u in user_ids for p in rnd.sample(post_ids, min(likes_per_user, len(post_ids)))
+        ])
+        db.session.execute(follows.insert(), [
+            {'follower_id': u, 'followed_id': v, 'created_at': now}
+            for u in user_ids for v in rnd.sample(user_ids, min(follows_per_user, len(user_ids))) if v != u
+        ])
+        db.session.execute(board_followers.insert(), [
+            {'user_id': u, 'board_id': b, 'created_at': now - timedelta(hours=rnd.randint(0, 96))}
+            for u in user_ids for b in rnd.sample(board_ids, min(board_follows_per_user, len(board_ids)))
+        ])
+        db.session.commit()
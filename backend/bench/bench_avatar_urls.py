@@ -0,0 +1,120 @@
+"""
+bench/bench_avatar_urls.py
+──────────────────────────
+Стоимость URL аватара в сериализаторах: stat() на каждый вызов против
+user.avatar_version (services/avatars.py).
+
+    cd backend && python bench/bench_avatar_urls.py --db /tmp/niti_avatars.db
+
+У --custom доли пользователей есть свой файл аватара (во временной папке
+UPLOAD_FOLDER). Режимы:
+  stat    — прежний get_avatar_url: os.path.exists на каждый вызов
+  lru     — avatar_version = NULL (до backfill): stat один раз на файл
+  stored  — после backfill: без обращения к диску
+Для каждого режима:
+  url/s       — get_avatar_url по авторам --posts постов
+  page ms     — post_to_dict страницы из --per-page постов (вся сериализация)
+URL во всех режимах сверяются с режимом stat.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from _data import bench_app, seed_synthetic
+
+
+def legacy_avatar_url(user):
+    """get_avatar_url до services/avatars.py — для сравнения."""
+    from flask import current_app, url_for
+    from utils import get_avatar_url
+
+    if user.avatar and user.avatar != 'default_avatar.png':
+        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], user.avatar)
+        if os.path.exists(filepath):
+            return url_for('static', filename=f'uploads/avatars/{user.avatar}')
+    return get_avatar_url(user)   # дефолтный SVG — та же ветка
+
+
+def give_avatars(app, folder: str, share: float) -> None:
+    from models import db, User
+
+    with app.app_context():
+        ids = [u for (u,) in db.session.query(User.id).order_by(User.id)]
+        custom = set(ids[:int(len(ids) * share)])
+        rows = []
+        for uid in ids:
+            if uid in custom:
+                name = f'user_{uid}_1.jpg'
+                open(os.path.join(folder, name), 'wb').close()
+                rows.append({'id': uid, 'avatar': name, 'avatar_version': None})
+            else:
+                rows.append({'id': uid, 'avatar': 'default_avatar.png', 'avatar_version': None})
+        db.session.execute(db.update(User), rows)
+        db.session.commit()
+
+
+def run_mode(app, mode: str, n_posts: int, per_page: int, repeats: int):
+    import api.posts as posts_api
+    import utils
+    from models import db, Post, User
+    from services import avatars
+
+    resolve = legacy_avatar_url if mode == 'stat' else utils.get_avatar_url
+    posts_api.get_avatar_url = resolve
+    avatars._file_exists.cache_clear()
+    with app.test_request_context():
+        if mode == 'stored':
+            avatars.backfill(app.config['UPLOAD_FOLDER'])
+        elif mode == 'lru':
+            db.session.execute(db.update(User).values(avatar_version=None))
+            db.session.commit()
+
+        authors = [u for (u,) in db.session.execute(
+            db.select(User).join(Post, Post.user_id == User.id).order_by(Post.id).limit(n_posts))]
+        urls = [resolve(u) for u in authors]      # прогрев (и LRU для режима lru)
+        best = float('inf')
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            for u in authors:
+                resolve(u)
+            best = min(best, time.perf_counter() - t0)
+
+        page = Post.query.order_by(Post.id).limit(per_page).all()
+        page_ms = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            [posts_api.post_to_dict(p) for p in page]
+            page_ms.append((time.perf_counter() - t0) * 1000.0)
+    posts_api.get_avatar_url = utils.get_avatar_url
+    return len(authors) / best, statistics.median(page_ms), urls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', default='/tmp/niti_avatars.db')
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--custom', type=float, default=0.5)
+    parser.add_argument('--per-page', type=int, default=20)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    app = bench_app(args.db)
+    seed_synthetic(app, users=args.users, posts=args.posts)
+    folder = tempfile.mkdtemp(prefix='niti_avatars_')
+    app.config['UPLOAD_FOLDER'] = folder
+    give_avatars(app, folder, args.custom)
+
+    print(f"users={args.users} posts={args.posts} custom avatars={args.custom:.0%} folder={folder}")
+    print(f"{'mode':>8} {'url/s':>12} {'page ms':>9} {'same':>5}")
+    baseline = None
+    for mode in ('stat', 'lru', 'stored'):
+        rate, page_ms, urls = run_mode(app, mode, args.posts, args.per_page, args.repeats)
+        baseline = baseline or urls
+        print(f"{mode:>8} {rate:12,.0f} {page_ms:9.2f} {str(urls == baseline):>5}")
+
+
+if __name__ == '__main__':
+    main()
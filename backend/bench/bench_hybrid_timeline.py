@@ -0,0 +1,144 @@
+"""
+bench/bench_hybrid_timeline.py
+──────────────────────────────
+Fan-out on write против гибрида push/pull (services/timeline.py) при
+скошенном распределении подписчиков.
+
+    cd backend && python bench/bench_hybrid_timeline.py --db /tmp/niti_timeline.db
+
+Граф подписок — Zipf: каждый пользователь подписан на --follows авторов,
+автор выбирается с вероятностью ∝ 1/rankᵃ (a = --zipf), так что у
+горстки «звёзд» десятки тысяч подписчиков. Публикуют случайные авторы
+плюс каждая из --stars звёзд по несколько раз.
+
+Для каждого порога FANOUT_FOLLOWER_LIMIT (inf = чистый push):
+  rows        — строк записано в timeline_entries
+  fanout s    — суммарное время fan_out по всем постам
+  p99 post ms — худший (p99) пост: задержка появления в лентах
+  read p50/p95 — following_page(первая страница) по --readers пользователям
+Страницы всех режимов сверяются с чистым push (должны совпадать).
+"""
+import argparse
+import time
+
+import numpy as np
+
+from _data import bench_app
+
+
+def seed_skewed(app, users: int, follows: int, zipf: float, seed: int = 1) -> None:
+    from datetime import datetime
+    from models import db, User, follows as follows_t
+
+    rng = np.random.default_rng(seed)
+    with app.app_context():
+        db.create_all()
+        if db.session.query(User.id).first() is not None:
+            return
+        now = datetime.utcnow()
+        db.session.execute(db.insert(User), [
+            {'username': f'tl{i}', 'email': f'tl{i}@example.com', 'password_hash': 'x', 'created_at': now}
+            for i in range(users)
+        ])
+        ids = np.array([u for (u,) in db.session.query(User.id).order_by(User.id)])
+        weights = 1.0 / np.arange(1, users + 1) ** zipf
+        weights /= weights.sum()
+
+        rows, counts = [], np.zeros(users, dtype=np.int64)
+        for i in range(users):
+            picks = set(rng.choice(users, size=follows, replace=False, p=weights).tolist()) - {i}
+            counts[list(picks)] += 1
+            rows.extend({'follower_id': int(ids[i]), 'followed_id': int(ids[j]), 'created_at': now}
+                        for j in picks)
+        db.session.execute(follows_t.insert(), rows)
+        db.session.execute(db.update(User), [
+            {'id': int(ids[j]), 'followers_count': int(counts[j])} for j in np.flatnonzero(counts)
+        ])
+        db.session.commit()
+
+
+def make_posts(app, n_posts: int, stars: int, star_posts: int, seed: int = 2) -> list[int]:
+    from datetime import datetime, timedelta
+    from models import db, Post, User, VisibilityEnum
+
+    rng = np.random.default_rng(seed)
+    with app.app_context():
+        user_ids = [u for (u,) in db.session.query(User.id)]
+        top = [u for (u,) in db.session.query(User.id).order_by(User.followers_count.desc()).limit(stars)]
+        authors = [int(a) for a in rng.choice(user_ids, size=n_posts)] + top * star_posts
+        rng.shuffle(authors)
+        now = datetime.utcnow()
+        db.session.execute(db.insert(Post), [
+            {'post_type': 'text', 'content': 'bench', 'visibility': VisibilityEnum.public,
+             'user_id': a, 'created_at': now - timedelta(seconds=len(authors) - i)}
+            for i, a in enumerate(authors)
+        ])
+        db.session.commit()
+        return [p for (p,) in db.session.query(Post.id).order_by(Post.id.desc()).limit(len(authors))][::-1]
+
+
+def run_mode(app, timeline, post_ids, readers, limit):
+    from models import db, TimelineEntry
+
+    timeline.FANOUT_FOLLOWER_LIMIT = limit
+    timeline._author_recent.clear()
+    timeline.TIMELINE_TRIM_EVERY = 10 ** 9     # урезание мерим отдельно от fan-out
+    with app.app_context():
+        db.session.execute(db.delete(TimelineEntry))
+        db.session.commit()
+
+        per_post = []
+        for pid in post_ids:
+            t0 = time.perf_counter()
+            timeline.fan_out(pid)
+            per_post.append((time.perf_counter() - t0) * 1000.0)
+        rows = db.session.query(TimelineEntry).count()
+
+        pages, read_ms = [], []
+        for uid in readers:
+            timeline.following_page(uid, 0, 20)          # прогрев кеша авторов
+            t0 = time.perf_counter()
+            ids, _, _ = timeline.following_page(uid, 0, 20)
+            read_ms.append((time.perf_counter() - t0) * 1000.0)
+            pages.append(ids)
+    return rows, np.array(per_post), np.array(read_ms), pages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', default='/tmp/niti_timeline.db')
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--follows', type=int, default=30)
+    parser.add_argument('--zipf', type=float, default=1.1)
+    parser.add_argument('--posts', type=int, default=500)
+    parser.add_argument('--stars', type=int, default=10)
+    parser.add_argument('--star-posts', type=int, default=5)
+    parser.add_argument('--readers', type=int, default=200)
+    parser.add_argument('--limits', type=int, nargs='+', default=[10000, 1000, 100])
+    args = parser.parse_args()
+
+    app = bench_app(args.db)
+    seed_skewed(app, args.users, args.follows, args.zipf)
+    post_ids = make_posts(app, args.posts, args.stars, args.star_posts)
+
+    from models import db, User
+    from services import timeline
+
+    with app.app_context():
+        counts = np.array([c for (c,) in db.session.query(User.followers_count)])
+        readers = [u for (u,) in db.session.query(User.id).order_by(db.func.random()).limit(args.readers)]
+    print(f"users={args.users} follows/user={args.follows} zipf={args.zipf} posts={len(post_ids)}")
+    print(f"followers: median={int(np.median(counts))} p99={int(np.percentile(counts, 99))} max={counts.max()}")
+    print(f"{'limit':>8} {'rows':>9} {'fanout s':>9} {'p99 post ms':>12} {'read p50':>9} {'read p95':>9} {'same':>5}")
+
+    baseline = None
+    for limit in [10 ** 12] + sorted(args.limits, reverse=True):
+        rows, per_post, read_ms, pages = run_mode(app, timeline, post_ids, readers, limit)
+        baseline = baseline or pages
+        name = 'inf' if limit == 10 ** 12 else str(limit)
+        print(f"{name:>8} {rows:9d} {per_post.sum() / 1000:9.2f} {np.percentile(per_post, 99):12.2f} "
+              f"{np.median(read_ms):9.2f} {np.percentile(read_ms, 95):9.2f} {str(pages == baseline):>5}")
+
+
+if __name__ == '__main__':
+    main()
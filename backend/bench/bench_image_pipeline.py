@@ -0,0 +1,126 @@
+"""
+bench/bench_image_pipeline.py
+─────────────────────────────
+Превью 400×400 без EXIF: прежний путь (list(getdata()) → putdata) против
+services/images.py (draft + exif_transpose + reduce/LANCZOS + перекодирование).
+
+    cd backend && python bench/bench_image_pipeline.py
+    cd backend && python bench/bench_image_pipeline.py --photos ~/Pictures/*.jpg
+
+Без --photos генерируются JPEG-«фото» (градиенты + шум, quality 92) размером
+--sizes мегапикселей с EXIF: Orientation = 6 и GPS. Каждый прогон — в
+отдельном процессе, чтобы пиковый RSS не смешивался между режимами.
+
+  ms        — медиана по --repeats прогонам
+  peak MB   — рост пикового RSS процесса за прогон
+  exif      — остались ли EXIF-данные в превью (должно быть «no»)
+  size      — размер превью (новый путь учитывает поворот)
+Прежний путь пропускается для снимков больше --legacy-max-mp (память).
+"""
+import argparse
+import glob
+import multiprocessing as mp
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.images import make_thumbnail, save_clean   # noqa: E402  (импорт до fork — не в замере)
+
+
+def synthetic_photo(path: str, megapixels: float, seed: int = 1) -> None:
+    rng = np.random.default_rng(seed)
+    w = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    h = int(w * 3 / 4)
+    y, x = np.mgrid[0:h, 0:w].astype(np.float32)
+    base = np.stack([x / w * 255, y / h * 255, (x + y) / (w + h) * 255], axis=-1)
+    base += rng.normal(0, 18, size=(h, w, 3)).astype(np.float32)
+    img = Image.fromarray(np.clip(base, 0, 255).astype(np.uint8), 'RGB')
+    exif = Image.Exif()
+    exif[0x0112] = 6                                   # Orientation: повернуть на 90°
+    exif[0x010F] = 'BenchCam'
+    exif[0x8825] = {1: 'N', 2: (55.0, 45.0, 0.0)}      # GPSInfo
+    img.save(path, 'JPEG', quality=92, exif=exif)
+
+
+def legacy_preview(src: str, dst: str) -> None:
+    img = Image.open(src)
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGB')
+    clean = Image.new(img.mode, img.size)
+    clean.putdata(list(img.getdata()))
+    clean.thumbnail((400, 400), Image.Resampling.LANCZOS)
+    clean.save(dst, quality=85, optimize=True)
+
+
+def pipeline_preview(src: str, dst: str) -> None:
+    save_clean(make_thumbnail(src, (400, 400)), dst, quality=85)
+
+
+def _measure(mode: str, src: str, dst: str, out: mp.Queue) -> None:
+    fn = legacy_preview if mode == 'legacy' else pipeline_preview
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    fn(src, dst)
+    elapsed = (time.perf_counter() - t0) * 1000.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    out.put((elapsed, peak / 1024.0))
+
+
+def measure(mode: str, src: str, dst: str, repeats: int) -> tuple[float, float]:
+    ctx = mp.get_context('fork')
+    times, peaks = [], []
+    for _ in range(repeats):
+        out = ctx.Queue()
+        proc = ctx.Process(target=_measure, args=(mode, src, dst, out))
+        proc.start()
+        elapsed, peak = out.get()
+        proc.join()
+        times.append(elapsed)
+        peaks.append(peak)
+    return statistics.median(times), max(peaks)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--photos', nargs='*', default=None)
+    parser.add_argument('--sizes', type=float, nargs='+', default=[2, 12, 24])
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--legacy-max-mp', type=float, default=13)
+    args = parser.parse_args()
+    warnings.simplefilter('ignore', DeprecationWarning)   # getdata() в прежнем пути
+
+    workdir = tempfile.mkdtemp(prefix='niti_images_')
+    photos = [p for pattern in (args.photos or []) for p in glob.glob(os.path.expanduser(pattern))]
+    if not photos:
+        for mpx in args.sizes:
+            path = os.path.join(workdir, f'photo_{mpx:g}mp.jpg')
+            synthetic_photo(path, mpx)
+            photos.append(path)
+
+    print(f"{'photo':>22} {'MP':>5} {'mode':>9} {'ms':>9} {'peak MB':>8} {'exif':>5} {'size':>9}")
+    for src in photos:
+        with Image.open(src) as img:
+            mpx = img.size[0] * img.size[1] / 1e6
+        for mode in ('legacy', 'pipeline'):
+            if mode == 'legacy' and mpx > args.legacy_max_mp:
+                print(f"{os.path.basename(src)[-22:]:>22} {mpx:5.1f} {mode:>9} {'skipped':>9}")
+                continue
+            dst = os.path.join(workdir, f'preview_{mode}.jpg')
+            ms, peak = measure(mode, src, dst, args.repeats)
+            with Image.open(dst) as out:
+                exif = 'yes' if out.getexif() or 'exif' in out.info else 'no'
+                size = f'{out.size[0]}×{out.size[1]}'
+            print(f"{os.path.basename(src)[-22:]:>22} {mpx:5.1f} {mode:>9} {ms:9.1f} {peak:8.0f} {exif:>5} {size:>9}")
+
+
+if __name__ == '__main__':
+    main()
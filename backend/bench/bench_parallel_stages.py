@@ -0,0 +1,83 @@
+"""
+bench/bench_parallel_stages.py
+──────────────────────────────
+Wall-clock score_and_rank / rank_boards_personalized: стадии в пуле потоков
+против последовательного выполнения (RECO_PARALLEL_STAGES, по умолчанию
+выключено — пока этот замер не покажет выигрыша).
+
+    cd backend && python bench/bench_parallel_stages.py --db /tmp/niti_bench.db
+
+База заполняется синтетикой при первом запуске. Вектора прогреваются
+заранее, чтобы мерить ранжирование, а не энкодер. Для каждого режима —
+медиана и p95 по --users пользователям; ранжирование обоих режимов
+сверяется (должно совпадать).
+"""
+import argparse
+import time
+
+import numpy as np
+
+from _data import bench_app, seed_synthetic
+
+
+def measure(app, engine, user_ids, pool_size, parallel: bool):
+    from models import db, Post, Board, User, VisibilityEnum
+
+    engine.PARALLEL_STAGES = parallel
+    engine.STAGE_TIMEOUT_MS = 1e9   # сравниваем латентность при одинаковом результате
+    post_ms, board_ms, orders = [], [], []
+    for uid in user_ids:
+        with app.test_request_context():
+            user = db.session.get(User, uid)
+            posts = (Post.query.filter(Post.visibility == VisibilityEnum.public)
+                     .order_by(Post.created_at.desc()).limit(pool_size).all())
+            boards = Board.query.filter_by(is_public=True).all()
+
+            t0 = time.perf_counter()
+            ranked = engine.score_and_rank(posts, user)
+            post_ms.append((time.perf_counter() - t0) * 1000.0)
+
+            t0 = time.perf_counter()
+            ranked_boards = engine.rank_boards_personalized(boards, user)
+            board_ms.append((time.perf_counter() - t0) * 1000.0)
+            orders.append(([p.id for p in ranked[:20]], [b.id for b in ranked_boards[:10]]))
+    return np.array(post_ms), np.array(board_ms), orders
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', default='/tmp/niti_bench.db')
+    parser.add_argument('--users', type=int, default=30)
+    parser.add_argument('--pool', type=int, default=300)
+    parser.add_argument('--seed-users', type=int, default=400)
+    parser.add_argument('--seed-posts', type=int, default=20000)
+    args = parser.parse_args()
+
+    app = bench_app(args.db)
+    seed_synthetic(app, users=args.seed_users, posts=args.seed_posts, likes_per_user=30)
+
+    from models import db, User
+    from services import recommendation_engine as engine
+
+    with app.test_request_context():
+        engine.warmup()
+        engine.warmup_vectors(posts_limit=args.seed_posts, boards_limit=10_000)
+        engine._worker.join()
+        user_ids = [u for (u,) in db.session.query(User.id).limit(args.users)]
+
+    # Прогон вхолостую: профили вкуса и пул потоков
+    measure(app, engine, user_ids, args.pool, parallel=True)
+
+    seq_posts, seq_boards, seq_orders = measure(app, engine, user_ids, args.pool, parallel=False)
+    par_posts, par_boards, par_orders = measure(app, engine, user_ids, args.pool, parallel=True)
+
+    print(f"users={len(user_ids)} pool={args.pool} workers={engine.STAGE_WORKERS}")
+    print(f"{'':24} {'median ms':>10} {'p95 ms':>8}")
+    for name, arr in (('score_and_rank seq', seq_posts), ('score_and_rank par', par_posts),
+                      ('boards seq', seq_boards), ('boards par', par_boards)):
+        print(f"{name:24} {np.median(arr):10.2f} {np.percentile(arr, 95):8.2f}")
+    print('same ranking:', seq_orders == par_orders)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+bench/bench_pca_projection.py
+─────────────────────────────
+Recall@k против скорости для PCA-проекции векторов (services/vector_projection.py).
+
+    cd backend && python bench/bench_pca_projection.py --n 200000 --dims 32 64 96 128
+
+Синтетические вектора с низкой внутренней размерностью (как у MiniLM:
+темы в подпространстве + изотропный шум). Для каждой целевой размерности:
+  variance   — доля объяснённой дисперсии
+  fit ms     — обучение PCA на выборке
+  similar ms — GEMV по всему пулу (similar_post_ids)
+  taste ms   — 5000 кандидатов @ 8 центроидов (_content_scores)
+  recall@k   — доля общих соседей с полной размерностью в top-k
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.vector_projection import PCAProjection   # noqa: E402
+
+
+def synthetic(n: int, dim: int, latent: int, topics: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, latent)).astype(np.float32)
+    Z = centers[rng.integers(0, topics, n)] + 0.7 * rng.standard_normal((n, latent)).astype(np.float32)
+    basis = rng.standard_normal((latent, dim)).astype(np.float32)
+    X = Z @ basis + 0.3 * np.sqrt(latent) * rng.standard_normal((n, dim)).astype(np.float32)
+    return X / np.linalg.norm(X, axis=1, keepdims=True)
+
+
+def timeit(fn, repeat: int) -> float:
+    fn()
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+
+def topk(sims: np.ndarray, anchor: int, k: int) -> set:
+    sims = sims.copy()
+    sims[anchor] = -np.inf
+    return set(np.argpartition(-sims, k)[:k].tolist())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=200_000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--latent', type=int, default=48)
+    parser.add_argument('--dims', type=int, nargs='+', default=[32, 64, 96, 128, 192])
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    X = synthetic(args.n, args.dim, args.latent, topics=64)
+    rng = np.random.default_rng(1)
+    anchors = rng.choice(args.n, size=args.queries, replace=False)
+    cand = X[rng.choice(args.n, size=min(5000, args.n), replace=False)]
+    centroids = X[rng.choice(args.n, size=8, replace=False)]
+
+    exact = X @ X[anchors].T
+    exact_top = [topk(exact[:, q], anchors[q], args.k) for q in range(args.queries)]
+
+    print(f"n={args.n} dim={args.dim} latent={args.latent} k={args.k}")
+    print(f"{'dim':>5} {'variance':>9} {'fit ms':>8} {'similar ms':>11} {'taste ms':>9} {'recall@k':>9}")
+    print(f"{args.dim:5d} {1.0:9.3f} {0.0:8.1f} "
+          f"{timeit(lambda: X @ X[anchors[0]], args.repeat):11.2f} "
+          f"{timeit(lambda: cand @ centroids.T, args.repeat):9.2f} {1.0:9.3f}")
+
+    t0 = time.perf_counter()
+    pca = PCAProjection.fit(X, max(args.dims))
+    fit_ms = (time.perf_counter() - t0) * 1000.0
+
+    for d in sorted(args.dims):
+        Y = pca.transform(X, d)
+        Yc, Ym = pca.transform(cand, d), pca.transform(centroids, d)
+        sims = Y @ Y[anchors].T
+        recall = np.mean([
+            len(exact_top[q] & topk(sims[:, q], anchors[q], args.k)) / args.k
+            for q in range(args.queries)
+        ])
+        print(f"{d:5d} {pca.variance_kept(d):9.3f} {fit_ms:8.1f} "
+              f"{timeit(lambda: Y @ Y[anchors[0]], args.repeat):11.2f} "
+              f"{timeit(lambda: Yc @ Ym.T, args.repeat):9.2f} {recall:9.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+bench/bench_quantized_embeddings.py
+───────────────────────────────────
+Точность и скорость EmbeddingStore в форматах float32 / float16 / int8.
+
+    cd backend && python bench/bench_quantized_embeddings.py --n 200000
+
+Синтетические L2-нормированные вектора с кластерной структурой (как у
+MiniLM: темы + шум). Для каждого формата:
+  memory      — байт под вектора в хранилище
+  lookup      — сборка матрицы кандидатов (ранжирование ленты)
+  taste       — кандидаты @ центроиды вкуса (_content_scores)
+  similar     — GEMV по всему пулу (similar_post_ids)
+  max_err     — максимальная |cos − cos_float32|
+  recall@k    — доля общих соседей с float32 в top-k similar
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.embedding_store import EmbeddingStore, STORE_DTYPES   # noqa: E402
+
+
+def synthetic(n: int, dim: int, topics: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    X = centers[rng.integers(0, topics, n)] + 0.8 * rng.standard_normal((n, dim)).astype(np.float32)
+    return X / np.linalg.norm(X, axis=1, keepdims=True)
+
+
+def timeit(fn, repeat: int) -> float:
+    fn()
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=200_000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--candidates', type=int, default=5000)
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    X = synthetic(args.n, args.dim, topics=64)
+    ids = list(range(args.n))
+    rng = np.random.default_rng(1)
+    cand_ids = rng.choice(args.n, size=min(args.candidates, args.n), replace=False).tolist()
+    centroids = synthetic(8, args.dim, topics=8, seed=2)
+    anchors = rng.choice(args.n, size=args.queries, replace=False)
+
+    exact_sims = X @ X[anchors].T                              # (n, queries)
+    exact_top = [set(np.argsort(-exact_sims[:, q])[1:args.k + 1]) for q in range(args.queries)]
+
+    print(f"n={args.n} dim={args.dim} candidates={len(cand_ids)} k={args.k}")
+    print(f"{'dtype':8} {'memory MB':>10} {'lookup ms':>10} {'taste ms':>9} "
+          f"{'similar ms':>11} {'max_err':>9} {'recall@k':>9}")
+
+    for dtype in STORE_DTYPES:
+        store = EmbeddingStore('bench', ttl=3600, dtype=dtype)
+        store.put(ids, X)
+        full, _, _ = store.lookup(ids)
+        cand, _, _ = store.lookup(cand_ids)
+
+        t_lookup  = timeit(lambda: store.lookup(cand_ids), args.repeat)
+        t_taste   = timeit(lambda: cand @ centroids.T, args.repeat)
+        t_similar = timeit(lambda: full @ X[anchors[0]], args.repeat)
+
+        sims = full @ X[anchors].T
+        max_err = float(np.abs(sims - exact_sims).max())
+        recall = np.mean([
+            len(exact_top[q] & set(np.argsort(-sims[:, q])[1:args.k + 1])) / args.k
+            for q in range(args.queries)
+        ])
+        print(f"{dtype:8} {store.nbytes / 2**20:10.1f} {t_lookup:10.2f} {t_taste:9.2f} "
+              f"{t_similar:11.2f} {max_err:9.5f} {recall:9.3f}")
+
+
+if __name__ == '__main__':
+    main()
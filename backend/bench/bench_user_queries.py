@@ -0,0 +1,171 @@
+"""
+bench/bench_user_queries.py
+───────────────────────────
+Сколько SELECT по таблице user делает один запрос API после
+services/identity.py (viewer резолвится один раз, авторы страницы —
+одним IN-запросом в карту пользователей запроса).
+
+    cd backend && python bench/bench_user_queries.py --db /tmp/niti_queries.db
+
+Запросы идут через test_client с JWT. Счётчик — слушатель
+before_cursor_execute на engine: SELECT, в котором таблица "user" стоит
+во FROM или JOIN. Каждый эндпоинт проходится дважды:
+  before    — прежний путь (legacy_identity): пользователь и авторы по
+              одному через db.session.get, как делали _get_current_user
+              и ленивые post.user / board.creator; prime_users — ничего
+  after     — services/identity.py как есть
+Для каждого эндпоинта:
+  before / after — SELECT по user
+  all sel        — все SELECT запроса (after)
+  limit          — допустимый максимум after (MAX_USER_SELECTS)
+Превышение лимита или after ≥ before — код выхода 1.
+
+На базе по умолчанию (300 пользователей, 3000 постов):
+  feed 21 → 2, trending 20 → 2, comments 20 → 1.
+"""
+import argparse
+import re
+import sys
+from datetime import datetime, timedelta
+
+from _data import bench_app, seed_synthetic
+
+# viewer + IN по авторам (+ IN по авторам пересохранённых оригиналов в ленте)
+MAX_USER_SELECTS = {'feed': 3, 'trending': 2, 'comments': 2}
+
+_USER_TABLE = re.compile(r'\b(FROM|JOIN)\s+"?user"?(\s|$)', re.IGNORECASE)
+
+
+def legacy_identity():
+    """
+    Заменить функции services/identity.py во всех импортировавших их модулях
+    на прежнее поведение. Возвращает функцию, возвращающую всё обратно.
+    """
+    import sys
+    from flask import g
+    from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+    from models import User, db
+    from services import identity
+
+    def get_user(user_id):
+        return db.session.get(User, user_id) if user_id is not None else None
+
+    def prime_users(user_ids):
+        pass
+
+    def current_viewer():
+        try:
+            verify_jwt_in_request(optional=True)
+            raw = get_jwt_identity()
+            if raw:
+                return db.session.get(User, int(raw))
+        except Exception:
+            pass
+        return g.get('current_user')
+
+    legacy = {'get_user': get_user, 'prime_users': prime_users, 'current_viewer': current_viewer}
+    current = {name: getattr(identity, name) for name in legacy}
+    patched = []
+    for module in list(sys.modules.values()):
+        for name, fn in legacy.items():
+            if getattr(module, name, None) is current[name]:
+                patched.append((module, name, getattr(module, name)))
+                setattr(module, name, fn)
+
+    def restore():
+        for module, name, original in patched:
+            setattr(module, name, original)
+    return restore
+
+
+def seed_comments(app, per_post: int) -> int:
+    """Комментарии разных авторов к одному публичному посту; возвращает его id."""
+    from models import db, Comment, Post, User, VisibilityEnum
+
+    with app.app_context():
+        post_id = db.session.scalar(
+            db.select(Post.id).where(Post.visibility == VisibilityEnum.public).order_by(Post.id))
+        if db.session.scalar(db.select(db.func.count()).where(Comment.post_id == post_id)):
+            return post_id
+        user_ids = db.session.scalars(db.select(User.id).order_by(User.id).limit(per_post)).all()
+        now = datetime.utcnow()
+        db.session.execute(db.insert(Comment), [
+            {'content': f'comment {i}', 'post_id': post_id, 'user_id': uid,
+             'created_at': now - timedelta(minutes=i), 'updated_at': now - timedelta(minutes=i)}
+            for i, uid in enumerate(user_ids)
+        ])
+        db.session.commit()
+        return post_id
+
+
+def count_selects(app, url: str, headers: dict) -> tuple[int, int, int]:
+    """(user SELECT, все SELECT, HTTP-статус) одного запроса."""
+    from sqlalchemy import event
+    from models import db
+
+    counts = {'user': 0, 'all': 0}
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            counts['all'] += 1
+            if _USER_TABLE.search(statement):
+                counts['user'] += 1
+
+    with app.app_context():
+        engine = db.engine
+    client = app.test_client()
+    client.get(url, headers=headers)          # прогрев: кеши процесса, индекс тренда
+    event.listen(engine, 'before_cursor_execute', on_execute)
+    try:
+        status = client.get(url, headers=headers).status_code
+    finally:
+        event.remove(engine, 'before_cursor_execute', on_execute)
+    return counts['user'], counts['all'], status
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', default='/tmp/niti_queries.db')
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--posts', type=int, default=3000)
+    parser.add_argument('--comments', type=int, default=40)
+    args = parser.parse_args()
+
+    app = bench_app(args.db)
+    seed_synthetic(app, users=args.users, posts=args.posts)
+    post_id = seed_comments(app, args.comments)
+
+    from flask_jwt_extended import create_access_token
+    from models import db, User
+    from services.trending import trending_index
+    with app.app_context():
+        trending_index.sync()       # refresh() в запросе грузит индекс в фоне
+        viewer_id = db.session.scalar(db.select(User.id).order_by(User.id))
+        headers = {'Authorization': 'Bearer ' + create_access_token(identity=str(viewer_id))}
+
+    endpoints = {
+        'feed':     '/api/posts/feed',
+        'trending': '/api/posts/trending?limit=20',
+        'comments': f'/api/posts/{post_id}/comments?per_page=20',
+    }
+    print(f"users={args.users} posts={args.posts} viewer={viewer_id}")
+    print(f"{'endpoint':>9} {'status':>6} {'before':>7} {'after':>6} {'all sel':>8} {'limit':>6}")
+    failed = []
+    for name, url in endpoints.items():
+        restore = legacy_identity()
+        try:
+            before, _, _ = count_selects(app, url, headers)
+        finally:
+            restore()
+        after, all_sel, status = count_selects(app, url, headers)
+        print(f"{name:>9} {status:>6} {before:>7} {after:>6} {all_sel:>8} {MAX_USER_SELECTS[name]:>6}")
+        if status != 200 or after > MAX_USER_SELECTS[name] or after >= before:
+            failed.append(name)
+    if failed:
+        print(f"FAIL: {', '.join(failed)}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
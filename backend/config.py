@@ -50,6 +50,11 @@ class Config:
     # Пагинация
     POSTS_PER_PAGE = 20
     USERS_PER_PAGE = 20
+
+    # Персональная лента (?algo=ranked)
+    FEED_RANK_POOL = 300          # свежих кандидатов на ранжирование
+    FEED_RANK_BUDGET_MS = 80      # бюджет score_and_rank; дальше — деградация
+    FEED_SNAPSHOT_TTL = 900       # секунд; снимок ранжированной ленты (окно сессии)
     
     # Валидация
     MIN_USERNAME_LENGTH = 3
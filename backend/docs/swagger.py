@@ -311,10 +311,91 @@ def setup_swagger(app):
                         "tags": ["posts"],
                         "parameters": [
                             {"name": "page", "in": "query", "schema": {"type": "integer", "default": 1}},
-                            {"name": "mode", "in": "query", "schema": {"type": "string", "enum": ["balanced", "interests", "content", "serendipity"], "default": "balanced"}}
+                            {"name": "mode", "in": "query", "schema": {"type": "string", "enum": ["balanced", "interests", "content", "serendipity"], "default": "balanced"}},
+                            {"name": "algo", "in": "query", "schema": {"type": "string", "enum": ["chronological", "ranked"], "default": "chronological"}},
+                            {"name": "scope", "in": "query", "description": "following — только подписки и свои посты (нужна авторизация)", "schema": {"type": "string", "enum": ["all", "following"], "default": "all"}}
                         ],
                         "responses": {
-                            "200": {"description": "Список постов"}
+                            "200": {"description": "Список постов; поле algo — уровень ранжирования (chronological, hybrid, hybrid-pop, hybrid-nocontent, mood-fresh, popular)"},
+                            "401": {"description": "scope=following без авторизации"}
+                        }
+                    }
+                },
+                "/posts/trending": {
+                    "get": {
+                        "summary": "Трендовые посты",
+                        "description": "Публичные посты из top-k индекса тренда; window — период полураспада затухающего счёта реакций, комментариев и сохранений",
+                        "tags": ["posts"],
+                        "parameters": [
+                            {"name": "window", "in": "query", "schema": {"type": "string", "enum": ["1h", "24h", "7d"], "default": "24h"}},
+                            {"name": "limit", "in": "query", "schema": {"type": "integer", "default": 20, "maximum": 100}},
+                            {"name": "mood", "in": "query", "schema": {"type": "string", "enum": ["joyful", "calm", "reflective", "energetic", "melancholic", "inspired"]}}
+                        ],
+                        "responses": {
+                            "200": {"description": "Список постов; trendingScore — текущая затухающая популярность"},
+                            "400": {"description": "Неверный mood или window"}
+                        }
+                    }
+                },
+                "/posts/impressions": {
+                    "post": {
+                        "summary": "Отметить посты просмотренными",
+                        "description": "Показанные посты исключаются из следующих снимков ранжированной ленты (algo=ranked)",
+                        "tags": ["posts"],
+                        "security": [{"bearerAuth": []}],
+                        "requestBody": {
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "required": ["postIds"],
+                                        "properties": {"postIds": {"type": "array", "maxItems": 500, "items": {"type": "integer"}}}
+                                    }
+                                }
+                            }
+                        },
+                        "responses": {
+                            "200": {"description": "OK; seen — сколько постов сейчас считаются просмотренными"},
+                            "401": {"description": "Не авторизован"},
+                            "422": {"description": "Неверный список postIds"}
+                        }
+                    }
+                },
+                "/events/batch": {
+                    "post": {
+                        "summary": "Пачка событий вовлечённости",
+                        "description": "Показы, клики и время просмотра. Запись в БД асинхронная (буфер сбрасывается пачками); показы авторизованного пользователя исключаются из ранжированной ленты после сброса",
+                        "tags": ["posts"],
+                        "security": [{"bearerAuth": []}],
+                        "requestBody": {
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "required": ["events"],
+                                        "properties": {
+                                            "events": {
+                                                "type": "array",
+                                                "maxItems": 500,
+                                                "items": {
+                                                    "type": "object",
+                                                    "required": ["type", "postId"],
+                                                    "properties": {
+                                                        "type": {"type": "string", "enum": ["impression", "click", "dwell"]},
+                                                        "postId": {"type": "integer"},
+                                                        "dwellMs": {"type": "integer", "description": "Обязателен для dwell"},
+                                                        "ts": {"type": "integer", "description": "Время клиента, мс с эпохи Unix"}
+                                                    }
+                                                }
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        },
+                        "responses": {
+                            "202": {"description": "Принято в буфер; accepted — число событий"},
+                            "422": {"description": "Неверное событие в пачке"}
                         }
                     }
                 },
@@ -379,10 +460,25 @@ def setup_swagger(app):
                         }
                     }
                 },
+                "/posts/{post_id}/similar": {
+                    "get": {
+                        "summary": "Похожие посты",
+                        "description": "Публичные посты, близкие по эмбеддингам (без своих постов зрителя)",
+                        "tags": ["posts"],
+                        "parameters": [
+                            {"name": "post_id", "in": "path", "required": True, "schema": {"type": "integer"}},
+                            {"name": "limit", "in": "query", "schema": {"type": "integer", "default": 12, "maximum": 50}}
+                        ],
+                        "responses": {
+                            "200": {"description": "Список постов"},
+                            "404": {"description": "Пост не найден"}
+                        }
+                    }
+                },
                 "/posts/{post_id}/image": {
                     "post": {
                         "summary": "Загрузить изображение",
-                        "description": "Загрузить или сменить изображение поста",
+                        "description": "Загрузить или сменить изображение поста. Копии (160/400/800/1600 px, WebP + формат оригинала) считаются в фоне: в ответе content.imageStatus = pending и нет imagePreviewUrl / srcset, пока они не готовы (затем ready / failed). srcset — [{url, width, height, type}] по возрастанию ширины",
                         "tags": ["posts"],
                         "security": [{"bearerAuth": []}],
                         "parameters": [
@@ -402,7 +498,7 @@ def setup_swagger(app):
                             }
                         },
                         "responses": {
-                            "200": {"description": "Изображение загружено"},
+                            "200": {"description": "Оригинал сохранён; пост с content.imageStatus"},
                             "400": {"description": "Недопустимый формат"},
                             "413": {"description": "Файл слишком большой"}
                         }
@@ -497,6 +593,21 @@ def setup_swagger(app):
                         }
                     }
                 },
+                "/boards/{board_id}/similar": {
+                    "get": {
+                        "summary": "Похожие доски",
+                        "description": "Публичные доски, близкие по эмбеддингам (без своих досок зрителя)",
+                        "tags": ["boards"],
+                        "parameters": [
+                            {"name": "board_id", "in": "path", "required": True, "schema": {"type": "integer"}},
+                            {"name": "limit", "in": "query", "schema": {"type": "integer", "default": 6, "maximum": 50}}
+                        ],
+                        "responses": {
+                            "200": {"description": "Список досок"},
+                            "404": {"description": "Доска не найдена"}
+                        }
+                    }
+                },
                 "/boards/{board_id}/follow": {
                     "post": {
                         "summary": "Подписаться на доску",
@@ -0,0 +1,41 @@
+"""
+gunicorn.conf.py — конфигурация production-сервера.
+
+    cd backend && gunicorn -c gunicorn.conf.py wsgi:application
+
+preload_app=True: приложение и прогретые кеши данных загружаются один раз
+в master (см. wsgi.py) и делятся воркерами copy-on-write. Модель энкодера
+(~90 MB) и вектора каждый воркер грузит сам после fork, в фоне: torch /
+OpenMP не переживают fork. Одна модель на хост — только через sidecar
+(RECO_ENCODER_SOCKET, services/embedding_sidecar.py).
+
+Стартовый отчёт в логе:
+  [wsgi]     master memory before/after preload
+  [gunicorn] worker <pid> memory after fork / after init
+PSS ≪ RSS сразу после fork означает, что кеши данных действительно общие;
+рост private после init — в основном собственная модель воркера.
+"""
+import multiprocessing
+import os
+
+bind    = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 4)))
+threads = int(os.environ.get('GUNICORN_THREADS', 2))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+
+preload_app = True
+
+accesslog = '-'
+errorlog  = '-'
+loglevel  = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    from wsgi import memory_snapshot, format_memory
+    server.log.info(f"[gunicorn] worker {worker.pid} memory after fork: {format_memory(memory_snapshot())}")
+
+
+def post_worker_init(worker):
+    from wsgi import memory_snapshot, format_memory, warmup_worker
+    warmup_worker()
+    worker.log.info(f"[gunicorn] worker {worker.pid} memory after init: {format_memory(memory_snapshot())}")
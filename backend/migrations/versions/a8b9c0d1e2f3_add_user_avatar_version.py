@@ -0,0 +1,38 @@
+"""add user.avatar_version
+
+Revision ID: a8b9c0d1e2f3
+Revises: f7a8b9c0d1e2
+Create Date: 2026-10-19 19:00:00.000000
+
+Добавляет колонку:
+  - user.avatar_version — 0: дефолтный аватар, >0: время загрузки своего файла,
+    NULL: не проверено (проставляет python -m services.avatars)
+
+Пользователи без своего аватара сразу получают 0; остальные остаются NULL
+до backfill — до него URL считается по наличию файла (с LRU-кешем).
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'a8b9c0d1e2f3'
+down_revision = 'f7a8b9c0d1e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('avatar_version', sa.Integer(), nullable=True))
+
+    op.execute(
+        "UPDATE \"user\" SET avatar_version = 0 "
+        "WHERE avatar IS NULL OR avatar = '' OR avatar = 'default_avatar.png'"
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('avatar_version')
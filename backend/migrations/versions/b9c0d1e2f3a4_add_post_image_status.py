@@ -0,0 +1,36 @@
+"""add post.image_status
+
+Revision ID: b9c0d1e2f3a4
+Revises: a8b9c0d1e2f3
+Create Date: 2026-10-19 20:00:00.000000
+
+Добавляет колонку:
+  - post.image_status (pending | ready | failed) — статус фоновой генерации
+    превью; NULL у постов без изображения и у загруженных раньше
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'b9c0d1e2f3a4'
+down_revision = 'a8b9c0d1e2f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    image_status_enum = sa.Enum('pending', 'ready', 'failed', name='imagestatusenum')
+    image_status_enum.create(op.get_bind(), checkfirst=True)
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_status', image_status_enum, nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_column('image_status')
+
+    # Удаляем тип enum (нужно для PostgreSQL; SQLite игнорирует)
+    sa.Enum(name='imagestatusenum').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,31 @@
+"""add post.image_renditions
+
+Revision ID: c0d1e2f3a4b5
+Revises: b9c0d1e2f3a4
+Create Date: 2026-10-19 21:00:00.000000
+
+Добавляет колонку:
+  - post.image_renditions (JSON) — копии изображения по ширинам
+    [{"url", "width", "height", "format"}]; NULL — копий нет
+    (досчитать для старых постов: python -m services.renditions --backfill)
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'c0d1e2f3a4b5'
+down_revision = 'b9c0d1e2f3a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_renditions', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_column('image_renditions')
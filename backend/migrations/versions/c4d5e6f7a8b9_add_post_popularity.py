@@ -0,0 +1,48 @@
+"""add post_popularity
+
+Revision ID: c4d5e6f7a8b9
+Revises: a1b2c3d4e5f6
+Create Date: 2026-10-19 12:00:00.000000
+
+Создаёт таблицу:
+  - post_popularity (post_id PK → post.id, log_score, updated_at)
+    — затухающая популярность в форме log_score = ln(score) + λ·t
+
+Индексы:
+  - ix_post_popularity_log_score (тренд = ORDER BY log_score DESC)
+
+После миграции: python -m services.popularity (backfill из reaction).
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'c4d5e6f7a8b9'
+down_revision = 'a1b2c3d4e5f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'post_popularity',
+        sa.Column('post_id',    sa.Integer(),  nullable=False),
+        sa.Column('log_score',  sa.Float(),    nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+
+        sa.PrimaryKeyConstraint('post_id', name='pk_post_popularity'),
+
+        sa.ForeignKeyConstraint(
+            ['post_id'], ['post.id'],
+            name='fk_post_popularity_post_id_post',
+            ondelete='CASCADE',
+        ),
+    )
+    op.create_index('ix_post_popularity_log_score', 'post_popularity', ['log_score'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_post_popularity_log_score', table_name='post_popularity')
+    op.drop_table('post_popularity')
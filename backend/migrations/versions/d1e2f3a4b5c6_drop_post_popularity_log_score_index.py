@@ -0,0 +1,28 @@
+"""drop ix_post_popularity_log_score
+
+Revision ID: d1e2f3a4b5c6
+Revises: c0d1e2f3a4b5
+Create Date: 2026-10-20 10:00:00.000000
+
+Удаляет индекс:
+  - ix_post_popularity_log_score — ORDER BY log_score больше никто не читает
+    (тренды считает services/trending.py в памяти), а индекс обновлялся на
+    каждой реакции, комментарии и сохранении
+"""
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'd1e2f3a4b5c6'
+down_revision = 'c0d1e2f3a4b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index('ix_post_popularity_log_score', table_name='post_popularity')
+
+
+def downgrade() -> None:
+    op.create_index('ix_post_popularity_log_score', 'post_popularity', ['log_score'])
@@ -0,0 +1,54 @@
+"""add timeline_entries
+
+Revision ID: d5e6f7a8b9c0
+Revises: c4d5e6f7a8b9
+Create Date: 2026-10-19 14:00:00.000000
+
+Создаёт таблицу:
+  - timeline_entries (user_id, post_id, created_at) — fan-out домашней ленты
+    PK (user_id, post_id)
+
+Индексы:
+  - ix_timeline_entries_user_created (user_id, created_at) — чтение ленты
+
+После миграции: python -m services.timeline (первичное заполнение).
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'd5e6f7a8b9c0'
+down_revision = 'c4d5e6f7a8b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'timeline_entries',
+        sa.Column('user_id',    sa.Integer(),  nullable=False),
+        sa.Column('post_id',    sa.Integer(),  nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+
+        sa.PrimaryKeyConstraint('user_id', 'post_id', name='pk_timeline_entries'),
+
+        sa.ForeignKeyConstraint(
+            ['user_id'], ['user.id'],
+            name='fk_timeline_entries_user_id_user',
+            ondelete='CASCADE',
+        ),
+        sa.ForeignKeyConstraint(
+            ['post_id'], ['post.id'],
+            name='fk_timeline_entries_post_id_post',
+            ondelete='CASCADE',
+        ),
+    )
+    op.create_index('ix_timeline_entries_user_created', 'timeline_entries',
+                    ['user_id', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_timeline_entries_user_created', table_name='timeline_entries')
+    op.drop_table('timeline_entries')
@@ -0,0 +1,28 @@
+"""add ix_timeline_entries_post_id
+
+Revision ID: e2f3a4b5c6d7
+Revises: d1e2f3a4b5c6
+Create Date: 2026-10-20 12:00:00.000000
+
+Добавляет индекс:
+  - ix_timeline_entries_post_id — удаление поста вычищает его записи из всех
+    лент (services/timeline.py: prune_post); первичный ключ (user_id, post_id)
+    для поиска по post_id не подходит
+"""
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e2f3a4b5c6d7'
+down_revision = 'd1e2f3a4b5c6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_timeline_entries_post_id', 'timeline_entries', ['post_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_timeline_entries_post_id', table_name='timeline_entries')
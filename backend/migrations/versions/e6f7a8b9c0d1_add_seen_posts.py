@@ -0,0 +1,43 @@
+"""add seen_posts
+
+Revision ID: e6f7a8b9c0d1
+Revises: d5e6f7a8b9c0
+Create Date: 2026-10-19 16:00:00.000000
+
+Создаёт таблицу:
+  - seen_posts (user_id PK → user.id, current, previous, rotated_at, updated_at)
+    — два поколения сжатого bitmap показанных постов
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e6f7a8b9c0d1'
+down_revision = 'd5e6f7a8b9c0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'seen_posts',
+        sa.Column('user_id',    sa.Integer(),     nullable=False),
+        sa.Column('current',    sa.LargeBinary(), nullable=True),
+        sa.Column('previous',   sa.LargeBinary(), nullable=True),
+        sa.Column('rotated_at', sa.DateTime(),    nullable=False),
+        sa.Column('updated_at', sa.DateTime(),    nullable=False),
+
+        sa.PrimaryKeyConstraint('user_id', name='pk_seen_posts'),
+
+        sa.ForeignKeyConstraint(
+            ['user_id'], ['user.id'],
+            name='fk_seen_posts_user_id_user',
+            ondelete='CASCADE',
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('seen_posts')
@@ -0,0 +1,51 @@
+"""add engagement_event
+
+Revision ID: f7a8b9c0d1e2
+Revises: e6f7a8b9c0d1
+Create Date: 2026-10-19 18:00:00.000000
+
+Создаёт таблицу:
+  - engagement_event (id, event_type, post_id, user_id, dwell_ms,
+                      occurred_at, received_at) — append-only журнал
+
+Индексы:
+  - ix_engagement_event_post_id, ix_engagement_event_user_id
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'f7a8b9c0d1e2'
+down_revision = 'e6f7a8b9c0d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    event_type_enum = sa.Enum('impression', 'click', 'dwell', name='eventtypeenum')
+
+    op.create_table(
+        'engagement_event',
+        sa.Column('id',          sa.Integer(),    nullable=False),
+        sa.Column('event_type',  event_type_enum, nullable=False),
+        sa.Column('post_id',     sa.Integer(),    nullable=False),
+        sa.Column('user_id',     sa.Integer(),    nullable=True),
+        sa.Column('dwell_ms',    sa.Integer(),    nullable=True),
+        sa.Column('occurred_at', sa.DateTime(),   nullable=False),
+        sa.Column('received_at', sa.DateTime(),   nullable=False),
+
+        sa.PrimaryKeyConstraint('id', name='pk_engagement_event'),
+    )
+    op.create_index('ix_engagement_event_post_id', 'engagement_event', ['post_id'])
+    op.create_index('ix_engagement_event_user_id', 'engagement_event', ['user_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_engagement_event_user_id', table_name='engagement_event')
+    op.drop_index('ix_engagement_event_post_id', table_name='engagement_event')
+    op.drop_table('engagement_event')
+
+    # Удаляем тип enum (нужно для PostgreSQL; SQLite игнорирует)
+    sa.Enum(name='eventtypeenum').drop(op.get_bind(), checkfirst=True)
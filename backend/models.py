@@ -24,6 +24,19 @@ convention = {
 }
 db = SQLAlchemy(metadata=MetaData(naming_convention=convention))
 
+
+def dialect_insert(model):
+    """
+    insert(model) диалекта текущей БД: с on_conflict_do_nothing /
+    on_conflict_do_update (ON CONFLICT есть и в SQLite, и в PostgreSQL).
+    """
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
 # ── Подписки на пользователей (many-to-many) ─────────────────
 follows = db.Table('follows',
     db.Column('follower_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
@@ -60,6 +73,9 @@ class User(db.Model):
     email = db.Column(db.String(255), unique=True, nullable=True, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
     avatar = db.Column(db.String(255), nullable=True, default='default_avatar.png')
+    # Версия аватара (services/avatars.py): 0 — дефолтный, >0 — время загрузки
+    # своего файла, NULL — старая строка, наличие файла ещё не проверено
+    avatar_version = db.Column(db.Integer, nullable=True, default=0)
     bio = db.Column(db.String(300), nullable=True, default='')
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -223,6 +239,12 @@ class VisibilityEnum(str, enum.Enum):
     private = 'private'
 
 
+class ImageStatusEnum(str, enum.Enum):
+    pending = 'pending'   # оригинал сохранён, превью считается в фоне
+    ready   = 'ready'
+    failed  = 'failed'    # превью не получилось — клиент показывает оригинал
+
+
 # ── Типы реакций ──────────────────────────────────────────────────────────────
 
 class ReactionTypeEnum(str, enum.Enum):
@@ -271,6 +293,11 @@ class Post(db.Model):
 
     image_url         = db.Column(db.String(500), nullable=True)
     image_preview_url = db.Column(db.String(500), nullable=True)
+    # Статус фоновой генерации превью (services/renditions.py);
+    # NULL — нет изображения или загружено до фоновой генерации
+    image_status      = db.Column(db.Enum(ImageStatusEnum), nullable=True)
+    # Лестница копий [{"url", "width", "height", "format"}] по возрастанию ширины
+    image_renditions  = db.Column(db.JSON(none_as_null=True), nullable=True)
 
     mood       = db.Column(db.Enum(MoodEnum), nullable=True)
     visibility = db.Column(db.Enum(VisibilityEnum), nullable=False,
@@ -392,3 +419,113 @@ class Reaction(db.Model):
             f'<Reaction {self.reaction_type.value} '
             f'by user={self.user_id} on post={self.post_id}>'
         )
+
+
+# ── Популярность постов ───────────────────────────────────────────────────────
+
+class PostPopularity(db.Model):
+    """
+    Экспоненциально затухающая популярность поста (services/popularity.py).
+
+    Хранится в «forward decay» форме: log_score = ln(score) + λ·t, где t —
+    часы от POPULARITY_EPOCH. Порядок по log_score не зависит от текущего
+    момента, а событие меняет строку одним UPDATE без чтения.
+    """
+    __tablename__ = 'post_popularity'
+
+    post_id = db.Column(
+        db.Integer,
+        db.ForeignKey('post.id', ondelete='CASCADE'),
+        primary_key=True,
+    )
+    log_score  = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    post = db.relationship(
+        'Post',
+        backref=db.backref('popularity', uselist=False, cascade='all, delete-orphan'),
+    )
+
+    def __repr__(self) -> str:
+        return f'<PostPopularity post={self.post_id} log={self.log_score:.3f}>'
+
+
+# ── Материализованная домашняя лента ─────────────────────────────────────────
+
+class TimelineEntry(db.Model):
+    """
+    Строка домашней ленты подписчика (fan-out on write, services/timeline.py).
+    created_at копируется из поста: лента ?scope=following — диапазонный
+    скан по индексу (user_id, created_at) без IN по подпискам.
+    """
+    __tablename__ = 'timeline_entries'
+
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey('user.id', ondelete='CASCADE'),
+        primary_key=True,
+    )
+    post_id = db.Column(
+        db.Integer,
+        db.ForeignKey('post.id', ondelete='CASCADE'),
+        primary_key=True,
+    )
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_timeline_entries_user_created', 'user_id', 'created_at'),
+        db.Index('ix_timeline_entries_post_id', 'post_id'),   # удаление поста
+    )
+
+    def __repr__(self) -> str:
+        return f'<TimelineEntry user={self.user_id} post={self.post_id}>'
+
+
+# ── Просмотренные посты ───────────────────────────────────────────────────────
+
+class SeenPosts(db.Model):
+    """
+    Показанные пользователю посты: два поколения сжатого bitmap
+    (services/seen_filter.py). Ранкер исключает их из кандидатов.
+    """
+    __tablename__ = 'seen_posts'
+
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey('user.id', ondelete='CASCADE'),
+        primary_key=True,
+    )
+    current    = db.Column(db.LargeBinary, nullable=True)
+    previous   = db.Column(db.LargeBinary, nullable=True)
+    rotated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f'<SeenPosts user={self.user_id}>'
+
+
+# ── События вовлечённости ─────────────────────────────────────────────────────
+
+class EventTypeEnum(str, enum.Enum):
+    impression = 'impression'   # пост показан
+    click      = 'click'        # открыт / развёрнут
+    dwell      = 'dwell'        # время просмотра, dwell_ms
+
+
+class EngagementEvent(db.Model):
+    """
+    Append-only журнал показов / кликов / времени просмотра.
+    Пишется пачками из буфера (services/event_buffer.py), не из запроса.
+    """
+    __tablename__ = 'engagement_event'
+
+    id          = db.Column(db.Integer, primary_key=True)
+    event_type  = db.Column(db.Enum(EventTypeEnum), nullable=False)
+    post_id     = db.Column(db.Integer, nullable=False, index=True)   # без FK: журнал переживает пост
+    user_id     = db.Column(db.Integer, nullable=True, index=True)    # None — гость
+    dwell_ms    = db.Column(db.Integer, nullable=True)
+    occurred_at = db.Column(db.DateTime, nullable=False)              # время клиента (≤ received_at)
+    received_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        return f'<EngagementEvent {self.event_type.value} post={self.post_id} user={self.user_id}>'
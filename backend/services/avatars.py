@@ -0,0 +1,90 @@
+"""
+services/avatars.py
+───────────────────
+Есть ли у пользователя свой аватар — без stat() на каждую сериализацию.
+
+Состояние хранится в user.avatar_version и меняется только при загрузке
+и сбросе аватара (api/users.py):
+  0     — дефолтный аватар (SVG с буквой)
+  > 0   — свой файл user.avatar, значение — время загрузки (cache-buster)
+  NULL  — строка до миграции: наличие файла проверяется os.path.isfile
+          один раз на имя файла (LRU на AVATAR_STAT_CACHE_SIZE имён)
+
+После миграции — разовый backfill: python -m services.avatars
+"""
+from __future__ import annotations
+
+import os
+import time
+from functools import lru_cache
+from typing import Optional
+
+DEFAULT_AVATAR = 'default_avatar.png'
+AVATAR_STAT_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=AVATAR_STAT_CACHE_SIZE)
+def _file_exists(folder: str, filename: str) -> bool:
+    return os.path.isfile(os.path.join(folder, filename))
+
+
+def _is_custom(filename: Optional[str]) -> bool:
+    return bool(filename) and filename != DEFAULT_AVATAR and not filename.startswith('data:')
+
+
+def has_custom_avatar(user, folder: str) -> bool:
+    """Свой файл аватара есть (по avatar_version, для старых строк — по LRU stat)."""
+    version = user.avatar_version
+    if version is not None:
+        return version > 0 and _is_custom(user.avatar)
+    return _is_custom(user.avatar) and _file_exists(folder, user.avatar)
+
+
+def set_uploaded(user, filename: str) -> None:
+    """Новый файл аватара сохранён; коммитит вызывающий."""
+    user.avatar = filename
+    user.avatar_version = int(time.time())
+
+
+def set_default(user) -> None:
+    """Аватар сброшен на дефолтный; коммитит вызывающий."""
+    user.avatar = DEFAULT_AVATAR
+    user.avatar_version = 0
+    _file_exists.cache_clear()
+
+
+def backfill(folder: str) -> tuple[int, int]:
+    """
+    Проставить avatar_version строкам с NULL по наличию файла.
+    Возвращает (своих аватаров, дефолтных).
+    """
+    from models import User, db
+
+    custom, default = [], []
+    rows = db.session.execute(
+        db.select(User.id, User.avatar).where(User.avatar_version.is_(None))
+    ).all()
+    for user_id, filename in rows:
+        path = os.path.join(folder, filename) if _is_custom(filename) else None
+        if path and os.path.isfile(path):
+            custom.append({'id': user_id, 'avatar_version': int(os.path.getmtime(path))})
+        else:
+            default.append({'id': user_id, 'avatar_version': 0})
+    if custom or default:
+        db.session.execute(db.update(User), custom + default)
+    db.session.commit()
+    _file_exists.cache_clear()
+    return len(custom), len(default)
+
+
+def main() -> None:
+    """python -m services.avatars — разовый backfill после миграции."""
+    from app import app
+
+    with app.app_context():
+        custom, default = backfill(app.config['UPLOAD_FOLDER'])
+    print(f"[Avatars] backfilled {custom + default} users ({custom} custom, {default} default)")
+
+
+if __name__ == '__main__':
+    main()
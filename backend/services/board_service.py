@@ -8,6 +8,7 @@ from __future__ import annotations
 from typing import Optional
 from models import db, Board, User
 from repositories.board_repository import BoardRepository
+from services.identity import get_user
 from utils import get_avatar_url
 
 
@@ -19,6 +20,7 @@ def board_to_dict(board: Board, current_user: Optional[User] = None) -> dict:
         if current_user and current_user.id != board.creator_id
         else False
     )
+    creator = get_user(board.creator_id)
     return {
         'id': str(board.id),
         'name': board.name,
@@ -32,8 +34,8 @@ def board_to_dict(board: Board, current_user: Optional[User] = None) -> dict:
         'isFollowing': is_following,
         'creator': {
             'id': str(board.creator_id),
-            'username': f'@{board.creator.username}',
-            'avatar': get_avatar_url(board.creator),
+            'username': f'@{creator.username}',
+            'avatar': get_avatar_url(creator),
         },
     }
 
@@ -10,6 +10,8 @@ from typing import Optional
 
 from models import db, Comment, Post
 from repositories.comment_repository import CommentRepository
+from services.identity import get_user, prime_users
+from services.popularity import record_event
 from utils import get_avatar_url
 
 
@@ -17,7 +19,7 @@ from utils import get_avatar_url
 
 def comment_to_dict(comment: Comment, viewer_id: Optional[int] = None) -> dict:
     """Преобразовать Comment в JSON-совместимый dict."""
-    author = comment.user
+    author = get_user(comment.user_id)
     return {
         'id':         comment.id,
         'content':    comment.content,
@@ -55,6 +57,7 @@ class CommentService:
             raise ValueError('Пост не найден')
 
         pagination = CommentRepository.get_paginated_for_post(post_id, page, per_page)
+        prime_users(c.user_id for c in pagination.items)
         items = [comment_to_dict(c, viewer_id) for c in pagination.items]
         meta = {
             'page':     page,
@@ -78,6 +81,7 @@ class CommentService:
             raise ValueError('Пост не найден')
 
         comment = CommentRepository.create(post_id, user_id, content)
+        record_event(post_id, 'comment')
         db.session.commit()
         return comment
 
@@ -121,5 +125,6 @@ class CommentService:
         if comment.user_id != user_id:
             raise PermissionError('Нет прав на удаление этого комментария')
 
+        record_event(comment.post_id, 'comment', added=False, at=comment.created_at)
         CommentRepository.delete(comment)
         db.session.commit()
@@ -0,0 +1,320 @@
+"""
+services/embedding_sidecar.py
+─────────────────────────────
+Embedding sidecar: один процесс на хост владеет энкодером и обслуживает
+encode(texts) по unix-сокету для всех воркеров WSGI-сервера.
+
+    cd backend && python -m services.embedding_sidecar --socket /tmp/niti-embed.sock
+    RECO_ENCODER_SOCKET=/tmp/niti-embed.sock gunicorn -c gunicorn.conf.py wsgi:application
+
+  - Модель в RAM ровно один раз на хост (а не в каждом воркере)
+  - Micro-batching: запросы всех соединений копятся до max_batch текстов
+    или max_wait_ms с первого запроса и кодируются одним вызовом
+  - Без sentence-transformers sidecar отдаёт hashing-вектора — то же
+    пространство, что и у локального fallback (общая матрица проекции)
+  - Sidecar умер: после RECO_SIDECAR_MAX_FAILURES ошибок сокета подряд
+    воркер переходит на энкодер в процессе
+
+Протокол (на одном соединении — последовательные запрос/ответ):
+  кадр   = >II (длина JSON-заголовка, длина payload) + заголовок + payload
+  запрос = {"op": "encode", "n": N} + N текстов UTF-8 через '\\0'
+         | {"op": "info"}
+  ответ  = {"n": N, "dim": D} + N·D float32 (little-endian)
+         | {"error": "..."}
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SIDECAR_MAX_BATCH   = int(os.environ.get('RECO_SIDECAR_MAX_BATCH', 128))
+SIDECAR_MAX_WAIT_MS = float(os.environ.get('RECO_SIDECAR_MAX_WAIT_MS', 5))
+SIDECAR_TIMEOUT     = 30.0   # секунд на один запрос со стороны клиента
+
+_FRAME = struct.Struct('>II')
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Кадры
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _send_frame(sock: socket.socket, header: dict, payload: bytes = b'') -> None:
+    head = json.dumps(header).encode('utf-8')
+    sock.sendall(_FRAME.pack(len(head), len(payload)) + head + payload)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(min(n - len(buf), 1 << 20))
+        if not chunk:
+            raise ConnectionError('socket closed')
+        buf += chunk
+    return bytes(buf)
+
+
+def _recv_frame(sock: socket.socket) -> tuple[dict, bytes]:
+    head_len, payload_len = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+    header = json.loads(_recv_exact(sock, head_len))
+    payload = _recv_exact(sock, payload_len) if payload_len else b''
+    return header, payload
+
+
+def _pack_texts(texts: list[str]) -> bytes:
+    return '\0'.join(t.replace('\0', ' ') for t in texts).encode('utf-8')
+
+
+def _unpack_texts(payload: bytes, n: int) -> list[str]:
+    if n == 0:
+        return []
+    texts = payload.decode('utf-8').split('\0')
+    if len(texts) != n:
+        raise ValueError(f'expected {n} texts, got {len(texts)}')
+    return texts
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Клиент (внутри воркеров)
+# ─────────────────────────────────────────────────────────────────────────────
+
+class SidecarEncoder:
+    """
+    Клиент sidecar с интерфейсом SentenceTransformer.encode — движок
+    рекомендаций использует его вместо локальной модели без изменений.
+    Соединение открывается лениво и заново после fork (проверка pid).
+    """
+
+    def __init__(self, path: str, timeout: float = SIDECAR_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def info(self) -> dict:
+        header, _ = self._call({'op': 'info'})
+        return header
+
+    def encode(self, texts: list[str], batch_size: Optional[int] = None,
+               show_progress_bar: bool = False,
+               normalize_embeddings: bool = True) -> np.ndarray:
+        """(n, dim) float32. Нормировку и батчинг делает sidecar."""
+        texts = list(texts)
+        header, payload = self._call({'op': 'encode', 'n': len(texts)}, _pack_texts(texts))
+        vecs = np.frombuffer(payload, dtype='<f4').astype(np.float32, copy=False)
+        return vecs.reshape(header['n'], header['dim'])
+
+    def close(self) -> None:
+        with self._lock:
+            self._reset()
+
+    # ── Внутреннее ────────────────────────────────────────────────────────────
+
+    def _connect(self) -> socket.socket:
+        if self._sock is None or self._pid != os.getpid():
+            # Сокет, унаследованный от master после fork, не используем
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.settimeout(self.timeout)
+            self._sock.connect(self.path)
+            self._pid = os.getpid()
+        return self._sock
+
+    def _reset(self) -> None:
+        if self._sock is not None and self._pid == os.getpid():
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+
+    def _call(self, header: dict, payload: bytes = b'') -> tuple[dict, bytes]:
+        with self._lock:
+            # Одна повторная попытка: sidecar мог перезапуститься
+            for attempt in (0, 1):
+                try:
+                    sock = self._connect()
+                    _send_frame(sock, header, payload)
+                    resp, data = _recv_frame(sock)
+                    break
+                except (OSError, ConnectionError):
+                    self._reset()
+                    if attempt:
+                        raise
+        if 'error' in resp:
+            raise RuntimeError(f"embedding sidecar: {resp['error']}")
+        return resp, data
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Сервер
+# ─────────────────────────────────────────────────────────────────────────────
+
+class _Job:
+    __slots__ = ('texts', 'done', 'result', 'error')
+
+    def __init__(self, texts: list[str]):
+        self.texts = texts
+        self.done = threading.Event()
+        self.result: Optional[np.ndarray] = None
+        self.error: Optional[Exception] = None
+
+
+class MicroBatcher:
+    """
+    Копит запросы всех соединений и кодирует их одним вызовом:
+    батч закрывается на max_batch текстах или через max_wait_ms
+    после первого запроса — что наступит раньше.
+    """
+
+    def __init__(self, encode_fn: Callable[[list[str]], np.ndarray],
+                 max_batch: int = SIDECAR_MAX_BATCH,
+                 max_wait_ms: float = SIDECAR_MAX_WAIT_MS):
+        self._encode = encode_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: queue.Queue[_Job] = queue.Queue()
+        self.batches = 0
+        self.texts = 0
+        threading.Thread(target=self._run, name='sidecar-batcher', daemon=True).start()
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        job = _Job(texts)
+        self._queue.put(job)
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _take_batch(self) -> list[_Job]:
+        jobs = [self._queue.get()]
+        n = len(jobs[0].texts)
+        deadline = time.monotonic() + self.max_wait
+        while n < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            jobs.append(job)
+            n += len(job.texts)
+        return jobs
+
+    def _run(self) -> None:
+        while True:
+            jobs = self._take_batch()
+            texts = [t for job in jobs for t in job.texts]
+            try:
+                vecs = np.asarray(self._encode(texts), dtype=np.float32) if texts else None
+                offset = 0
+                for job in jobs:
+                    job.result = (vecs[offset:offset + len(job.texts)] if vecs is not None
+                                  else np.zeros((0, 0), dtype=np.float32))
+                    offset += len(job.texts)
+                self.batches += 1
+                self.texts += len(texts)
+            except Exception as exc:
+                logger.warning(f"[EmbeddingSidecar] batch of {len(texts)} failed: {exc}")
+                for job in jobs:
+                    job.error = exc
+            finally:
+                for job in jobs:
+                    job.done.set()
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        server: SidecarServer = self.server   # type: ignore[assignment]
+        while True:
+            try:
+                header, payload = _recv_frame(self.request)
+            except (ConnectionError, OSError, ValueError):
+                return
+            try:
+                if header.get('op') == 'info':
+                    _send_frame(self.request, {**server.info,
+                                               'batches': server.batcher.batches,
+                                               'texts': server.batcher.texts})
+                elif header.get('op') == 'encode':
+                    texts = _unpack_texts(payload, int(header.get('n', 0)))
+                    vecs = server.batcher.encode(texts)
+                    _send_frame(self.request, {'n': len(texts), 'dim': int(vecs.shape[1]) if len(texts) else 0},
+                                vecs.astype('<f4', copy=False).tobytes())
+                else:
+                    _send_frame(self.request, {'error': f"unknown op {header.get('op')!r}"})
+            except (ConnectionError, OSError):
+                return
+            except Exception as exc:
+                try:
+                    _send_frame(self.request, {'error': str(exc)})
+                except OSError:
+                    return
+
+
+class SidecarServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, batcher: MicroBatcher, info: dict):
+        if os.path.exists(path):
+            os.unlink(path)   # сокет от упавшего процесса
+        self.batcher = batcher
+        self.info = info
+        super().__init__(path, _Handler)
+        os.chmod(path, 0o660)
+
+
+def _local_encode_fn() -> tuple[Callable[[list[str]], np.ndarray], dict]:
+    """Энкодер sidecar: MiniLM, а без него — тот же hashing-fallback, что у движка."""
+    from services.recommendation_engine import (
+        _load_local_encoder, _fallback_embed, _get_fallback_vectorizer,
+    )
+    model = _load_local_encoder()
+    if model is None:
+        _get_fallback_vectorizer()
+        dim = int(_fallback_embed(['']).shape[1])
+        return _fallback_embed, {'encoder': 'hashing', 'dim': dim}
+
+    def encode(texts: list[str]) -> np.ndarray:
+        return model.encode(texts, batch_size=SIDECAR_MAX_BATCH,
+                            show_progress_bar=False, normalize_embeddings=True)
+
+    return encode, {'encoder': 'minilm', 'dim': int(model.get_sentence_embedding_dimension())}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='NITI embedding sidecar')
+    parser.add_argument('--socket', default=os.environ.get('RECO_ENCODER_SOCKET', '/tmp/niti-embed.sock'))
+    parser.add_argument('--max-batch', type=int, default=SIDECAR_MAX_BATCH)
+    parser.add_argument('--max-wait-ms', type=float, default=SIDECAR_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    encode_fn, info = _local_encode_fn()
+    batcher = MicroBatcher(encode_fn, args.max_batch, args.max_wait_ms)
+    server = SidecarServer(args.socket, batcher, info)
+    logger.info(f"[EmbeddingSidecar] serving {info} on {args.socket} "
+                f"(max_batch={args.max_batch}, max_wait={args.max_wait_ms}ms)")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+"""
+services/embedding_store.py
+───────────────────────────
+In-memory хранилище эмбеддингов (id → вектор) для движка рекомендаций.
+
+  - Потокобезопасно: пишет фоновый EmbeddingWorker, читают потоки запросов
+  - Stale-while-revalidate: запись старше ttl продолжает отдаваться,
+    но попадает в список «на пересчёт» — запрос никогда не ждёт энкодер
+  - Вектора лежат в одном непрерывном массиве (id → строка), а не в
+    отдельном ndarray на каждый id: lookup — один gather, без ~100 байт
+    накладных расходов на объект
+  - Формат хранения (dtype):
+      float32 — как есть, 4 байта на компоненту
+      float16 — 2 байта, относительная ошибка ~1e-3
+      int8    — 1 байт + float32 scale на вектор (max|v| / 127)
+    Скалярные произведения считаются прямо по квантованным строкам
+    (QMatrix.__matmul__): блоками, приводимыми к float32 в пределах кеша
+    процессора, scale умножается уже на результат
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+
+STORE_DTYPES = ('float32', 'float16', 'int8')
+
+# Блок строк, приводимый к float32 внутри QMatrix @ x (держим в L2-кеше)
+QMATMUL_BLOCK_BYTES = 1024 * 1024
+
+
+def quantize(vecs: np.ndarray, dtype: str) -> tuple[np.ndarray, Optional[np.ndarray]]:
+    """float32 (n, d) → (codes, scales). scales только для int8, иначе None."""
+    vecs = np.asarray(vecs, dtype=np.float32)
+    if dtype == 'float32':
+        return vecs, None
+    if dtype == 'float16':
+        return vecs.astype(np.float16), None
+    scales = np.abs(vecs).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(vecs / scales[:, None]).clip(-127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    out = codes.astype(np.float32)
+    if scales is not None:
+        out *= scales[..., None] if out.ndim == 2 else scales
+    return out
+
+
+class QMatrix:
+    """
+    Матрица векторов в формате хранилища: codes (n, d) + scales (n,) для int8.
+    Ведёт себя как ndarray там, где это нужно движку: shape, len, срезы/маски
+    (→ QMatrix), целый индекс (→ float32 строка), `@` и np.asarray (→ float32).
+    """
+    __array_priority__ = 100
+
+    def __init__(self, codes: np.ndarray, scales: Optional[np.ndarray] = None):
+        self.codes = codes
+        self.scales = scales
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        return self.codes.shape
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.codes.dtype
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    def __getitem__(self, idx):
+        if isinstance(idx, (int, np.integer)):
+            scale = self.scales[idx] if self.scales is not None else None
+            return dequantize(self.codes[idx], scale)
+        return QMatrix(self.codes[idx], self.scales[idx] if self.scales is not None else None)
+
+    def dense(self) -> np.ndarray:
+        if self.codes.dtype == np.float32:
+            return self.codes
+        return dequantize(self.codes, self.scales)
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        out = self.dense()
+        return out if dtype is None else out.astype(dtype, copy=False)
+
+    def __matmul__(self, other) -> np.ndarray:
+        """self (n, d) @ other (d,) | (d, m) → float32, без полной деквантизации."""
+        other = np.asarray(other, dtype=np.float32)
+        if self.codes.dtype == np.float32:
+            return self.codes @ other
+        n, d = self.codes.shape
+        out = np.empty((n,) + other.shape[1:], dtype=np.float32)
+        rows = max(1, QMATMUL_BLOCK_BYTES // (4 * max(d, 1)))
+        for start in range(0, n, rows):
+            out[start:start + rows] = self.codes[start:start + rows].astype(np.float32) @ other
+        if self.scales is not None:
+            out *= self.scales[:, None] if out.ndim == 2 else self.scales
+        return out
+
+
+class EmbeddingStore:
+    """id → L2-нормированный вектор фиксированной размерности в формате dtype."""
+
+    def __init__(self, name: str, ttl: float, dtype: str = 'float32'):
+        if dtype not in STORE_DTYPES:
+            raise ValueError(f'dtype must be one of {STORE_DTYPES}, got {dtype!r}')
+        self.name = name
+        self.ttl = ttl
+        self.dtype = dtype
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._slot: dict[int, int] = {}        # id → строка в _codes
+        self._ts: dict[int, float] = {}
+        self._free: list[int] = []             # освобождённые строки
+        self._used = 0                         # строк когда-либо занято
+        self._codes: Optional[np.ndarray] = None    # (capacity, dim)
+        self._scales: Optional[np.ndarray] = None   # (capacity,) — только int8
+
+    # ── Чтение ────────────────────────────────────────────────────────────────
+
+    def lookup(self, ids: list[int]) -> tuple[QMatrix, np.ndarray, list[int]]:
+        """
+        Возвращает (matrix, have, to_refresh):
+          matrix     — QMatrix (len(ids), dim), строки промахов нулевые
+          have       — маска «вектор есть»
+          to_refresh — id без вектора или с устаревшим вектором
+        """
+        now = time.time()
+        with self._lock:
+            rows = np.fromiter((self._slot.get(i, -1) for i in ids), dtype=np.int64, count=len(ids))
+            ts = [self._ts.get(i, 0.0) for i in ids]
+            codes, scales = self._codes, self._scales
+
+        have = rows >= 0
+        to_refresh = [i for i, h, t in zip(ids, have, ts) if not h or now - t > self.ttl]
+        if codes is None:
+            return (QMatrix(np.zeros((len(ids), 0), dtype=self.dtype)),
+                    np.zeros(len(ids), dtype=bool), list(ids))
+
+        out = np.zeros((len(ids), codes.shape[1]), dtype=codes.dtype)
+        out[have] = codes[rows[have]]
+        out_scales = None
+        if scales is not None:
+            out_scales = np.zeros(len(ids), dtype=np.float32)
+            out_scales[have] = scales[rows[have]]
+        return QMatrix(out, out_scales), have, to_refresh
+
+    def get(self, key: int) -> Optional[np.ndarray]:
+        """float32 вектор (деквантованный) или None."""
+        with self._lock:
+            row = self._slot.get(key)
+            if row is None:
+                return None
+            scale = self._scales[row] if self._scales is not None else None
+            return dequantize(self._codes[row], scale)
+
+    @property
+    def dim(self) -> Optional[int]:
+        if not self._slot or self._codes is None:
+            return None
+        return self._codes.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        """Память под вектора (включая свободные строки арены)."""
+        if self._codes is None:
+            return 0
+        return self._codes.nbytes + (self._scales.nbytes if self._scales is not None else 0)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._slot
+
+    def __len__(self) -> int:
+        return len(self._slot)
+
+    # ── Запись ────────────────────────────────────────────────────────────────
+
+    def put(self, ids: Iterable[int], vecs: np.ndarray) -> None:
+        ids = list(ids)
+        if not ids:
+            return
+        codes, scales = quantize(vecs, self.dtype)
+        now = time.time()
+        with self._lock:
+            if self._codes is not None and self._codes.shape[1] != codes.shape[1]:
+                if self._slot:
+                    raise ValueError(f'{self.name}: dim {codes.shape[1]} != {self._codes.shape[1]}')
+                self._reset()
+            if self._codes is None:
+                self._alloc(max(64, len(ids)), codes.shape[1], codes.dtype)
+
+            for i, key in enumerate(ids):
+                row = self._slot.get(key)
+                if row is None:
+                    row = self._free.pop() if self._free else self._next_row()
+                    self._slot[key] = row
+                self._codes[row] = codes[i]
+                if self._scales is not None:
+                    self._scales[row] = scales[i]
+                self._ts[key] = now
+
+    def discard(self, ids: Iterable[int]) -> None:
+        with self._lock:
+            for key in ids:
+                row = self._slot.pop(key, None)
+                self._ts.pop(key, None)
+                if row is not None:
+                    self._free.append(row)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
+
+    # ── Арена ─────────────────────────────────────────────────────────────────
+
+    def _alloc(self, capacity: int, dim: int, dtype) -> None:
+        self._codes = np.zeros((capacity, dim), dtype=dtype)
+        self._scales = np.ones(capacity, dtype=np.float32) if self.dtype == 'int8' else None
+
+    def _next_row(self) -> int:
+        if self._used == self._codes.shape[0]:
+            # Рост ×2; читатели держат ссылку на старый массив — он остаётся валидным
+            grown = np.zeros((self._used * 2, self._codes.shape[1]), dtype=self._codes.dtype)
+            grown[:self._used] = self._codes
+            self._codes = grown
+            if self._scales is not None:
+                scales = np.ones(self._used * 2, dtype=np.float32)
+                scales[:self._used] = self._scales
+                self._scales = scales
+        self._used += 1
+        return self._used - 1
@@ -0,0 +1,151 @@
+"""
+services/embedding_worker.py
+────────────────────────────
+Фоновый воркер эмбеддингов: кодирование текстов вне потоков запросов.
+
+Поток запроса только ставит задачу (kind, id, text) в очередь и сразу
+отвечает; воркер собирает задачи в батч, кодирует их (энкодер грузится
+здесь же, а не в «невезучем» первом запросе) и отдаёт результат в on_done,
+который пишет вектора в EmbeddingStore.
+
+Отдельный поток, а не процесс: torch/BLAS отпускают GIL на время encode,
+а готовые вектора сразу попадают в in-process хранилище без IPC.
+Поток стартует лениво и заново после fork (проверка pid) — совместимо
+с preforking WSGI-серверами.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EncodeFn = Callable[[list[str]], np.ndarray]
+DoneFn = Callable[[str, list[int], np.ndarray, list[list[dict]]], None]
+
+
+class EmbeddingWorker:
+    """Очередь задач + один daemon-поток, кодирующий их батчами."""
+
+    def __init__(self, encode_fn: EncodeFn, on_done: DoneFn,
+                 batch_size: int = 64, warmup: Optional[Callable[[], object]] = None):
+        self._encode = encode_fn
+        self._on_done = on_done
+        self._warmup = warmup
+        self.batch_size = batch_size
+
+        self._queue: queue.Queue = queue.Queue()
+        # (kind, id) → (text, [meta, ...]); дедупликация повторных задач
+        self._pending: dict[tuple[str, int], tuple[str, list[dict]]] = {}
+        self._inflight: set[tuple[str, int]] = set()
+        self._cancelled: set[tuple[str, int]] = set()   # отменены во время encode
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    # ── Публичный API ─────────────────────────────────────────────────────────
+
+    def submit(self, kind: str, key: int, text: str, meta: Optional[dict] = None) -> None:
+        """Поставить объект на (пере)кодирование. Не блокирует."""
+        self._ensure_started()
+        with self._lock:
+            job = self._pending.get((kind, key))
+            if job is not None:
+                # Уже в очереди: обновляем текст, копим meta
+                self._pending[(kind, key)] = (text, job[1] + ([meta] if meta else []))
+                return
+            self._pending[(kind, key)] = (text, [meta] if meta else [])
+        self._queue.put((kind, key))
+
+    def is_pending(self, kind: str, key: int) -> bool:
+        """В очереди или кодируется прямо сейчас — повторно ставить не нужно."""
+        with self._lock:
+            return (kind, key) in self._pending or (kind, key) in self._inflight
+
+    def cancel(self, kind: str, keys) -> None:
+        """Объекты удалены: снять из очереди, а уже кодируемые — не отдавать в on_done."""
+        with self._lock:
+            for key in keys:
+                self._pending.pop((kind, key), None)
+                if (kind, key) in self._inflight:
+                    self._cancelled.add((kind, key))
+
+    def qsize(self) -> int:
+        return len(self._pending) + len(self._inflight)
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """Дождаться пустой очереди (для скриптов прогрева/бенчмарков)."""
+        deadline = None if timeout is None else time.time() + timeout
+        while self.qsize():
+            if deadline is not None and time.time() > deadline:
+                return
+            time.sleep(0.01)
+
+    # ── Внутреннее ────────────────────────────────────────────────────────────
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                # После fork очередь родителя недействительна
+                self._queue = queue.Queue()
+                self._pending = {}
+                self._inflight = set()
+                self._cancelled = set()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='embedding-worker', daemon=True)
+            self._thread.start()
+
+    def _take_batch(self) -> list[tuple[str, int]]:
+        batch = [self._queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        if self._warmup is not None:
+            try:
+                self._warmup()
+            except Exception as exc:
+                logger.warning(f"[EmbeddingWorker] warmup failed: {exc}")
+
+        while True:
+            batch = self._take_batch()
+            by_kind: dict[str, list[tuple[int, str, list[dict]]]] = {}
+            with self._lock:
+                for kind, key in batch:
+                    job = self._pending.pop((kind, key), None)
+                    if job is not None:
+                        by_kind.setdefault(kind, []).append((key, job[0], job[1]))
+                        self._inflight.add((kind, key))
+
+            for kind, jobs in by_kind.items():
+                keys = [j[0] for j in jobs]
+                try:
+                    vecs = self._encode([j[1] for j in jobs])
+                    with self._lock:
+                        keep = [i for i, key in enumerate(keys) if (kind, key) not in self._cancelled]
+                    if keep:
+                        self._on_done(kind, [keys[i] for i in keep], vecs[keep],
+                                      [jobs[i][2] for i in keep])
+                except Exception as exc:
+                    # Не сохраняем ничего: объекты переставятся в очередь
+                    # при следующем обращении к хранилищу
+                    logger.warning(f"[EmbeddingWorker] {kind} batch of {len(keys)} failed: {exc}")
+                finally:
+                    with self._lock:
+                        for key in keys:
+                            self._inflight.discard((kind, key))
+                            self._cancelled.discard((kind, key))
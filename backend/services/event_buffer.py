@@ -0,0 +1,142 @@
+"""
+services/event_buffer.py
+────────────────────────
+Буферизованная запись событий вовлечённости (показ / клик / время просмотра).
+
+Запрос POST /api/events/batch только кладёт события в кольцевой буфер
+процесса; daemon-поток сбрасывает их в engagement_event одним executemany,
+когда набралось EVENT_FLUSH_EVERY событий или прошло EVENT_FLUSH_INTERVAL
+секунд. Журнал коммитится первым; затем показы авторизованных пользователей
+сливаются в seen_posts (services/seen_filter.py) — по транзакции на
+пользователя: сбой у одного не откатывает журнал и остальных.
+
+Ограничения:
+  - буфер в памяти: при падении процесса несброшенные события теряются
+    (при штатной остановке — сбрасываются через atexit)
+  - буфер ограничен EVENT_BUFFER_SIZE: если БД не успевает, вытесняются
+    самые старые события (счётчик dropped)
+  - in-memory SQLite (тесты) — запись сразу, без потока
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+EVENT_BUFFER_SIZE    = int(os.environ.get('RECO_EVENT_BUFFER_SIZE', 50_000))
+EVENT_FLUSH_EVERY    = int(os.environ.get('RECO_EVENT_FLUSH_EVERY', 500))
+EVENT_FLUSH_INTERVAL = float(os.environ.get('RECO_EVENT_FLUSH_INTERVAL', 2.0))
+EVENTS_MAX_BATCH     = 500
+
+
+class EventBuffer:
+    """Кольцевой буфер строк engagement_event + поток, сбрасывающий их пачками."""
+
+    def __init__(self, capacity: int = EVENT_BUFFER_SIZE):
+        self._buf: deque[dict] = deque(maxlen=capacity)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._app = None
+        self.dropped = 0
+        self.flushed = 0
+
+    def append(self, rows: list[dict]) -> None:
+        """Поставить строки в очередь на запись. Вызывать в app context."""
+        from flask import current_app
+        from models import db
+
+        if not rows:
+            return
+        if db.engine.url.database in (None, '', ':memory:'):
+            _write(rows)
+            self.flushed += len(rows)
+            return
+        self._ensure_started(current_app._get_current_object())
+        with self._cond:
+            overflow = len(self._buf) + len(rows) - self._buf.maxlen
+            if overflow > 0:
+                self.dropped += overflow
+            self._buf.extend(rows)
+            if len(self._buf) >= EVENT_FLUSH_EVERY:
+                self._cond.notify()
+
+    def flush(self) -> int:
+        """Сбросить всё накопленное сейчас (скрипты, остановка). Возвращает число строк."""
+        batch = self._drain()
+        if batch and self._app is not None:
+            self._write_batch(batch)
+        return len(batch)
+
+    def __len__(self) -> int:
+        return len(self._buf)
+
+    def _drain(self) -> list[dict]:
+        with self._cond:
+            batch = list(self._buf)
+            self._buf.clear()
+        return batch
+
+    def _ensure_started(self, app) -> None:
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                self._buf.clear()        # события родителя после fork пишет родитель
+                atexit.register(self.flush)
+            self._pid = os.getpid()
+            self._app = app
+            self._thread = threading.Thread(target=self._run, name='event-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._buf) >= EVENT_FLUSH_EVERY,
+                                    timeout=EVENT_FLUSH_INTERVAL)
+            batch = self._drain()
+            if batch:
+                self._write_batch(batch)
+
+    def _write_batch(self, batch: list[dict]) -> None:
+        from models import db
+
+        with self._app.app_context():
+            try:
+                _write(batch)
+                self.flushed += len(batch)
+            except Exception as exc:
+                db.session.rollback()
+                logger.warning(f"[Events] flush of {len(batch)} events failed: {exc}")
+            finally:
+                db.session.remove()
+
+
+def _write(rows: list[dict]) -> None:
+    """Один executemany в engagement_event (commit), затем показы в seen_posts."""
+    from models import EngagementEvent, EventTypeEnum, db
+    from services.seen_filter import add_seen, remember_seen
+
+    db.session.execute(db.insert(EngagementEvent), rows)
+    db.session.commit()
+
+    impressions: dict[int, list[int]] = {}
+    for row in rows:
+        if row['user_id'] is not None and row['event_type'] == EventTypeEnum.impression:
+            impressions.setdefault(row['user_id'], []).append(row['post_id'])
+    for user_id, post_ids in impressions.items():
+        try:
+            seen = add_seen(user_id, post_ids)
+            db.session.commit()
+            remember_seen(user_id, seen)
+        except Exception as exc:
+            db.session.rollback()
+            logger.warning(f"[Events] seen_posts update for user {user_id} failed: {exc}")
+
+
+event_buffer = EventBuffer()
@@ -0,0 +1,153 @@
+"""
+services/feed_cache.py
+──────────────────────
+Снимки ранжированной ленты: (user_id, mood, scope, ENGINE_VERSION) → список post_id.
+
+Первая страница ?algo=ranked ранжирует пул кандидатов один раз; следующие
+страницы — срез снимка (O(page)), поэтому порядок между страницами не
+«плывёт», а движок не пересчитывается на каждый скролл.
+
+  - LRU по числу снимков + TTL (окно сессии)
+  - Точечная инвалидация: собственные действия пользователя (подписка,
+    реакция, публикация) сбрасывают только его снимки
+  - Хранится в памяти процесса: при нескольких воркерах снимок у каждого свой
+
+Гости и холодный старт получают одинаковый ответ, поэтому их рейтинг —
+общий снимок на бакет mood (все + шесть MoodEnum), см. SharedSnapshotCache.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+FEED_SNAPSHOT_MAX_ENTRIES = 10_000
+DEGRADED_SNAPSHOT_TTL     = 30.0   # секунд для ленты, собранной в урезанном режиме
+
+
+class FeedSnapshot:
+    __slots__ = ('ids', 'tier', 'created', 'ttl')
+
+    def __init__(self, ids: list[int], tier: str, created: float, ttl: float):
+        self.ids = ids
+        self.tier = tier
+        self.created = created
+        self.ttl = ttl
+
+
+class FeedSnapshotCache:
+    """Потокобезопасный LRU снимков с индексом user_id → ключи."""
+
+    def __init__(self, max_entries: int = FEED_SNAPSHOT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: OrderedDict[tuple, FeedSnapshot] = OrderedDict()
+        self._by_user: dict[int, set[tuple]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[FeedSnapshot]:
+        with self._lock:
+            snap = self._data.get(key)
+            if snap is None:
+                return None
+            if time.time() - snap.created > snap.ttl:
+                self._drop(key)
+                return None
+            self._data.move_to_end(key)
+            return snap
+
+    def put(self, key: tuple, ids: list[int], tier: str, ttl: float) -> FeedSnapshot:
+        snap = FeedSnapshot(list(ids), tier, time.time(), ttl)
+        with self._lock:
+            self._data[key] = snap
+            self._data.move_to_end(key)
+            self._by_user.setdefault(key[0], set()).add(key)
+            while len(self._data) > self.max_entries:
+                self._drop(next(iter(self._data)))
+        return snap
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            for key in self._by_user.pop(user_id, ()):
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._by_user.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _drop(self, key: tuple) -> None:
+        self._data.pop(key, None)
+        keys = self._by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[key[0]]
+
+
+class SharedSnapshotCache:
+    """
+    Общие снимки (не привязаны к пользователю) с защитой от stampede:
+    протухший снимок пересчитывает один поток, остальные тем временем
+    отдают старый. Ждут построения только при пустом ключе.
+    """
+
+    def __init__(self):
+        self._data: dict[tuple, FeedSnapshot] = {}
+        self._locks: dict[tuple, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def get_or_build(self, key: tuple, build, ttl: float) -> FeedSnapshot:
+        """build() → (ids, tier); вызывается не чаще раза в ttl на ключ."""
+        snap = self._data.get(key)
+        if snap is not None and time.time() - snap.created <= snap.ttl:
+            return snap
+
+        lock = self._lock_for(key)
+        if snap is not None:
+            if not lock.acquire(blocking=False):
+                return snap          # пересчитывает другой поток
+        else:
+            lock.acquire()
+        try:
+            fresh = self._data.get(key)
+            if fresh is not None and time.time() - fresh.created <= fresh.ttl:
+                return fresh
+            try:
+                ids, tier = build()
+            except Exception:
+                if snap is None:
+                    raise
+                return snap          # ошибка пересчёта — отдаём старый снимок
+            fresh = FeedSnapshot(list(ids), tier, time.time(), ttl)
+            self._data[key] = fresh
+            return fresh
+        finally:
+            lock.release()
+
+    def clear(self) -> None:
+        with self._guard:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _lock_for(self, key: tuple) -> threading.Lock:
+        with self._guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+
+feed_snapshots = FeedSnapshotCache()
+cold_snapshots = SharedSnapshotCache()
+
+
+def invalidate_user_feed(user_id: Optional[int]) -> None:
+    """Пользователь подписался / отреагировал / опубликовал — его лента устарела."""
+    if user_id is not None:
+        feed_snapshots.invalidate_user(user_id)
@@ -0,0 +1,108 @@
+"""
+services/identity.py
+────────────────────
+Кто смотрит и кто авторы — один раз за запрос.
+
+current_viewer() — JWT проверяется один раз, пользователь запоминается в g;
+без JWT — пользователь сессии (g.current_user из app.load_current_user).
+
+get_user(id) / prime_users(ids) — карта пользователей запроса (identity map
+поверх db.session): сериализаторы берут авторов отсюда, а списочные
+эндпоинты заранее загружают всех авторов страницы одним IN-запросом
+вместо ленивой загрузки post.user / board.creator по одному.
+
+Вне запроса (фоновые воркеры, CLI) карты нет — get_user идёт в сессию.
+"""
+from __future__ import annotations
+
+from typing import Iterable, Optional
+
+from flask import g, has_request_context
+
+_UNRESOLVED = object()
+
+
+def _users_map() -> Optional[dict]:
+    if not has_request_context():
+        return None
+    users = g.get('_users')
+    if users is None:
+        users = g._users = {}
+    return users
+
+
+def remember_user(user) -> None:
+    """Положить уже загруженного пользователя в карту запроса."""
+    users = _users_map()
+    if users is not None and user is not None:
+        users[user.id] = user
+
+
+def get_user(user_id: Optional[int]):
+    """Пользователь по id: карта запроса, иначе одна выборка по PK."""
+    from models import User, db
+
+    if user_id is None:
+        return None
+    users = _users_map()
+    if users is not None and user_id in users:
+        return users[user_id]
+    user = db.session.get(User, user_id)
+    if users is not None:
+        users[user_id] = user
+    return user
+
+
+def prime_users(user_ids: Iterable[Optional[int]]) -> None:
+    """Загрузить недостающих пользователей одним запросом."""
+    from models import User, db
+
+    users = _users_map()
+    if users is None:
+        return
+    missing = {uid for uid in user_ids if uid is not None and uid not in users}
+    if not missing:
+        return
+    for user in db.session.execute(db.select(User).where(User.id.in_(missing))).scalars():
+        users[user.id] = user
+    for uid in missing:
+        users.setdefault(uid, None)
+
+
+def current_viewer_id() -> Optional[int]:
+    """id текущего пользователя (JWT или сессия) без загрузки из БД."""
+    identity = _jwt_identity()
+    if identity is not None:
+        return identity
+    user = g.get('current_user')
+    return user.id if user is not None else None
+
+
+def current_viewer():
+    """Текущий пользователь: JWT, иначе сессия, иначе None. Один раз за запрос."""
+    viewer = g.get('_viewer', _UNRESOLVED)
+    if viewer is not _UNRESOLVED:
+        return viewer
+    identity = _jwt_identity()
+    viewer = get_user(identity) if identity is not None else g.get('current_user')
+    g._viewer = viewer
+    return viewer
+
+
+def _jwt_identity() -> Optional[int]:
+    """Проверить JWT (опционально) один раз за запрос; id или None."""
+    from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+    identity = g.get('_jwt_identity', _UNRESOLVED)
+    if identity is not _UNRESOLVED:
+        return identity
+    identity = None
+    try:
+        verify_jwt_in_request(optional=True)
+        raw = get_jwt_identity()
+        if raw:
+            identity = int(raw)
+    except Exception:
+        pass
+    g._jwt_identity = identity
+    return identity
@@ -0,0 +1,105 @@
+"""
+services/images.py
+──────────────────
+Обработка загруженных изображений: уменьшение и очистка метаданных
+без попиксельного копирования в Python.
+
+  1. Image.open          — читается только заголовок
+  2. draft()             — JPEG декодируется сразу уменьшенным в 2/4/8 раз
+                           (масштабирование DCT), полный кадр в память не попадает
+  3. exif_transpose      — поворот по EXIF Orientation (иначе фото с телефона
+                           лежат на боку)
+  4. thumbnail()         — сначала reduce() целым шагом (усреднение блоков),
+                           затем LANCZOS с запасом THUMBNAIL_REDUCING_GAP
+  5. save_clean()        — перекодирование без exif / xmp / комментариев:
+                           из info переносится только ICC-профиль (цвета)
+
+render_ladder() — та же схема для набора ширин: декодирование одно, каждая
+следующая (меньшая) ширина уменьшается из предыдущей, каждая сохраняется
+в нескольких форматах (WebP + формат оригинала).
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+THUMBNAIL_REDUCING_GAP = 2.0
+
+# Расширение файла → формат Pillow
+IMAGE_FORMATS: dict[str, str] = {
+    'jpg':  'JPEG',
+    'jpeg': 'JPEG',
+    'png':  'PNG',
+    'gif':  'GIF',
+    'webp': 'WEBP',
+}
+
+
+def open_oriented(src, max_side: int) -> Image.Image:
+    """
+    Открыть src (путь или поток), декодировав не крупнее, чем нужно для
+    max_side. Ориентация из EXIF применена, режим — RGB или RGBA.
+    """
+    img = Image.open(src)
+    # Поворот на 90° меняет стороны местами — draft получает квадрат по большей
+    side = int(max_side * THUMBNAIL_REDUCING_GAP)
+    img.draft(None, (side, side))
+    img = ImageOps.exif_transpose(img)
+
+    if img.mode not in ('RGB', 'RGBA'):
+        has_alpha = img.mode in ('LA', 'PA') or 'transparency' in img.info
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+    return img
+
+
+def make_thumbnail(src, box: tuple[int, int]) -> Image.Image:
+    """Открыть src и вписать в box с сохранением пропорций."""
+    img = open_oriented(src, max(box))
+    img.thumbnail(box, Image.Resampling.LANCZOS, reducing_gap=THUMBNAIL_REDUCING_GAP)
+    return img
+
+
+def render_ladder(src: str, dst_base: str, widths: list[int], exts: list[str],
+                  quality: int = 85, qualities: Optional[dict[str, int]] = None) -> list[dict]:
+    """
+    Сохранить src в ширинах widths и форматах exts. Без увеличения: ширины
+    больше оригинала заменяются одной копией в ширину оригинала.
+    qualities — качество по расширению (ext → quality), остальным — quality.
+    Файлы: {dst_base}_w{ширина}.{ext}.
+    Возвращает [{"suffix", "width", "height", "format"}] по возрастанию ширины.
+    """
+    img = open_oriented(src, max(widths))
+    w0, h0 = img.size
+    ladder = {w for w in widths if w <= w0}
+    if any(w > w0 for w in widths):
+        ladder.add(w0)
+
+    out = []
+    for width in sorted(ladder, reverse=True):
+        height = max(1, round(h0 * width / w0))
+        if img.size != (width, height):
+            img = img.resize((width, height), Image.Resampling.LANCZOS,
+                             reducing_gap=THUMBNAIL_REDUCING_GAP)
+        for ext in exts:
+            suffix = f"_w{width}.{ext}"
+            save_clean(img.copy(), f"{dst_base}{suffix}", IMAGE_FORMATS[ext],
+                       (qualities or {}).get(ext, quality))
+            out.append({'suffix': suffix, 'width': width, 'height': height,
+                        'format': IMAGE_FORMATS[ext].lower()})
+    return sorted(out, key=lambda r: r['width'])
+
+
+def save_clean(img: Image.Image, path: str, fmt: Optional[str] = None, quality: int = 85) -> None:
+    """Сохранить без метаданных (кроме ICC-профиля). fmt=None — по расширению path."""
+    if fmt is None:
+        fmt = IMAGE_FORMATS.get(path.rsplit('.', 1)[-1].lower(), 'JPEG')
+    icc_profile = img.info.get('icc_profile')
+    img.info = {}
+
+    if fmt == 'JPEG' and img.mode != 'RGB':
+        img = img.convert('RGB')
+    params = {'quality': quality, 'optimize': True}
+    if icc_profile:
+        params['icc_profile'] = icc_profile
+    img.save(path, fmt, **params)
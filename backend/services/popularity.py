@@ -0,0 +1,178 @@
+"""
+services/popularity.py
+──────────────────────
+Экспоненциально затухающая популярность постов, обновляемая инкрементально.
+
+    score(t) = Σ wᵢ · e^(−λ·(t − tᵢ)),   λ = ln 2 / POPULARITY_HALF_LIFE_HOURS
+
+Каждое событие (реакция, комментарий, сохранение) меняет одну строку PostPopularity:
+score ← score·e^(−λΔt) + w. Периодического полного пересчёта нет.
+
+Строка хранит log_score = ln(score) + λ·t (t — часы от POPULARITY_EPOCH):
+  - текущее значение:  score = exp(log_score − λ·t_now)
+  - сравнение постов:  по log_score напрямую, момент «сейчас» сокращается
+  - событие веса w в момент tₑ: log_score ← ln(e^log_score + w·e^(λ·tₑ)) —
+    считается в самом UPDATE (INSERT … ON CONFLICT DO UPDATE), без чтения
+    строки, поэтому параллельные события не теряются и не конфликтуют
+  - снятие события: то же с −w и tₑ = created_at события, т.е. вычитается
+    ровно его затухший вклад w·e^(−λ(t_now − tₑ))
+Хранение в логарифме не переполняется, сколько бы лет ни прошло.
+
+Запись идёт в текущую сессию — коммитит вызывающий (вместе с реакцией).
+"""
+from __future__ import annotations
+
+import math
+import os
+import sqlite3
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import case, event, func
+from sqlalchemy.engine import Engine
+
+POPULARITY_HALF_LIFE_HOURS = float(os.environ.get('RECO_POPULARITY_HALF_LIFE_H', 24))
+POPULARITY_EPOCH = datetime(2026, 1, 1)
+
+# Вес события; снятие (реакции, комментария, сохранения) вычитает его затухший вклад
+EVENT_WEIGHTS: dict[str, float] = {
+    'reaction': 1.0,
+    'comment':  3.0,
+    'save':     4.0,
+}
+
+_MIN_SCORE = 1e-6   # ниже — строку удаляем (пост «остыл»)
+
+_LAMBDA = math.log(2.0) / POPULARITY_HALF_LIFE_HOURS
+
+
+def _hours(at: datetime) -> float:
+    return (at - POPULARITY_EPOCH).total_seconds() / 3600.0
+
+
+def _current(log_score: float, now: datetime) -> float:
+    return math.exp(log_score - _LAMBDA * _hours(now))
+
+
+@event.listens_for(Engine, 'connect')
+def _sqlite_math(dbapi_conn, _record) -> None:
+    """ln/exp для SQLite, собранного без math-функций (нужны record())."""
+    if not isinstance(dbapi_conn, sqlite3.Connection):
+        return
+    try:
+        dbapi_conn.execute('SELECT ln(1), exp(0)')
+    except sqlite3.OperationalError:
+        dbapi_conn.create_function('ln', 1, math.log, deterministic=True)
+        dbapi_conn.create_function('exp', 1, math.exp, deterministic=True)
+
+
+def record(post_id: int, weight: float, at: Optional[datetime] = None) -> None:
+    """
+    Событие веса weight в момент at (по умолчанию — сейчас).
+    weight < 0 — снятие события: at должен быть временем самого события,
+    тогда вычитается его затухший вклад, а не свежий вес.
+    """
+    from models import PostPopularity, db, dialect_insert
+
+    if not weight:
+        return
+    now = datetime.utcnow()
+    at = at or now
+    lw = math.log(abs(weight)) + _LAMBDA * _hours(at)    # log вклада события
+    col = PostPopularity.__table__.c.log_score
+
+    if weight > 0:
+        # ln(eᵃ + eᵇ) без переполнения: max + ln(1 + e^(−|a−b|))
+        merged = case(
+            (col >= lw, col + func.ln(1.0 + func.exp(lw - col))),
+            else_=lw + func.ln(1.0 + func.exp(col - lw)),
+        )
+        stmt = dialect_insert(PostPopularity).values(post_id=post_id, log_score=lw, updated_at=now)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['post_id'], set_={'log_score': merged, 'updated_at': now}))
+        return
+
+    # ln(eᵃ − eᵇ); вклад ≥ всего счёта (округление, событие до backfill) → строка удаляется
+    floor = math.log(_MIN_SCORE) + _LAMBDA * _hours(now)
+    db.session.execute(
+        db.update(PostPopularity)
+        .where(PostPopularity.post_id == post_id)
+        .values(log_score=case((col > lw, col + func.ln(1.0 - func.exp(lw - col))),
+                               else_=floor - 1.0),
+                updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        db.delete(PostPopularity)
+        .where(PostPopularity.post_id == post_id, PostPopularity.log_score < floor)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def record_event(post_id: int, kind: str, added: bool = True,
+                 at: Optional[datetime] = None) -> None:
+    """
+    record() с весом из EVENT_WEIGHTS. При снятии (added=False) передавайте
+    at = created_at снимаемой реакции / комментария / сохранения.
+    """
+    weight = EVENT_WEIGHTS.get(kind, 0.0)
+    record(post_id, weight if added else -weight, at)
+
+
+def decayed_scores(post_ids: list[int], now: Optional[datetime] = None) -> dict[int, float]:
+    """post_id → текущий score одним запросом по PK (нет строки → 0)."""
+    from models import PostPopularity, db
+
+    if not post_ids:
+        return {}
+    now = now or datetime.utcnow()
+    rows = db.session.execute(
+        db.select(PostPopularity.post_id, PostPopularity.log_score)
+        .where(PostPopularity.post_id.in_(post_ids))
+    ).all()
+    return {pid: _current(log_score, now) for pid, log_score in rows}
+
+
+def backfill(now: Optional[datetime] = None) -> int:
+    """
+    Разовое заполнение из существующих реакций, комментариев и сохранений
+    (после миграции). Затухание считается от created_at каждого события.
+    Возвращает число постов.
+    """
+    from models import Comment, Post, PostPopularity, Reaction, db
+
+    now = now or datetime.utcnow()
+    totals: dict[int, float] = {}
+    for kind, stmt in (
+        ('reaction', db.select(Reaction.post_id, Reaction.created_at)),
+        ('comment',  db.select(Comment.post_id, Comment.created_at)),
+        ('save',     db.select(Post.original_post_id, Post.created_at)
+                     .where(Post.post_kind == 'saved', Post.original_post_id.is_not(None))),
+    ):
+        weight = EVENT_WEIGHTS[kind]
+        for post_id, created_at in db.session.execute(stmt):
+            totals[post_id] = totals.get(post_id, 0.0) + weight * math.exp(
+                -_LAMBDA * max(_hours(now) - _hours(created_at), 0.0))
+
+    rows = [
+        {'post_id': pid, 'log_score': math.log(score) + _LAMBDA * _hours(now), 'updated_at': now}
+        for pid, score in totals.items() if score >= _MIN_SCORE
+    ]
+    db.session.execute(db.delete(PostPopularity))
+    if rows:
+        db.session.execute(db.insert(PostPopularity), rows)
+    db.session.commit()
+    return len(totals)
+
+
+def main() -> None:
+    """python -m services.popularity — разовый backfill после миграции."""
+    from app import app
+
+    with app.app_context():
+        n = backfill()
+    print(f"[Popularity] backfilled {n} posts (half-life {POPULARITY_HALF_LIFE_HOURS:g} h)")
+
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,10 @@ from typing import Optional
 
 from models import db, Post, ReactionTypeEnum, REACTION_EMOJI_MAP
 from repositories.reaction_repository import ReactionRepository
+from services.feed_cache import invalidate_user_feed
+from services.identity import get_user, prime_users
+from services.popularity import record_event
+from services.recommendation_engine import on_reaction_changed
 from utils import get_avatar_url
 
 
@@ -70,13 +74,23 @@ class ReactionService:
         existing = ReactionRepository.find(post_id, user_id, reaction_type)
 
         if existing:
+            # Снятие вычитает затухший вклад реакции — нужен её момент
+            reacted_at = existing.created_at
             ReactionRepository.delete(existing)
-            db.session.commit()
             added = False
         else:
             ReactionRepository.create(post_id, user_id, reaction_type)
-            db.session.commit()
+            reacted_at = None
             added = True
+        # Затухающая популярность — в той же транзакции, что и реакция
+        record_event(post_id, 'reaction', added, at=reacted_at)
+        db.session.commit()
+
+        try:
+            on_reaction_changed(user_id, post, added)
+        except Exception:
+            pass
+        invalidate_user_feed(user_id)
 
         counts = ReactionRepository.counts_for_post(post_id)
         return added, counts
@@ -123,12 +137,14 @@ class ReactionService:
             raise LookupError('Пост не найден')
 
         reactions = ReactionRepository.users_for_reaction(post_id, reaction_type)
+        prime_users(r.user_id for r in reactions)
+        users = [(r, get_user(r.user_id)) for r in reactions]
         return [
             {
-                'id':       str(r.user.id),
-                'username': r.user.username,
-                'avatar':   get_avatar_url(r.user),
+                'id':       str(user.id),
+                'username': user.username,
+                'avatar':   get_avatar_url(user),
                 'reacted_at': r.created_at.isoformat(),
             }
-            for r in reactions
+            for r, user in users
         ]
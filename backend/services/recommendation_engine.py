@@ -11,9 +11,13 @@ services/recommendation_engine.py
 Финальный score = α·content_sim + β·collab_score + γ·mood_match + δ·freshness
 
 Особенности:
-  - Graceful degradation: если sentence-transformers не установлен → TF-IDF
+  - Graceful degradation: если sentence-transformers не установлен →
+    hashing + случайная проекция (единое пространство, можно кешировать)
   - Холодный старт: новым пользователям (0 лайков, 0 постов) → популярные + свежие
-  - Кеш эмбеддингов в памяти (TTL 10 минут), сбрасывается при новом посте
+  - Эмбеддинги считает фоновый EmbeddingWorker; ранкер не ждёт энкодер —
+    ещё не закодированные объекты получают нейтральный content score
+  - Хранилище эмбеддингов в памяти (TTL 10 минут, stale-while-revalidate)
+  - Профиль вкуса = ≤8 k-means центроидов лайков/постов, дообучается на реакциях
   - Полностью синхронный (нет async), работает внутри Flask app context
   - Поле user_id (НЕ author_id) — согласно models.py Post.user_id
 """
@@ -21,6 +25,7 @@ services/recommendation_engine.py
 from __future__ import annotations
 
 import logging
+import os
 import time
 from datetime import datetime
 from typing import Optional
@@ -29,6 +34,9 @@ import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.preprocessing import normalize
 
+from services.embedding_store import EmbeddingStore, QMatrix
+from services.embedding_worker import EmbeddingWorker
+
 logger = logging.getLogger(__name__)
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -39,6 +47,10 @@ BETA  = 0.25   # collaborative filtering
 GAMMA = 0.20   # emotional / mood match
 DELTA = 0.20   # freshness (экспоненциальный decay)
 
+# Версия ранжирования: входит в ключ снимков ленты (services/feed_cache.py).
+# Увеличивать при изменении весов/стадий — старые снимки перестают совпадать.
+ENGINE_VERSION = 1
+
 # Decay-период свежести: 48 часов → пост двухдневной давности = score ≈ 0.37
 FRESHNESS_DECAY_HOURS = 48.0
 
@@ -61,16 +73,20 @@ _MOOD_AFFINITY: dict[tuple[str, str], float] = {
 ALL_MOODS = ['joyful', 'calm', 'reflective', 'energetic', 'melancholic', 'inspired']
 
 # ─────────────────────────────────────────────────────────────────────────────
-# Кеш эмбеддингов
+# Хранилище эмбеддингов
 # ─────────────────────────────────────────────────────────────────────────────
-_embed_cache: dict[int, np.ndarray] = {}   # post_id → embedding vector
-_cache_ts: float = 0.0
-_CACHE_TTL = 600  # секунд
+_CACHE_TTL = 600  # секунд; устаревший вектор отдаётся, пока пересчитывается
+
+# Формат хранения векторов: float32 | float16 | int8 (scale на вектор).
+# int8 — в 4 раза меньше памяти при ошибке cosine ~2e-3 и recall@50 ≈ 0.99;
+# float16 — вдвое меньше, но приведение half → float32 в numpy медленное
+# (bench/bench_quantized_embeddings.py)
+EMBED_DTYPE = os.environ.get('RECO_EMBED_DTYPE', 'float32')
+
+_post_store = EmbeddingStore('post', _CACHE_TTL, dtype=EMBED_DTYPE)     # post_id → vector
 
 def _invalidate_cache() -> None:
-    global _embed_cache, _cache_ts
-    _embed_cache = {}
-    _cache_ts = 0.0
+    _post_store.clear()
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -78,44 +94,271 @@ def _invalidate_cache() -> None:
 # ─────────────────────────────────────────────────────────────────────────────
 _encoder = None
 _USE_TRANSFORMERS = False
+_encoder_checked = False   # True после первой попытки загрузки (успешной или нет)
+_USE_SIDECAR = False       # _encoder — клиент embedding sidecar
 
-def _get_encoder():
-    """
-    Возвращает sentence_transformers.SentenceTransformer или None.
-    При первом вызове пытается загрузить модель.
-    Если пакет не установлен — возвращает None (fallback на TF-IDF).
-    """
-    global _encoder, _USE_TRANSFORMERS
-    if _encoder is not None:
-        return _encoder
-    if _USE_TRANSFORMERS is False and _encoder is None:
-        # Ещё не пробовали загружать
-        pass
+# Путь к unix-сокету embedding sidecar (services/embedding_sidecar.py).
+# Если задан и sidecar отвечает — модель живёт в RAM один раз на хост,
+# а воркеры шлют ему тексты; иначе энкодер грузится в процессе.
+ENCODER_SOCKET = os.environ.get('RECO_ENCODER_SOCKET') or None
+# Столько ошибок сокета подряд → sidecar считается умершим, энкодер
+# загружается в процессе (до перезапуска воркера)
+SIDECAR_MAX_FAILURES = int(os.environ.get('RECO_SIDECAR_MAX_FAILURES', 3))
+_sidecar_failures = 0
+
+
+def _load_local_encoder():
+    """SentenceTransformer в текущем процессе или None, если пакет недоступен."""
     try:
         from sentence_transformers import SentenceTransformer
         logger.info("[RecoEngine] Loading MiniLM encoder…")
-        _encoder = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-        _USE_TRANSFORMERS = True
+        model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
         logger.info("[RecoEngine] MiniLM loaded ✓")
+        return model
     except Exception as exc:
-        logger.warning(f"[RecoEngine] sentence-transformers unavailable ({exc}), using TF-IDF")
-        _encoder = None
-        _USE_TRANSFORMERS = False
+        logger.warning(f"[RecoEngine] sentence-transformers unavailable ({exc}), using hashing fallback")
+        return None
+
+
+def _get_encoder():
+    """
+    Возвращает объект с методом encode(texts, ...) или None.
+    При первом вызове (блокирующе — из EmbeddingWorker или warmup, а не
+    из потока запроса):
+      1. RECO_ENCODER_SOCKET задан и sidecar отвечает → SidecarEncoder
+         (если sidecar позже умрёт — см. _on_sidecar_error)
+      2. иначе SentenceTransformer в процессе
+      3. пакет не установлен → None (fallback на hashing-вектора)
+    """
+    global _encoder, _USE_TRANSFORMERS, _USE_SIDECAR, _encoder_checked
+    if _encoder is not None or _encoder_checked:
+        return _encoder
+    if ENCODER_SOCKET:
+        try:
+            from services.embedding_sidecar import SidecarEncoder
+            client = SidecarEncoder(ENCODER_SOCKET)
+            info = client.info()
+            _encoder = client
+            _USE_TRANSFORMERS = info.get('encoder') == 'minilm'
+            _USE_SIDECAR = True
+            _encoder_checked = True
+            logger.info(f"[RecoEngine] Using embedding sidecar at {ENCODER_SOCKET} ({info})")
+            return _encoder
+        except Exception as exc:
+            logger.warning(f"[RecoEngine] embedding sidecar unavailable ({exc}), loading encoder in-process")
+    _encoder = _load_local_encoder()
+    _USE_TRANSFORMERS = _encoder is not None
+    _encoder_checked = True
     return _encoder
 
 
-def _tfidf_embed(texts: list[str]) -> np.ndarray:
-    """Fallback: TF-IDF + L2-normalize → плотный вектор (n, max_features)."""
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    if not texts:
-        return np.zeros((0, 1))
-    vec = TfidfVectorizer(max_features=256, ngram_range=(1, 2),
-                          sublinear_tf=True, min_df=1)
+def _on_sidecar_error(exc: Exception) -> None:
+    """Ошибка сокета sidecar: после SIDECAR_MAX_FAILURES подряд — энкодер в процессе."""
+    global _encoder, _USE_TRANSFORMERS, _USE_SIDECAR, _sidecar_failures
+    _sidecar_failures += 1
+    if _sidecar_failures < SIDECAR_MAX_FAILURES:
+        return
+    logger.warning(f"[RecoEngine] embedding sidecar failed {_sidecar_failures} times in a row "
+                   f"({exc}), loading encoder in-process")
     try:
-        mat = vec.fit_transform(texts).toarray().astype(np.float32)
-        return normalize(mat, norm='l2')
+        _encoder.close()
     except Exception:
-        return np.zeros((len(texts), 256), dtype=np.float32)
+        pass
+    _encoder = _load_local_encoder()
+    _USE_TRANSFORMERS = _encoder is not None
+    _USE_SIDECAR = False
+    _sidecar_failures = 0
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Fallback-векторизатор (без sentence-transformers)
+# ─────────────────────────────────────────────────────────────────────────────
+# HashingVectorizer не требует fit → словарь общий для всех вызовов и процессов.
+# 2^18 хеш-признаков сжимаются в FALLBACK_DIM разреженной случайной проекцией
+# (Johnson–Lindenstrauss). Матрица проекции генерируется один раз с фиксированным
+# seed и сохраняется на диск, поэтому вектора из разных запросов/воркеров/
+# перезапусков лежат в одном пространстве и их можно кешировать.
+
+FALLBACK_DIM            = 256
+FALLBACK_HASH_FEATURES  = 2 ** 18
+FALLBACK_SEED           = 42
+FALLBACK_PROJECTION_PATH = os.environ.get(
+    'RECO_FALLBACK_PROJECTION',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                 'instance', 'reco_fallback_projection.npz'),
+)
+
+_hasher = None
+_projection = None   # scipy.sparse (FALLBACK_HASH_FEATURES, FALLBACK_DIM)
+
+
+def _get_fallback_vectorizer():
+    """(HashingVectorizer, матрица проекции) — создаются один раз на процесс."""
+    global _hasher, _projection
+    if _hasher is not None:
+        return _hasher, _projection
+
+    import scipy.sparse as sp
+    from sklearn.feature_extraction.text import HashingVectorizer
+
+    hasher = HashingVectorizer(n_features=FALLBACK_HASH_FEATURES, ngram_range=(1, 2),
+                               alternate_sign=False, norm=None)
+
+    projection = None
+    if os.path.exists(FALLBACK_PROJECTION_PATH):
+        try:
+            projection = sp.load_npz(FALLBACK_PROJECTION_PATH).tocsr()
+            if projection.shape != (FALLBACK_HASH_FEATURES, FALLBACK_DIM):
+                projection = None
+        except Exception as exc:
+            logger.warning(f"[RecoEngine] cannot load fallback projection ({exc}), regenerating")
+            projection = None
+
+    if projection is None:
+        from sklearn.random_projection import SparseRandomProjection
+        srp = SparseRandomProjection(n_components=FALLBACK_DIM, random_state=FALLBACK_SEED)
+        srp.fit(sp.csr_matrix((1, FALLBACK_HASH_FEATURES), dtype=np.float32))
+        projection = sp.csr_matrix(srp.components_.T, dtype=np.float32)
+        try:
+            os.makedirs(os.path.dirname(FALLBACK_PROJECTION_PATH), exist_ok=True)
+            sp.save_npz(FALLBACK_PROJECTION_PATH, projection)
+        except OSError as exc:
+            logger.warning(f"[RecoEngine] cannot persist fallback projection ({exc})")
+
+    _hasher, _projection = hasher, projection
+    return _hasher, _projection
+
+
+def _fallback_embed(texts: list[str]) -> np.ndarray:
+    """Fallback: hashing (sublinear tf) → random projection → L2 (n, FALLBACK_DIM)."""
+    if not texts:
+        return np.zeros((0, FALLBACK_DIM), dtype=np.float32)
+    try:
+        hasher, projection = _get_fallback_vectorizer()
+        counts = hasher.transform(texts).astype(np.float32)
+        counts.data = np.log1p(counts.data)
+        mat = (counts @ projection).toarray().astype(np.float32)
+        return normalize(mat, norm='l2').astype(np.float32)
+    except Exception as e:
+        logger.warning(f"[RecoEngine] fallback embed error: {e}")
+        return np.zeros((len(texts), FALLBACK_DIM), dtype=np.float32)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PCA-проекция (services/vector_projection.py)
+# ─────────────────────────────────────────────────────────────────────────────
+# Обучается офлайн (python -m services.vector_projection --dim 128) и
+# применяется к векторам при записи в хранилище: всё сходство дальше
+# считается на PCA_DIM измерениях. Нет файла, проекция обучена на другом
+# энкодере или размерность входа не совпадает — вектора хранятся как есть.
+
+PCA_PATH = os.environ.get(
+    'RECO_PCA_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                 'instance', 'reco_pca.npz'),
+)
+PCA_DIM = int(os.environ.get('RECO_PCA_DIM', 0)) or None   # None = все обученные компоненты
+
+_pca = None
+_pca_checked = False
+_pca_mismatch: Optional[str] = None   # энкодер, для которого несовпадение уже залогировано
+
+
+def _get_pca():
+    global _pca, _pca_checked
+    if not _pca_checked:
+        try:
+            from services.vector_projection import PCAProjection
+            _pca = PCAProjection.load(PCA_PATH)
+            if _pca is not None:
+                logger.info(f"[RecoEngine] PCA {_pca.input_dim}d → {PCA_DIM or _pca.max_dim}d "
+                            f"(variance kept {_pca.variance_kept(PCA_DIM):.3f})")
+        except Exception as exc:
+            logger.warning(f"[RecoEngine] cannot load PCA projection ({exc})")
+            _pca = None
+        _pca_checked = True
+    return _pca
+
+
+def _encoder_name() -> str:
+    """Имя текущего пространства векторов (поле encoder файла проекции)."""
+    return 'minilm' if _USE_TRANSFORMERS else 'hashing'
+
+
+def _project(vecs: np.ndarray) -> np.ndarray:
+    global _pca_mismatch
+    pca = _get_pca()
+    if pca is None:
+        return vecs
+    encoder = _encoder_name()
+    if pca.encoder != encoder or vecs.shape[1] != pca.input_dim:
+        if _pca_mismatch != encoder:
+            _pca_mismatch = encoder
+            logger.warning(f"[RecoEngine] PCA projection was fitted for {pca.encoder or '?'} "
+                           f"{pca.input_dim}d, encoder is {encoder} {vecs.shape[1]}d — ignored; "
+                           f"refit: python -m services.vector_projection")
+        return vecs
+    return pca.transform(vecs, PCA_DIM)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Ядро similarity: float32, блоками по профилю, running max / top-k
+# ─────────────────────────────────────────────────────────────────────────────
+# cosine_similarity() строит полную (n_cand, n_profile) float64-матрицу:
+# 5k кандидатов × 20k лайков = 800 MB. Здесь профиль идёт блоками так, чтобы
+# промежуточный блок (n_cand, block) не превышал SIM_BLOCK_BYTES.
+
+SIM_BLOCK_BYTES = 32 * 1024 * 1024   # бюджет на один блок float32 (32 MB)
+_MIN_BLOCK_COLS = 16
+
+
+def _as_unit_f32(mat: np.ndarray) -> np.ndarray:
+    """float32 + L2-нормировка строк. Уже нормированные вектора не копируются."""
+    mat = np.asarray(mat, dtype=np.float32)
+    norms = np.sqrt(np.einsum('ij,ij->i', mat, mat))
+    if np.all(np.abs(norms - 1.0) < 1e-3):
+        return mat
+    norms[norms == 0] = 1.0
+    return mat / norms[:, None]
+
+
+def _chunked_similarity(cand: np.ndarray, profile: np.ndarray, k: int = 1,
+                        block_bytes: int = SIM_BLOCK_BYTES) -> np.ndarray:
+    """
+    Для каждой строки `cand` — k наибольших cosine с любой строкой `profile`.
+
+    k == 1 → (n_cand,)    running max
+    k  > 1 → (n_cand, k)  running top-k по убыванию
+
+    Пиковая память ≈ max(block_bytes, n_cand · 4 · _MIN_BLOCK_COLS) вне
+    зависимости от длины профиля.
+    """
+    if not isinstance(cand, QMatrix):
+        cand = _as_unit_f32(cand)     # QMatrix из хранилища уже нормирован
+    profile = _as_unit_f32(profile)
+    n_cand, n_prof = cand.shape[0], profile.shape[0]
+    k = max(1, min(k, n_prof))
+
+    if n_cand == 0 or n_prof == 0:
+        return np.zeros((n_cand,) if k == 1 else (n_cand, k), dtype=np.float32)
+
+    cols = max(_MIN_BLOCK_COLS, block_bytes // (4 * n_cand))
+    best = np.full((n_cand, k), -np.inf, dtype=np.float32)
+
+    for start in range(0, n_prof, cols):
+        block = cand @ profile[start:start + cols].T      # (n_cand, ≤cols) float32
+        if k == 1:
+            np.maximum(best[:, 0], block.max(axis=1), out=best[:, 0])
+            continue
+        merged = np.concatenate([best, block], axis=1)
+        if merged.shape[1] > k:
+            idx = np.argpartition(merged, -k, axis=1)[:, -k:]
+            merged = np.take_along_axis(merged, idx, axis=1)
+        best = merged
+
+    if k == 1:
+        return best[:, 0]
+    return -np.sort(-best, axis=1)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -221,72 +464,317 @@ def _build_user_profile(user, all_posts: list) -> dict:
 
 
 # ─────────────────────────────────────────────────────────────────────────────
-# Content-based: эмбеддинги
+# Сжатый профиль вкуса: k-means центроиды лайкнутых + своих постов
 # ─────────────────────────────────────────────────────────────────────────────
+# Вместо сравнения кандидата с КАЖДЫМ лайкнутым постом храним ≤ k центроидов
+# (spherical mini-batch k-means, веса по свежести). Профиль кешируется на
+# пользователя и дообучается инкрементально при новой реакции / новом посте.
+
+PROFILE_CENTROIDS      = 8
+PROFILE_HALF_LIFE_DAYS = 30.0    # вес лайка падает вдвое за 30 дней
+PROFILE_MAX_POSTS      = 2000    # сколько последних лайков/постов берём в k-means
+PROFILE_TTL            = 3600    # полная перестройка профиля раз в час
 
-def _get_embeddings(posts: list) -> np.ndarray:
+# user_id → {'ts': время сборки, 'decay_ts': на какой момент посчитаны массы,
+#            'centroids': (k, dim) float32 unit-norm, 'mass': (k,) float32}
+_taste_cache: dict[int, dict] = {}
+
+
+def _recency_weights(timestamps: list, now: datetime) -> np.ndarray:
+    ages = np.array(
+        [max(0.0, (now - ts).total_seconds() / 86400) if ts else 365.0 for ts in timestamps],
+        dtype=np.float32,
+    )
+    return np.power(0.5, ages / PROFILE_HALF_LIFE_DAYS).astype(np.float32)
+
+
+def _minibatch_kmeans(X: np.ndarray, w: np.ndarray, k: int,
+                      n_iter: int = 20, batch: int = 256,
+                      seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Взвешенный spherical mini-batch k-means (Sculley, 2010) на NumPy.
+    X — (n, dim) unit-norm, w — (n,) веса. Возвращает (centroids, mass).
+    """
+    rng = np.random.default_rng(seed)
+    n = X.shape[0]
+    k = min(k, n)
+    p = w / w.sum()
+
+    centroids = X[rng.choice(n, size=k, replace=False, p=p)].copy()
+    seen = np.zeros(k, dtype=np.float32)
+
+    for _ in range(n_iter):
+        b = rng.choice(n, size=min(batch, n), replace=False, p=p) if n > batch else np.arange(n)
+        xb, wb = X[b], w[b]
+        assign = np.argmax(xb @ centroids.T, axis=1)
+
+        sums = np.zeros_like(centroids)
+        bw = np.zeros(k, dtype=np.float32)
+        np.add.at(sums, assign, xb * wb[:, None])
+        np.add.at(bw, assign, wb)
+
+        hit = bw > 0
+        seen[hit] += bw[hit]
+        eta = bw[hit] / seen[hit]
+        centroids[hit] += eta[:, None] * (sums[hit] / bw[hit, None] - centroids[hit])
+        centroids = _as_unit_f32(centroids)
+
+    assign = np.argmax(X @ centroids.T, axis=1)
+    mass = np.bincount(assign, weights=w, minlength=k).astype(np.float32)
+    keep = mass > 0
+    return centroids[keep], mass[keep]
+
+
+def _get_taste_profile(user_id: int) -> Optional[dict]:
+    """Центроиды вкуса пользователя (из кеша или построенные заново)."""
+    from models import Post, Reaction, db
+
+    cached = _taste_cache.get(user_id)
+    if cached is not None and time.time() - cached['ts'] < PROFILE_TTL:
+        return cached
+
+    liked = (
+        db.session.query(Post, Reaction.created_at)
+        .join(Reaction, Reaction.post_id == Post.id)
+        .filter(Reaction.user_id == user_id)
+        .order_by(Reaction.created_at.desc())
+        .limit(PROFILE_MAX_POSTS)
+        .all()
+    )
+    # По user_id через db.session, а не user.posts: профиль может строиться
+    # в потоке пула стадий со своей сессией
+    own = (
+        Post.query.filter_by(user_id=user_id)
+        .order_by(Post.created_at.desc())
+        .limit(PROFILE_MAX_POSTS)
+        .all()
+    )
+
+    # Пост с несколькими реакциями учитываем один раз (по самой свежей)
+    stamped: dict[int, tuple] = {}
+    for post, ts in liked:
+        stamped.setdefault(post.id, (post, ts))
+    for post in own:
+        stamped.setdefault(post.id, (post, post.created_at))
+    if not stamped:
+        _taste_cache.pop(user_id, None)
+        return None
+
+    posts = [p for p, _ in stamped.values()]
+    weights = _recency_weights([ts for _, ts in stamped.values()], datetime.utcnow())
+    X, have = _get_embeddings(posts)
+    if not have.any():
+        return None
+    centroids, mass = _minibatch_kmeans(_as_unit_f32(X[have]), weights[have],
+                                        PROFILE_CENTROIDS, seed=user_id)
+
+    now = time.time()
+    taste = {'ts': now, 'decay_ts': now, 'centroids': centroids, 'mass': mass}
+    if have.all():
+        # Частичный профиль (часть постов ещё в очереди энкодера) не кешируем
+        _taste_cache[user_id] = taste
+    return taste
+
+
+def _taste_add(user_id: int, post) -> None:
     """
-    Возвращает матрицу (n_posts, dim) эмбеддингов.
-    Использует кеш. При промахе — батч-кодирование.
+    Инкрементальное обновление профиля одним постом. Если вектора поста ещё
+    нет — обновление выполнит EmbeddingWorker, когда закодирует пост.
     """
-    global _cache_ts
+    if user_id not in _taste_cache:
+        return
+    vec = _post_store.get(post.id)
+    if vec is None:
+        if _encode_inline():
+            vec = _store_put(_post_store, [post.id], _fallback_embed([_post_text(post)]))[0]
+        else:
+            _worker.submit('post', post.id, _post_text(post), {'taste_user_id': user_id})
+            return
+    _taste_add_vec(user_id, vec)
+
+
+def _taste_add_vec(user_id: int, vec: np.ndarray) -> None:
+    """Старые массы затухают на прошедшее время, ближайший центроид сдвигается к вектору."""
+    taste = _taste_cache.get(user_id)
+    if taste is None:
+        return
+    vec = _as_unit_f32(vec[None, :])[0]
+    centroids, mass = taste['centroids'], taste['mass']
+    if vec.shape[0] != centroids.shape[1]:
+        _taste_cache.pop(user_id, None)
+        return
 
     now = time.time()
-    if now - _cache_ts > _CACHE_TTL:
-        _invalidate_cache()
-        _cache_ts = now
+    mass = mass * np.float32(0.5 ** ((now - taste['decay_ts']) / 86400 / PROFILE_HALF_LIFE_DAYS))
+
+    if len(centroids) < PROFILE_CENTROIDS:
+        centroids = np.vstack([centroids, vec[None, :]])
+        mass = np.append(mass, np.float32(1.0))
+    else:
+        j = int(np.argmax(centroids @ vec))
+        mass[j] += 1.0
+        centroids = centroids.copy()
+        centroids[j] += (vec - centroids[j]) / mass[j]
+        centroids = _as_unit_f32(centroids)
+
+    taste['centroids'], taste['mass'] = centroids, mass.astype(np.float32)
+    taste['decay_ts'] = now
 
-    missing_idx = [i for i, p in enumerate(posts) if p.id not in _embed_cache]
 
-    if missing_idx:
-        missing_posts = [posts[i] for i in missing_idx]
-        texts = [_post_text(p) for p in missing_posts]
+# ─────────────────────────────────────────────────────────────────────────────
+# Content-based: эмбеддинги
+# ─────────────────────────────────────────────────────────────────────────────
 
-        enc = _get_encoder()
-        if enc is not None:
+def _encode_texts(texts: list[str], batch_size: int = 64) -> np.ndarray:
+    """Синхронное кодирование: MiniLM, а без него — hashing-fallback."""
+    global _sidecar_failures
+    enc = _get_encoder()
+    if enc is None:
+        return _fallback_embed(texts)
+    sidecar = _USE_SIDECAR
+    try:
+        vecs = enc.encode(texts, batch_size=batch_size,
+                          show_progress_bar=False,
+                          normalize_embeddings=True)
+    except OSError as exc:
+        if sidecar:
+            _on_sidecar_error(exc)
+        raise
+    if sidecar:
+        _sidecar_failures = 0
+    return np.asarray(vecs, dtype=np.float32)
+
+
+def _store_put(store: EmbeddingStore, ids: list[int], vecs: np.ndarray) -> np.ndarray:
+    """Спроецировать (PCA) и записать. Возвращает вектора в пространстве хранилища."""
+    vecs = _project(np.asarray(vecs, dtype=np.float32))
+    dim = store.dim
+    if dim is not None and vecs.shape[1] != dim:
+        # Энкодер или проекция сменились — старое пространство несовместимо
+        store.clear()
+    store.put(ids, vecs)
+    return vecs
+
+
+def _on_embedded(kind: str, ids: list[int], vecs: np.ndarray, metas: list[list[dict]]) -> None:
+    """Колбэк EmbeddingWorker: пишем вектора в хранилище и будим подписчиков."""
+    vecs = _store_put(_post_store if kind == 'post' else _board_store, ids, vecs)
+
+    if kind != 'post':
+        return
+    for key, vec, meta_list in zip(ids, vecs, metas):
+        for meta in meta_list:
             try:
-                vecs = enc.encode(texts, batch_size=64,
-                                  show_progress_bar=False,
-                                  normalize_embeddings=True)
-                vecs = vecs.astype(np.float32)
+                if meta.get('taste_user_id') is not None:
+                    _taste_add_vec(meta['taste_user_id'], vec)
+                if meta.get('neighbours'):
+                    _merge_into_neighbours(_post_neighbours, key, vec)
             except Exception as e:
-                logger.warning(f"[RecoEngine] Encoder error: {e}, using TF-IDF")
-                vecs = _tfidf_embed(texts)
+                logger.warning(f"[RecoEngine] post-embed hook error: {e}")
+
+
+_worker = EmbeddingWorker(encode_fn=_encode_texts, on_done=_on_embedded, warmup=_get_encoder)
+
+
+def _encode_inline() -> bool:
+    """
+    Можно ли закодировать промахи прямо в запросе: только если MiniLM точно
+    недоступен — hashing-fallback дешёвый (O(текста)), ждать воркер незачем.
+    """
+    return _encoder_checked and _encoder is None
+
+
+def _lookup_ids(store: EmbeddingStore, kind: str, ids: list[int], load,
+                text_fn, prepare=None) -> tuple[QMatrix, np.ndarray]:
+    """
+    Возвращает (embs, have): QMatrix (n, dim) в формате хранилища и маска
+    «вектор есть». Промахи и устаревшие записи уходят в EmbeddingWorker;
+    поток запроса не ждёт энкодер (строки промахов — нули, have=False).
+    load(ids) → объекты: вызывается только для промахов, которых ещё нет
+    в очереди энкодера (нужен их текст).
+    """
+    embs, have, to_refresh = store.lookup(ids)
+
+    stale_ids = [i for i in to_refresh if not _worker.is_pending(kind, i)]
+    if stale_ids:
+        stale = load(stale_ids)
+        if stale and prepare is not None:
+            prepare(stale)
+        if _encode_inline():
+            if stale:
+                _store_put(store, [o.id for o in stale], _fallback_embed([text_fn(o) for o in stale]))
+                embs, have, _ = store.lookup(ids)
         else:
-            vecs = _tfidf_embed(texts)
+            for o in stale:
+                _worker.submit(kind, o.id, text_fn(o))
+
+    return embs, have
+
+
+def _lookup_vectors(store: EmbeddingStore, kind: str, objs: list,
+                    text_fn, prepare=None) -> tuple[QMatrix, np.ndarray]:
+    """_lookup_ids для уже загруженных объектов."""
+    by_id = {o.id: o for o in objs}
+    return _lookup_ids(store, kind, [o.id for o in objs],
+                       lambda ids: [by_id[i] for i in ids], text_fn, prepare)
 
-        for i, (idx, post) in enumerate(zip(missing_idx, missing_posts)):
-            _embed_cache[post.id] = vecs[i]
 
-    # Собираем в матрицу в порядке posts
-    rows = [_embed_cache[p.id] for p in posts]
-    return np.stack(rows, axis=0)  # (n, dim)
+def _get_embeddings(posts: list) -> tuple[QMatrix, np.ndarray]:
+    """(embs (n_posts, dim), have (n_posts,)) для постов из хранилища."""
+    return _lookup_vectors(_post_store, 'post', posts, _post_text)
 
 
-def _content_scores(candidate_posts: list, profile_posts: list) -> np.ndarray:
+def _neutral_fill(scores: np.ndarray, have: np.ndarray) -> np.ndarray:
+    """Ещё не закодированным объектам — медиана по закодированным (или 0)."""
+    if have.all():
+        return scores
+    scores[~have] = float(np.median(scores[have])) if have.any() else 0.0
+    return scores
+
+
+def _content_scores(candidate_posts: list, taste: Optional[dict]) -> np.ndarray:
     """
-    Для каждого кандидата: max cosine_similarity с любым постом профиля.
-    profile_posts = лайкнутые + свои посты пользователя.
+    Для каждого кандидата: max по центроидам вкуса (cosine × вес центроида).
+    Стоимость O(n_candidates × k), k ≤ PROFILE_CENTROIDS — не зависит от
+    того, сколько постов пользователь лайкнул.
     """
-    if not profile_posts:
-        return np.zeros(len(candidate_posts), dtype=np.float32)
+    if not candidate_posts:
+        return np.zeros(0, dtype=np.float32)
+
+    # Lookup до проверки профиля: промахи кандидатов уходят в очередь энкодера,
+    # даже если профиль вкуса ещё не готов
+    cand_embs, have = _get_embeddings(candidate_posts)
+    return _content_scores_from(cand_embs, have, taste)
 
-    all_posts = candidate_posts + profile_posts
-    all_embs  = _get_embeddings(all_posts)
 
-    cand_embs    = all_embs[:len(candidate_posts)]
-    profile_embs = all_embs[len(candidate_posts):]
+def _content_scores_from(cand_embs: QMatrix, have: np.ndarray,
+                         taste: Optional[dict]) -> np.ndarray:
+    """Скоринг по уже собранной матрице кандидатов (без обращения к ORM)."""
+    n = len(have)
+    if not taste:
+        return np.zeros(n, dtype=np.float32)
+    centroids = taste['centroids']
+    if cand_embs.shape[1] != centroids.shape[1]:
+        return np.zeros(n, dtype=np.float32)
 
-    # cosine sim matrix: (n_cand, n_profile)
-    sim = cosine_similarity(cand_embs, profile_embs)   # уже L2-нормировано
-    return sim.max(axis=1).astype(np.float32)          # (n_cand,)
+    # Лёгкие (давние, редкие) центроиды весят меньше: одна старая «лайкнутая»
+    # тема не перебивает свежие интересы через max
+    mass = taste['mass']
+    factor = 0.5 + 0.5 * mass / max(float(mass.max()), 1e-6)
+    sims = cand_embs @ centroids.T                          # (n_cand, k)
+    scores = (sims * factor[None, :]).max(axis=1).astype(np.float32)
+    return _neutral_fill(scores, have)
+
+
+def _content_stage(cand_embs: QMatrix, have: np.ndarray, user_id: int) -> np.ndarray:
+    return _content_scores_from(cand_embs, have, _get_taste_profile(user_id))
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Collaborative filtering
 # ─────────────────────────────────────────────────────────────────────────────
 
-def _collab_scores(candidate_posts: list, user_id: int) -> np.ndarray:
+def _collab_scores(cand_ids: list[int], user_id: int) -> np.ndarray:
     """
     User-item collaborative filtering на основе лайков.
     Идея: находим пользователей с похожими вкусами (по лайкам),
@@ -294,21 +782,11 @@ def _collab_scores(candidate_posts: list, user_id: int) -> np.ndarray:
 
     При малом числе данных возвращает popularity score (нормированный).
     """
-    from models import Reaction, db
-    from sqlalchemy import func
+    from models import Reaction
 
-    cand_ids = [p.id for p in candidate_posts]
     if not cand_ids:
         return np.array([], dtype=np.float32)
 
-    # Считаем общее число лайков на каждый пост-кандидат
-    counts = dict(
-        db.session.query(Reaction.post_id, func.count(Reaction.id))
-        .filter(Reaction.post_id.in_(cand_ids))
-        .group_by(Reaction.post_id)
-        .all()
-    )
-
     try:
         # ── Настоящий CF: user-item матрица ──────────────────────────────
         # Все пользователи, которые лайкали хоть что-то
@@ -338,12 +816,12 @@ def _collab_scores(candidate_posts: list, user_id: int) -> np.ndarray:
         sim_users = cosine_similarity(user_vec, mat)[0]  # (n_users,)
 
         # CF-score для кандидатов: взвешенная сумма по похожим пользователям
-        scores = np.zeros(len(candidate_posts), dtype=np.float32)
-        for i, post in enumerate(candidate_posts):
-            if post.id not in p_idx:
+        scores = np.zeros(len(cand_ids), dtype=np.float32)
+        for i, post_id in enumerate(cand_ids):
+            if post_id not in p_idx:
                 scores[i] = 0.0
                 continue
-            pi = p_idx[post.id]
+            pi = p_idx[post_id]
             # Взвешенная сумма: похожесть * лайкнул ли похожий пользователь
             scores[i] = float(np.dot(sim_users, mat[:, pi]))
 
@@ -353,12 +831,8 @@ def _collab_scores(candidate_posts: list, user_id: int) -> np.ndarray:
             scores /= max_s
 
     except Exception:
-        # Fallback: popularity (нормированный count лайков)
-        max_count = max(counts.values()) if counts else 1
-        scores = np.array(
-            [counts.get(p.id, 0) / max_count for p in candidate_posts],
-            dtype=np.float32,
-        )
+        # Fallback: popularity (нормированная затухающая популярность)
+        scores = _popularity_from_ids(cand_ids)
 
     return scores
 
@@ -397,11 +871,158 @@ def _emotional_scores(candidate_posts: list,
 # Публичный API движка
 # ─────────────────────────────────────────────────────────────────────────────
 
+# ── Бюджет задержки и уровни деградации ──────────────────────────────────────
+# Каждая дорогая стадия сверяется с оставшимся временем: если её ожидаемая
+# длительность (EWMA прошлых запусков) не помещается в остаток бюджета,
+# стадия заменяется дешёвым приближением. Уровень попадает в поле algo ленты.
+
+TIER_FULL       = 'hybrid'            # content + collab + mood + freshness
+TIER_POP_CF     = 'hybrid-pop'        # collab → кешированная популярность
+TIER_NO_CONTENT = 'hybrid-nocontent'  # content = 0
+TIER_LITE       = 'mood-fresh'        # content = 0, collab → популярность
+TIER_COLD       = 'popular'           # гость / холодный старт
+
+_STAGE_EWMA_ALPHA = 0.3
+_STAGE_SKIP_DECAY = 0.8   # пропущенная стадия «дешевеет» → со временем пробуем снова
+_stage_ms: dict[str, float] = {'content': 0.0, 'collab': 0.0}
+
+
+def _stage_fits(stage: str, deadline: Optional[float]) -> bool:
+    limit_ms = None
+    if deadline is not None:
+        limit_ms = (deadline - time.perf_counter()) * 1000.0
+    if _parallel_enabled():
+        # Стадия, которая всё равно не уложится в таймаут, только заняла бы
+        # поток пула (отменить запущенную стадию нельзя)
+        limit_ms = STAGE_TIMEOUT_MS if limit_ms is None else min(limit_ms, STAGE_TIMEOUT_MS)
+    if limit_ms is None or (limit_ms > 0 and _stage_ms[stage] <= limit_ms):
+        return True
+    _stage_ms[stage] *= _STAGE_SKIP_DECAY
+    return False
+
+
+def _stage_done(stage: str, elapsed_ms: float) -> None:
+    _stage_ms[stage] += _STAGE_EWMA_ALPHA * (elapsed_ms - _stage_ms[stage])
+
+
+# ── Параллельные стадии ──────────────────────────────────────────────────────
+# Content (BLAS) и collab (запросы к БД + BLAS) не зависят друг от друга и
+# отпускают GIL, поэтому могут идти в общий пул потоков; дешёвые emotional и
+# freshness тем временем считаются в потоке запроса. Каждая стадия в пуле
+# получает свой app context и свою сессию БД, а на вход — только id, числа
+# и матрицы: ORM-объекты сессии запроса в поток пула не передаются (сессия
+# не потокобезопасна). Lookup эмбеддингов и постановка промахов в очередь
+# делаются заранее, в потоке запроса.
+# По умолчанию выключено: bench/bench_parallel_stages.py пока не показывает
+# выигрыша (RECO_PARALLEL_STAGES=1 — включить).
+
+PARALLEL_STAGES  = os.environ.get('RECO_PARALLEL_STAGES', '0') != '0'
+STAGE_WORKERS    = int(os.environ.get('RECO_STAGE_WORKERS', 4))
+STAGE_TIMEOUT_MS = float(os.environ.get('RECO_STAGE_TIMEOUT_MS', 500))
+
+_stage_pool = None
+_stage_pool_pid: Optional[int] = None
+
+
+def _get_stage_pool():
+    """Общий ThreadPoolExecutor; после fork создаётся заново (потоки не наследуются)."""
+    global _stage_pool, _stage_pool_pid
+    if _stage_pool is None or _stage_pool_pid != os.getpid():
+        from concurrent.futures import ThreadPoolExecutor
+        _stage_pool = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix='reco-stage')
+        _stage_pool_pid = os.getpid()
+    return _stage_pool
+
+
+def _parallel_enabled() -> bool:
+    if not PARALLEL_STAGES:
+        return False
+    from models import db
+    # In-memory SQLite — одно соединение на процесс, потокам его делить нельзя
+    return db.engine.url.database not in (None, '', ':memory:')
+
+
+def _run_stage(fn, *args):
+    """
+    Future с (результат, мс). В пуле — со своим app context и сессией;
+    при выключенном параллелизме стадия выполняется сразу, в этом потоке.
+    """
+    from concurrent.futures import Future
+    from flask import current_app
+    from models import db
+
+    def timed():
+        started = time.perf_counter()
+        return fn(*args), (time.perf_counter() - started) * 1000.0
+
+    if not _parallel_enabled():
+        done: Future = Future()
+        try:
+            done.set_result(timed())
+        except Exception as exc:
+            done.set_exception(exc)
+        return done
+
+    app = current_app._get_current_object()
+
+    def in_context():
+        with app.app_context():
+            try:
+                return timed()
+            finally:
+                db.session.remove()
+
+    return _get_stage_pool().submit(in_context)
+
+
+def _stage_result(stage: str, future, deadline: Optional[float], fallback):
+    """
+    (scores, ok). Ждём не дольше STAGE_TIMEOUT_MS и остатка бюджета; по
+    таймауту или ошибке — fallback() (стадия в пуле доработает впустую).
+    """
+    from concurrent.futures import TimeoutError as StageTimeout
+
+    timeout = STAGE_TIMEOUT_MS / 1000.0
+    if deadline is not None:
+        timeout = min(timeout, max(deadline - time.perf_counter(), 0.0))
+    waited = time.perf_counter()
+    try:
+        scores, elapsed_ms = future.result(timeout=timeout)
+        if stage in _stage_ms:
+            _stage_done(stage, elapsed_ms)
+        return scores, True
+    except StageTimeout:
+        if stage in _stage_ms:
+            _stage_done(stage, (time.perf_counter() - waited) * 1000.0)
+        logger.warning(f"[RecoEngine] {stage} stage timed out")
+    except Exception as e:
+        logger.warning(f"[RecoEngine] {stage} stage error: {e}")
+    return fallback(), False
+
+
+def _popularity_scores(candidate_posts: list) -> np.ndarray:
+    """
+    Нормированная затухающая популярность (services/popularity.py):
+    один запрос по PK, без GROUP BY по реакциям.
+    """
+    return _popularity_from_ids([p.id for p in candidate_posts])
+
+
+def _popularity_from_ids(post_ids: list[int]) -> np.ndarray:
+    from services.popularity import decayed_scores
+
+    scores = decayed_scores(post_ids)
+    pop = np.array([scores.get(i, 0.0) for i in post_ids], dtype=np.float32)
+    return pop / max(float(pop.max(initial=0.0)), 1e-6)
+
+
 def score_and_rank(
     candidate_posts: list,
     current_user,
     requested_mood: Optional[str] = None,
     exclude_ids: Optional[set] = None,
+    budget_ms: Optional[float] = None,
+    seen=None,
 ) -> list:
     """
     Основная функция движка.
@@ -412,55 +1033,70 @@ def score_and_rank(
     current_user     — User | None (None → гость, возвращает по популярности)
     requested_mood   — фильтр mood от пользователя (из ?mood=calm)
     exclude_ids      — set[int] уже показанных post_id (для пагинации)
+    budget_ms        — бюджет задержки; None = без ограничения
+    seen             — просмотренные посты (services/seen_filter.SeenSet или
+                       любой объект с contains_many(ids) → bool-маска)
 
     Возвращает
     ----------
     Список Post отсортированный по убыванию финального score.
     """
-    if not candidate_posts:
-        return []
+    return score_and_rank_tiered(candidate_posts, current_user, requested_mood,
+                                 exclude_ids, budget_ms, seen)[0]
+
+
+def score_and_rank_tiered(
+    candidate_posts: list,
+    current_user,
+    requested_mood: Optional[str] = None,
+    exclude_ids: Optional[set] = None,
+    budget_ms: Optional[float] = None,
+    seen=None,
+) -> tuple[list, str]:
+    """То же, что score_and_rank, но возвращает (posts, tier) — см. TIER_*."""
+    deadline = None if budget_ms is None else time.perf_counter() + budget_ms / 1000.0
 
     # Исключаем уже виденные
     if exclude_ids:
         candidate_posts = [p for p in candidate_posts if p.id not in exclude_ids]
+    if seen is not None and candidate_posts:
+        unseen = ~seen.contains_many(np.fromiter((p.id for p in candidate_posts),
+                                                 dtype=np.int64, count=len(candidate_posts)))
+        candidate_posts = [p for p, keep in zip(candidate_posts, unseen) if keep]
+    if not candidate_posts:
+        return [], TIER_COLD if current_user is None else TIER_FULL
 
     # Гости: простая сортировка (популярность + свежесть)
     if current_user is None:
         now = datetime.utcnow()
-        return _rank_cold(candidate_posts, now)
+        return _rank_cold(candidate_posts, now), TIER_COLD
 
     # ── Профиль пользователя ─────────────────────────────────────────────
     profile = _build_user_profile(current_user, candidate_posts)
     liked   = profile['liked_post_ids']
     own     = profile['own_post_ids']
 
-    # Посты для user-профиля в content-based (лайкнутые + свои)
-    all_post_map = {p.id: p for p in candidate_posts}
-    profile_posts = [
-        all_post_map[pid] for pid in (liked | own)
-        if pid in all_post_map
-    ]
-
     # Холодный старт: нет лайков, нет постов → опираемся только на свежесть+популярность
     cold_start = len(liked) == 0 and len(own) == 0
 
     now = datetime.utcnow()
+    n = len(candidate_posts)
+    zeros = lambda: np.zeros(n, dtype=np.float32)   # noqa: E731
 
     # ── Четыре компонента score ──────────────────────────────────────────
-    try:
-        if cold_start or not profile_posts:
-            content = np.zeros(len(candidate_posts), dtype=np.float32)
-        else:
-            content = _content_scores(candidate_posts, profile_posts)
-    except Exception as e:
-        logger.warning(f"[RecoEngine] content_scores error: {e}")
-        content = np.zeros(len(candidate_posts), dtype=np.float32)
-
-    try:
-        collab = _collab_scores(candidate_posts, current_user.id)
-    except Exception as e:
-        logger.warning(f"[RecoEngine] collab_scores error: {e}")
-        collab = np.zeros(len(candidate_posts), dtype=np.float32)
+    # content и collab — в пул стадий (см. _run_stage), пока они считаются,
+    # поток запроса считает emotional и freshness. Холодному старту обе
+    # стадии не нужны: без лайков collab всё равно свёлся бы к популярности
+    content_job = collab_job = None
+    if not cold_start and _stage_fits('content', deadline):
+        try:
+            # Lookup (и постановка промахов в очередь) — здесь, в потоке запроса
+            cand_embs, have = _get_embeddings(candidate_posts)
+            content_job = _run_stage(_content_stage, cand_embs, have, current_user.id)
+        except Exception as e:
+            logger.warning(f"[RecoEngine] content_scores error: {e}")
+    if not cold_start and _stage_fits('collab', deadline):
+        collab_job = _run_stage(_collab_scores, [p.id for p in candidate_posts], current_user.id)
 
     emotional = _emotional_scores(
         candidate_posts,
@@ -474,6 +1110,19 @@ def score_and_rank(
         dtype=np.float32,
     )
 
+    content, content_ok = zeros(), cold_start   # холодному старту content не нужен
+    if content_job is not None:
+        content, content_ok = _stage_result('content', content_job, deadline, zeros)
+    collab, collab_ok = None, False
+    if collab_job is not None:
+        collab, collab_ok = _stage_result('collab', collab_job, deadline, lambda: None)
+    if collab is None:
+        try:
+            collab = _popularity_scores(candidate_posts)
+        except Exception as e:
+            logger.warning(f"[RecoEngine] popularity fallback error: {e}")
+            collab = zeros()
+
     # ── Финальный score ──────────────────────────────────────────────────
     weights = (ALPHA, BETA, GAMMA, DELTA)
     if cold_start:
@@ -493,47 +1142,133 @@ def score_and_rank(
         if post.user_id in following_ids:
             final[i] = min(1.0, final[i] + 0.08)
 
+    if cold_start:
+        tier = TIER_COLD
+    elif content_ok and collab_ok:
+        tier = TIER_FULL
+    elif content_ok:
+        tier = TIER_POP_CF
+    elif collab_ok:
+        tier = TIER_NO_CONTENT
+    else:
+        tier = TIER_LITE
+
     # Сортируем по убыванию
     order = np.argsort(final)[::-1]
-    return [candidate_posts[i] for i in order]
+    return [candidate_posts[i] for i in order], tier
 
 
 def _rank_cold(posts: list, now: datetime) -> list:
     """
     Ранжирование для гостей / cold-start:
-    popularity (число реакций) + freshness.
+    popularity (затухающая, services/popularity.py) + freshness.
     """
-    from models import Reaction, db
-    from sqlalchemy import func
+    if not posts:
+        return []
+    pop = _popularity_scores(posts)
+    fresh = np.array([_freshness(p, now) for p in posts], dtype=np.float32)
+    order = np.argsort(-(0.5 * pop + 0.5 * fresh), kind='stable')
+    return [posts[i] for i in order]
+
+
+# ── Общий рейтинг гостей и холодного старта ──────────────────────────────────
+# Ответ _rank_cold не зависит от пользователя → считаем его раз в
+# COLD_SNAPSHOT_TTL на бакет mood ('' = все) и раздаём срезами.
+
+COLD_SNAPSHOT_TTL = float(os.environ.get('RECO_COLD_SNAPSHOT_TTL', 60))
+COLD_POOL_SIZE    = 300
+COLD_MOOD_BUCKETS = [''] + ALL_MOODS
 
-    post_ids = [p.id for p in posts]
-    counts = {}
-    if post_ids:
-        rows = (
-            db.session.query(Reaction.post_id, func.count(Reaction.id))
-            .filter(Reaction.post_id.in_(post_ids))
-            .group_by(Reaction.post_id)
-            .all()
-        )
-        counts = {r[0]: r[1] for r in rows}
 
-    max_c = max(counts.values(), default=1)
+def cold_snapshot(mood: Optional[str] = None, pool_size: int = COLD_POOL_SIZE):
+    """
+    FeedSnapshot (ids, tier=TIER_COLD) свежих публичных постов бакета mood,
+    отсортированных _rank_cold. Пересчёт — один поток на истечение TTL.
+    """
+    from services.feed_cache import cold_snapshots
+
+    def build():
+        from models import MoodEnum, Post, VisibilityEnum
+
+        query = Post.query.filter(Post.visibility == VisibilityEnum.public)
+        if mood:
+            query = query.filter(Post.mood == MoodEnum(mood))
+        pool = query.order_by(Post.created_at.desc()).limit(pool_size).all()
+        return [p.id for p in _rank_cold(pool, datetime.utcnow())], TIER_COLD
+
+    return cold_snapshots.get_or_build((mood or '', pool_size, ENGINE_VERSION),
+                                       build, COLD_SNAPSHOT_TTL)
 
-    def score(post):
-        pop = counts.get(post.id, 0) / max_c
-        fresh = _freshness(post, now)
-        return 0.5 * pop + 0.5 * fresh
 
-    return sorted(posts, key=score, reverse=True)
+def is_cold_start(user) -> bool:
+    """Нет реакций, постов и подписок — персонализировать нечем."""
+    from models import Post, Reaction, db, follows
+
+    for stmt in (
+        db.select(Reaction.id).where(Reaction.user_id == user.id),
+        db.select(Post.id).where(Post.user_id == user.id),
+        db.select(follows.c.followed_id).where(follows.c.follower_id == user.id),
+    ):
+        if db.session.execute(stmt.limit(1)).first() is not None:
+            return False
+    return True
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Вызывается из posts.py при создании нового поста → сброс кеша
 # ─────────────────────────────────────────────────────────────────────────────
 
-def on_post_created():
-    """Инвалидирует кеш эмбеддингов при публикации нового поста."""
-    _invalidate_cache()
+def on_post_created(post=None):
+    """
+    Новый пост: ставим его в очередь энкодера. Когда вектор будет готов,
+    воркер дообучит профиль вкуса автора и (для публичного оригинала)
+    встроит пост в посчитанные списки похожих постов. Запрос не ждёт.
+    """
+    if post is None:
+        return
+    public_original = (
+        post.post_kind is None
+        and getattr(post.visibility, 'value', post.visibility) == 'public'
+    )
+    meta = {'neighbours': public_original and bool(_post_neighbours)}
+    if post.user_id in _taste_cache:
+        meta['taste_user_id'] = post.user_id
+    if _encode_inline():
+        vec = _fallback_embed([_post_text(post)])
+        _on_embedded('post', [post.id], vec, [[meta]])
+    else:
+        _worker.submit('post', post.id, _post_text(post), meta)
+
+
+def on_post_updated(post) -> None:
+    """Текст поста изменился: пересчитать вектор (старый отдаётся до готовности)."""
+    if _encode_inline():
+        _store_put(_post_store, [post.id], _fallback_embed([_post_text(post)]))
+    else:
+        _worker.submit('post', post.id, _post_text(post))
+    _post_neighbours.pop(post.id, None)
+
+
+def on_post_removed(post_id: int) -> None:
+    """Пост удалён или стал приватным: вектор и список соседей больше не нужны."""
+    _worker.cancel('post', [post_id])
+    _post_store.discard([post_id])
+    _post_neighbours.pop(post_id, None)
+
+
+def on_reaction_changed(user_id: int, post, added: bool) -> None:
+    """
+    Новая реакция дообучает кешированный профиль вкуса пользователя;
+    снятая — сбрасывает его (перестроится при следующем запросе).
+    """
+    if not added:
+        _taste_cache.pop(user_id, None)
+        return
+    try:
+        _taste_add(user_id, post)
+    except Exception as e:
+        logger.warning(f"[RecoEngine] taste profile update error: {e}")
+        _taste_cache.pop(user_id, None)
 
 
 # ═════════════════════════════════════════════════════════════════════════════
@@ -562,15 +1297,85 @@ BOARD_FRESHNESS_DECAY_HOURS = 7 * 24.0
 # Окно для momentum: подписки за последние 48 часов
 MOMENTUM_WINDOW_HOURS = 48.0
 
-# Кеш эмбеддингов досок (отдельный от постового)
-_board_embed_cache: dict[int, np.ndarray] = {}
-_board_cache_ts: float = 0.0
+# Сколько последних постов доски достаём для mood / текста / активности.
+# Берём максимум из всех потребителей (текст — 20, mood — 30, профиль — 10).
+BOARD_SAMPLE_POSTS = 30
+
+# Хранилище эмбеддингов досок (отдельное от постового)
+_board_store = EmbeddingStore('board', _CACHE_TTL, dtype=EMBED_DTYPE)
 
 
 def _invalidate_board_cache() -> None:
-    global _board_embed_cache, _board_cache_ts
-    _board_embed_cache = {}
-    _board_cache_ts = 0.0
+    _board_store.clear()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Последние посты досок: один оконный запрос + мемо на время запроса
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _board_posts_memo() -> dict[int, list]:
+    """
+    board_id → последние BOARD_SAMPLE_POSTS постов (created_at DESC).
+    Живёт в flask.g, т.е. ровно один HTTP-запрос; общий для всех board-функций.
+    """
+    from flask import g, has_app_context
+    if not has_app_context():
+        return {}
+    memo = g.get('_reco_board_posts')
+    if memo is None:
+        memo = {}
+        g._reco_board_posts = memo
+    return memo
+
+
+def _board_recent_posts(boards: list, limit: int = BOARD_SAMPLE_POSTS) -> dict[int, list]:
+    """
+    Возвращает {board_id: [Post, ...]} — до `limit` последних постов каждой доски.
+
+    Доски, которых ещё нет в мемо, догружаются ОДНИМ запросом:
+      ROW_NUMBER() OVER (PARTITION BY board_id ORDER BY created_at DESC) <= N
+    вместо `board.posts.limit(N)` на каждую доску.
+    """
+    from models import Post, db
+    from sqlalchemy import func
+
+    memo = _board_posts_memo()
+    missing = list({b.id for b in boards if b.id not in memo})
+
+    if missing:
+        rn = func.row_number().over(
+            partition_by=Post.board_id,
+            order_by=(Post.created_at.desc(), Post.id.desc()),
+        ).label('rn')
+        ranked = (
+            db.session.query(Post.id.label('post_id'), rn)
+            .filter(Post.board_id.in_(missing))
+            .subquery()
+        )
+        rows = (
+            Post.query
+            .join(ranked, Post.id == ranked.c.post_id)
+            .filter(ranked.c.rn <= BOARD_SAMPLE_POSTS)
+            .order_by(Post.board_id, ranked.c.rn)
+            .all()
+        )
+        for bid in missing:
+            memo[bid] = []
+        for p in rows:
+            memo[p.board_id].append(p)
+
+    return {b.id: memo.get(b.id, [])[:limit] for b in boards}
+
+
+def _dominant_mood_of(posts: list) -> str | None:
+    mood_counter: dict[str, int] = {}
+    for p in posts:
+        m = _get_mood_str(p)
+        if m:
+            mood_counter[m] = mood_counter.get(m, 0) + 1
+    if mood_counter:
+        return max(mood_counter, key=mood_counter.get)
+    return None
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -597,16 +1402,10 @@ def _board_text(board) -> str:
         tags = board.tags if isinstance(board.tags, list) else []
         parts.extend(tags)
 
-    # Dominant mood из постов доски (берём первые 20 для скорости)
+    # Dominant mood из постов доски (последние 20 для скорости)
     try:
-        board_posts = board.posts.limit(20).all()
-        mood_counter: dict[str, int] = {}
-        for p in board_posts:
-            m = _get_mood_str(p)
-            if m:
-                mood_counter[m] = mood_counter.get(m, 0) + 1
-        if mood_counter:
-            dominant = max(mood_counter, key=mood_counter.get)
+        dominant = _dominant_mood_of(_board_recent_posts([board], 20)[board.id])
+        if dominant:
             parts.append(dominant)
     except Exception:
         pass
@@ -617,56 +1416,20 @@ def _board_text(board) -> str:
 def _board_dominant_mood(board) -> str | None:
     """Вычисляет доминирующий mood из постов доски."""
     try:
-        board_posts = board.posts.limit(30).all()
-        mood_counter: dict[str, int] = {}
-        for p in board_posts:
-            m = _get_mood_str(p)
-            if m:
-                mood_counter[m] = mood_counter.get(m, 0) + 1
-        if mood_counter:
-            return max(mood_counter, key=mood_counter.get)
+        return _dominant_mood_of(_board_recent_posts([board], 30)[board.id])
     except Exception:
-        pass
-    return None
+        return None
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Эмбеддинги досок (отдельный кеш)
 # ─────────────────────────────────────────────────────────────────────────────
 
-def _get_board_embeddings(boards: list) -> np.ndarray:
-    """Батч-кодирование досок. Кеш TTL = CACHE_TTL (10 мин)."""
-    global _board_cache_ts
-
-    now_t = time.time()
-    if now_t - _board_cache_ts > _CACHE_TTL:
-        _invalidate_board_cache()
-        _board_cache_ts = now_t
-
-    missing_idx = [i for i, b in enumerate(boards) if b.id not in _board_embed_cache]
-
-    if missing_idx:
-        missing_boards = [boards[i] for i in missing_idx]
-        texts = [_board_text(b) for b in missing_boards]
-
-        enc = _get_encoder()
-        if enc is not None:
-            try:
-                vecs = enc.encode(texts, batch_size=32,
-                                  show_progress_bar=False,
-                                  normalize_embeddings=True)
-                vecs = vecs.astype(np.float32)
-            except Exception as e:
-                logger.warning(f"[RecoEngine-Board] Encoder error: {e}, TF-IDF fallback")
-                vecs = _tfidf_embed(texts)
-        else:
-            vecs = _tfidf_embed(texts)
-
-        for i, board in enumerate(missing_boards):
-            _board_embed_cache[board.id] = vecs[i]
-
-    rows = [_board_embed_cache[b.id] for b in boards]
-    return np.stack(rows, axis=0)
+def _get_board_embeddings(boards: list) -> tuple[QMatrix, np.ndarray]:
+    """(embs, have) для досок; промахи кодирует EmbeddingWorker."""
+    # prepare: последние посты всех пересчитываемых досок одним запросом для _board_text
+    return _lookup_vectors(_board_store, 'board', boards, _board_text,
+                           prepare=_board_recent_posts)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -714,11 +1477,11 @@ def _build_user_board_profile(user, candidate_boards: list) -> dict:
     post_mood_counts: dict[str, float] = {m: 0.0 for m in ALL_MOODS}
     # Берём посты из кандидатских досок для mood-сигнала
     all_board_posts = []
-    for b in candidate_boards:
-        try:
-            all_board_posts.extend(b.posts.limit(10).all())
-        except Exception:
-            pass
+    try:
+        for posts in _board_recent_posts(candidate_boards, 10).values():
+            all_board_posts.extend(posts)
+    except Exception:
+        pass
 
     post_map = {p.id: p for p in all_board_posts}
     for pid in liked_post_ids | own_post_ids:
@@ -762,23 +1525,30 @@ def _board_content_scores(candidate_boards: list, profile_boards: list) -> np.nd
     if not profile_boards:
         return np.zeros(len(candidate_boards), dtype=np.float32)
 
-    all_boards = candidate_boards + profile_boards
-    all_embs   = _get_board_embeddings(all_boards)
+    all_boards     = candidate_boards + profile_boards
+    all_embs, have = _get_board_embeddings(all_boards)
+    return _board_content_from(all_embs, have, len(candidate_boards))
+
 
-    cand_embs    = all_embs[:len(candidate_boards)]
-    profile_embs = all_embs[len(candidate_boards):]
+def _board_content_from(all_embs: QMatrix, have: np.ndarray, n: int) -> np.ndarray:
+    """Первые n строк — кандидаты, остальные — доски профиля. Без обращения к ORM."""
+    cand_embs, cand_have = all_embs[:n], have[:n]
+    profile_embs = all_embs[n:][have[n:]]
+    if not len(profile_embs):
+        return np.zeros(n, dtype=np.float32)
 
-    sim = cosine_similarity(cand_embs, profile_embs)
-    return sim.max(axis=1).astype(np.float32)
+    scores = _chunked_similarity(cand_embs, profile_embs)
+    return _neutral_fill(scores, cand_have)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Collaborative filtering для досок
 # ─────────────────────────────────────────────────────────────────────────────
 
-def _board_collab_scores(candidate_boards: list, user_id: int) -> np.ndarray:
+def _board_collab_scores(candidates: list[tuple[int, int]], user_id: int) -> np.ndarray:
     """
     User-board CF: кто ещё подписан на те же доски → что они ещё смотрят.
+    candidates — [(board_id, followers_count), ...].
 
     Матрица: пользователи × доски (binary: подписан / нет).
     При недостатке данных → popularity fallback (followers_count).
@@ -786,7 +1556,7 @@ def _board_collab_scores(candidate_boards: list, user_id: int) -> np.ndarray:
     from models import db
     from sqlalchemy import text as sa_text
 
-    cand_ids = [b.id for b in candidate_boards]
+    cand_ids = [bid for bid, _ in candidates]
     if not cand_ids:
         return np.array([], dtype=np.float32)
 
@@ -815,12 +1585,12 @@ def _board_collab_scores(candidate_boards: list, user_id: int) -> np.ndarray:
         user_vec  = mat[u_idx[user_id]].reshape(1, -1)
         sim_users = cosine_similarity(user_vec, mat)[0]  # (n_users,)
 
-        scores = np.zeros(len(candidate_boards), dtype=np.float32)
-        for i, board in enumerate(candidate_boards):
-            if board.id not in b_idx:
+        scores = np.zeros(len(cand_ids), dtype=np.float32)
+        for i, board_id in enumerate(cand_ids):
+            if board_id not in b_idx:
                 scores[i] = 0.0
                 continue
-            bi = b_idx[board.id]
+            bi = b_idx[board_id]
             scores[i] = float(np.dot(sim_users, mat[:, bi]))
 
         max_s = scores.max()
@@ -829,10 +1599,10 @@ def _board_collab_scores(candidate_boards: list, user_id: int) -> np.ndarray:
 
     except Exception:
         # Fallback: нормированный followers_count
-        max_f = max((b.followers_count for b in candidate_boards), default=1)
+        max_f = max((f or 0 for _, f in candidates), default=1)
         max_f = max(max_f, 1)
         scores = np.array(
-            [b.followers_count / max_f for b in candidate_boards],
+            [(f or 0) / max_f for _, f in candidates],
             dtype=np.float32,
         )
 
@@ -875,7 +1645,8 @@ def _board_freshness(board, now: datetime) -> float:
     # Дата последнего поста
     last_post_decay = 0.0
     try:
-        last_post = board.posts.order_by('created_at desc').first()
+        recent = _board_recent_posts([board], 1)[board.id]
+        last_post = recent[0] if recent else None
         if last_post:
             hours_since_post = max(
                 0.0, (now - last_post.created_at).total_seconds() / 3600
@@ -988,6 +1759,9 @@ def rank_boards_personalized(
     if not candidates:
         return candidate_boards
 
+    # Последние посты всех досок — один запрос на весь ранкинг
+    _board_recent_posts(candidate_boards)
+
     # Профиль пользователя
     profile = _build_user_board_profile(current_user, candidate_boards)
     cold_start = profile['cold_start']
@@ -1001,23 +1775,20 @@ def rank_boards_personalized(
     ]
 
     now = datetime.utcnow()
+    zeros = lambda: np.zeros(len(candidates), dtype=np.float32)   # noqa: E731
 
-    # ── Content-based ──────────────────────────────────────────────────────
-    try:
-        if cold_start or not profile_boards:
-            content = np.zeros(len(candidates), dtype=np.float32)
-        else:
-            content = _board_content_scores(candidates, profile_boards)
-    except Exception as e:
-        logger.warning(f"[RecoEngine-Board] content error: {e}")
-        content = np.zeros(len(candidates), dtype=np.float32)
+    # ── Content-based (пул стадий) ─────────────────────────────────────────
+    content_job = None
+    if not cold_start and profile_boards:
+        try:
+            all_embs, have = _get_board_embeddings(candidates + profile_boards)
+            content_job = _run_stage(_board_content_from, all_embs, have, len(candidates))
+        except Exception as e:
+            logger.warning(f"[RecoEngine-Board] content error: {e}")
 
-    # ── Collaborative ──────────────────────────────────────────────────────
-    try:
-        collab = _board_collab_scores(candidates, current_user.id)
-    except Exception as e:
-        logger.warning(f"[RecoEngine-Board] collab error: {e}")
-        collab = np.zeros(len(candidates), dtype=np.float32)
+    # ── Collaborative (пул стадий) ─────────────────────────────────────────
+    collab_job = _run_stage(_board_collab_scores,
+                            [(b.id, b.followers_count) for b in candidates], current_user.id)
 
     # ── Emotional ──────────────────────────────────────────────────────────
     emotional = _board_emotional_scores(candidates, profile['mood_histogram'])
@@ -1028,6 +1799,11 @@ def rank_boards_personalized(
         dtype=np.float32,
     )
 
+    content = zeros()
+    if content_job is not None:
+        content, _ = _stage_result('board-content', content_job, None, zeros)
+    collab, _ = _stage_result('board-collab', collab_job, None, zeros)
+
     # ── Финальный score ────────────────────────────────────────────────────
     if cold_start:
         # Cold start: упор на popularity + freshness
@@ -1064,6 +1840,7 @@ def rank_boards_trending(candidate_boards: list) -> list:
         return []
 
     now = datetime.utcnow()
+    _board_recent_posts(candidate_boards)
 
     # Popularity
     max_f = max((b.followers_count for b in candidate_boards), default=1)
@@ -1096,6 +1873,227 @@ def rank_boards_trending(candidate_boards: list) -> list:
 # Вызывается из boards.py при follow/create → сброс кеша
 # ─────────────────────────────────────────────────────────────────────────────
 
-def on_board_changed() -> None:
-    """Инвалидирует кеш эмбеддингов досок."""
-    _invalidate_board_cache()
\ No newline at end of file
+def on_board_changed(board=None) -> None:
+    """
+    Доска создана / изменена → перекодировать её в фоне.
+    Без аргумента (follow/unfollow) текст досок не меняется — ничего не делаем.
+    """
+    if board is None:
+        return
+    _board_recent_posts([board])
+    if _encode_inline():
+        _store_put(_board_store, [board.id], _fallback_embed([_board_text(board)]))
+    else:
+        _worker.submit('board', board.id, _board_text(board))
+    _board_neighbours.pop(board.id, None)
+
+
+def on_board_removed(board_id: int) -> None:
+    """Доска удалена или стала приватной: вектор и список соседей больше не нужны."""
+    _worker.cancel('board', [board_id])
+    _board_store.discard([board_id])
+    _board_neighbours.pop(board_id, None)
+
+# ═════════════════════════════════════════════════════════════════════════════
+# MORE-LIKE-THIS: похожие посты и доски
+# ═════════════════════════════════════════════════════════════════════════════
+#
+#   similar_post_ids(post)   → GET /api/posts/<id>/similar
+#   similar_board_ids(board) → GET /api/boards/<id>/similar
+#
+# Brute-force top-k по тем же кешам эмбеддингов (вектора L2-нормированы,
+# поэтому cosine = dot). Для каждого id кешируется список соседей длины
+# SIMILAR_CACHE_K вместе с их score, так что повторный вызов — один lookup.
+# Фильтр «не приватное / не своё» применяется на чтении (зависит от зрителя).
+# ─────────────────────────────────────────────────────────────────────────────
+
+SIMILAR_CACHE_K   = 50     # сколько соседей держим в кеше на один id
+SIMILAR_POOL_SIZE = 5000   # максимум кандидатов в brute-force (свежие публичные)
+# Холодный старт: пока закодировано меньше SIMILAR_MIN_COVERAGE пула, список
+# соседей неполный — кешируем его лишь на SIMILAR_PARTIAL_TTL секунд
+SIMILAR_MIN_COVERAGE = 0.9
+SIMILAR_PARTIAL_TTL  = 30
+
+# id → (expires_at, anchor_vec, neighbour_ids, neighbour_scores)
+_post_neighbours:  dict[int, tuple[float, np.ndarray, list[int], np.ndarray]] = {}
+_board_neighbours: dict[int, tuple[float, np.ndarray, list[int], np.ndarray]] = {}
+
+
+def _topk_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Индексы k наибольших score по убыванию (argpartition + сортировка k)."""
+    if k <= 0 or scores.size == 0:
+        return np.array([], dtype=np.int64)
+    if k >= scores.size:
+        return np.argsort(scores)[::-1]
+    part = np.argpartition(scores, -k)[-k:]
+    return part[np.argsort(scores[part])[::-1]]
+
+
+def _neighbours_from(anchor_id: int, anchor_vec: np.ndarray,
+                     pool_ids: list[int], pool_embs: QMatrix):
+    scores = pool_embs @ anchor_vec                 # (n_pool,) — один GEMV
+    ids = np.asarray(pool_ids)
+    mask = ids != anchor_id
+    ids, scores = ids[mask], scores[mask]
+    top = _topk_indices(scores, SIMILAR_CACHE_K)
+    return [int(i) for i in ids[top]], scores[top].astype(np.float32)
+
+
+def _cached_neighbours(cache: dict, key: int) -> Optional[list[int]]:
+    entry = cache.get(key)
+    if entry is None or time.time() > entry[0]:
+        return None
+    return entry[2]
+
+
+def _similar_from_pool(cache: dict, anchor_id: int, pool_ids: list[int],
+                       embs: QMatrix, have: np.ndarray) -> list[int]:
+    anchor = pool_ids.index(anchor_id)
+    if not have[anchor]:
+        return []     # якорь ещё в очереди энкодера — ответ не кешируем
+    have_ids = [i for i, h in zip(pool_ids, have) if h]
+    ids, scores = _neighbours_from(anchor_id, embs[anchor], have_ids, embs[have])
+    ttl = _CACHE_TTL if have.mean() >= SIMILAR_MIN_COVERAGE else SIMILAR_PARTIAL_TTL
+    cache[anchor_id] = (time.time() + ttl, embs[anchor], ids, scores)
+    return ids
+
+
+def similar_post_ids(post) -> list[int]:
+    """
+    До SIMILAR_CACHE_K id постов, похожих на `post`, по убыванию сходства.
+    Кандидаты — публичные оригинальные посты (без репостов/сохранений).
+    """
+    from models import Post, VisibilityEnum, db
+
+    cached = _cached_neighbours(_post_neighbours, post.id)
+    if cached is not None:
+        return cached
+
+    # Пул — только id: объекты нужны лишь промахам хранилища (текст для энкодера)
+    pool_ids = list(db.session.scalars(
+        db.select(Post.id)
+        .where(Post.visibility == VisibilityEnum.public, Post.post_kind.is_(None))
+        .order_by(Post.created_at.desc())
+        .limit(SIMILAR_POOL_SIZE)
+    ))
+    if post.id not in pool_ids:
+        pool_ids.append(post.id)
+
+    def load(ids):
+        return Post.query.filter(Post.id.in_(ids)).all()
+
+    embs, have = _lookup_ids(_post_store, 'post', pool_ids, load, _post_text)
+    return _similar_from_pool(_post_neighbours, post.id, pool_ids, embs, have)
+
+
+def similar_board_ids(board) -> list[int]:
+    """До SIMILAR_CACHE_K id публичных досок, похожих на `board`."""
+    from models import Board, db
+
+    cached = _cached_neighbours(_board_neighbours, board.id)
+    if cached is not None:
+        return cached
+
+    pool_ids = list(db.session.scalars(
+        db.select(Board.id)
+        .where(Board.is_public.is_(True))
+        .order_by(Board.followers_count.desc())
+        .limit(SIMILAR_POOL_SIZE)
+    ))
+    if board.id not in pool_ids:
+        pool_ids.append(board.id)
+
+    def load(ids):
+        return Board.query.filter(Board.id.in_(ids)).all()
+
+    embs, have = _lookup_ids(_board_store, 'board', pool_ids, load, _board_text,
+                             prepare=_board_recent_posts)
+    return _similar_from_pool(_board_neighbours, board.id, pool_ids, embs, have)
+
+
+def _merge_into_neighbours(cache: dict, new_id: int, new_vec: np.ndarray) -> None:
+    """
+    Инкрементальное обновление: новый объект встраивается в уже посчитанные
+    списки соседей, если он ближе текущего k-го. Один GEMV по всем якорям.
+    """
+    keys = [k for k, e in cache.items()
+            if k != new_id and e[1].shape == new_vec.shape]
+    if not keys:
+        return
+    anchors = np.stack([cache[k][1] for k in keys], axis=0)
+    sims = anchors @ new_vec
+    for key, s in zip(keys, sims):
+        expires, vec, ids, scores = cache[key]
+        if new_id in ids:
+            continue
+        if len(ids) >= SIMILAR_CACHE_K and s <= scores[-1]:
+            continue
+        pos = int(np.searchsorted(-scores, -s))
+        ids = ids[:pos] + [new_id] + ids[pos:]
+        scores = np.insert(scores, pos, s)
+        cache[key] = (expires, vec, ids[:SIMILAR_CACHE_K], scores[:SIMILAR_CACHE_K])
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# ПРОГРЕВ (WSGI-сервер с preload: master до fork + каждый воркер после)
+# ═════════════════════════════════════════════════════════════════════════════
+#
+# warmup() — в master до fork: только данные (снимки холодного старта,
+# индекс трендов), они делятся воркерами copy-on-write. Энкодер в master не
+# загружается и ничего не кодирует: пулы потоков torch/OpenMP не переживают
+# fork, и воркер мог бы зависнуть на первом encode.
+# warmup_vectors() — в воркере после fork: свежие посты/доски ставятся в
+# очередь его EmbeddingWorker, энкодер грузится в фоновом потоке.
+# ─────────────────────────────────────────────────────────────────────────────
+
+WARMUP_POSTS  = 2000
+WARMUP_BOARDS = 500
+
+
+def warmup() -> dict:
+    """
+    Прогреть кеши данных (без энкодера). Вызывать внутри app context.
+    Возвращает статистику для стартового отчёта.
+    """
+    from services.feed_cache import cold_snapshots
+    from services.trending import trending_index
+
+    started = time.time()
+    for mood in COLD_MOOD_BUCKETS:
+        cold_snapshot(mood or None)
+
+    trending_index.sync()
+
+    return {
+        'cold':     len(cold_snapshots),
+        'seconds':  round(time.time() - started, 2),
+    }
+
+
+def warmup_vectors(posts_limit: int = WARMUP_POSTS, boards_limit: int = WARMUP_BOARDS) -> int:
+    """
+    Поставить вектора свежих публичных постов и досок в очередь энкодера.
+    Не блокирует. Вызывать внутри app context. Возвращает число объектов.
+    """
+    from models import Post, Board, VisibilityEnum
+
+    posts = (
+        Post.query
+        .filter(Post.visibility == VisibilityEnum.public)
+        .order_by(Post.created_at.desc())
+        .limit(posts_limit)
+        .all()
+    )
+    if posts:
+        _get_embeddings(posts)
+
+    boards = (
+        Board.query
+        .filter_by(is_public=True)
+        .order_by(Board.followers_count.desc())
+        .limit(boards_limit)
+        .all()
+    )
+    if boards:
+        _get_board_embeddings(boards)
+    return len(posts) + len(boards)
@@ -0,0 +1,266 @@
+"""
+services/renditions.py
+──────────────────────
+Уменьшенные копии (рендишены) загруженных изображений — вне запроса.
+
+POST /api/posts/<id>/image сохраняет только оригинал, ставит
+post.image_status = pending и отвечает сразу. Копии считаются в
+ProcessPoolExecutor на RENDITION_WORKERS процессах (декодирование и
+LANCZOS частично держат GIL — потоки не загрузили бы все ядра). Пул свой
+в каждом воркере gunicorn: на хосте до WEB_CONCURRENCY × RENDITION_WORKERS
+интерпретаторов, поэтому по умолчанию их 2 — под ядра хоста
+IMAGE_RENDITION_WORKERS подбирают так, чтобы произведение было ≈ числу ядер.
+Если поставить задачу не удалось (пул сломан, spawn упал), пул
+пересоздаётся и задача повторяется один раз, затем пост получает
+image_status = failed — pending навсегда он не остаётся. Когда
+задача готова, поток-обработчик пула записывает результат и статус
+ready / failed — самому посту и его репостам / сохранениям с тем же
+изображением.
+
+Лестница ширин RENDITION_WIDTHS (IMAGE_RENDITION_WIDTHS="160,400,800,1600"),
+каждая — в WebP и в формате оригинала (services/images.render_ladder):
+  post.image_renditions   — [{"url", "width", "height", "format"}] → srcset
+  post.image_preview_url  — копия ширины ≥ PREVIEW_WIDTH в формате оригинала
+                            (прежнее поле imagePreviewUrl)
+
+Очередь живёт в памяти процесса: посты, оставшиеся pending после рестарта
+(и failed), заново ставит python -m services.renditions; с --backfill —
+ещё и посты, загруженные до лестницы.
+In-memory SQLite (тесты) — копии считаются сразу, в запросе.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+RENDITION_WORKERS = int(os.environ.get('IMAGE_RENDITION_WORKERS', 2))   # на воркер gunicorn
+RENDITION_WIDTHS = [
+    int(w) for w in os.environ.get('IMAGE_RENDITION_WIDTHS', '160,400,800,1600').split(',') if w.strip()
+]
+RENDITION_QUALITY = {'webp': 80, 'jpg': 85}   # по расширению копии; прочие — 85
+PREVIEW_WIDTH = 400
+
+
+def _ladder_exts(image_url: str) -> list[str]:
+    """WebP + формат оригинала (без повтора, если оригинал — WebP)."""
+    ext = image_url.rsplit('.', 1)[-1].lower()
+    ext = 'jpg' if ext == 'jpeg' else ext
+    return ['webp'] if ext == 'webp' else ['webp', ext]
+
+
+def render_renditions(src: str, dst_base: str, exts: list[str]) -> list[dict]:
+    """Выполняется в процессе пула (поэтому — функция модуля)."""
+    from services.images import render_ladder
+
+    return render_ladder(src, dst_base, RENDITION_WIDTHS, exts,
+                         qualities=RENDITION_QUALITY)
+
+
+def _preview_of(renditions: list[dict], image_url: str) -> str:
+    """Наименьшая копия в формате оригинала шириной ≥ PREVIEW_WIDTH (или самая крупная)."""
+    from services.images import IMAGE_FORMATS
+
+    fmt = IMAGE_FORMATS[_ladder_exts(image_url)[-1]].lower()
+    same = [r for r in renditions if r['format'] == fmt] or renditions
+    wide = [r for r in same if r['width'] >= PREVIEW_WIDTH]
+    best = min(wide, key=lambda r: r['width']) if wide else max(same, key=lambda r: r['width'])
+    return best['url']
+
+
+def rendition_urls(post) -> list[str]:
+    """Все файлы копий поста (для удаления вместе с оригиналом)."""
+    urls = [r['url'] for r in (post.image_renditions or [])]
+    if post.image_preview_url and post.image_preview_url not in urls:
+        urls.append(post.image_preview_url)     # превью до лестницы
+    return urls
+
+
+def _remove(static_folder: str, relative_urls: list[str]) -> None:
+    for url in relative_urls:
+        try:
+            os.remove(os.path.join(static_folder, url))
+        except OSError:
+            pass
+
+
+def _finish(post_id: int, image_url: str, renditions: Optional[list[dict]]) -> None:
+    """Записать результат; если изображение успели сменить или удалить — выбросить."""
+    from flask import current_app
+    from models import ImageStatusEnum, Post, db
+
+    post = db.session.get(Post, post_id)
+    if post is None or post.image_url != image_url:
+        _remove(current_app.static_folder, [r['url'] for r in renditions or []])
+        return
+    if renditions:
+        values = {
+            'image_renditions':  renditions,
+            'image_preview_url': _preview_of(renditions, image_url),
+            'image_status':      ImageStatusEnum.ready,
+        }
+        # Пересчёт (--backfill, повтор): файлы прежних копий больше не нужны
+        fresh = {r['url'] for r in renditions}
+        _remove(current_app.static_folder, [u for u in rendition_urls(post) if u not in fresh])
+    else:
+        values = {'image_status': ImageStatusEnum.failed}
+    db.session.execute(
+        db.update(Post)
+        .where(db.or_(Post.id == post_id,
+                      db.and_(Post.original_post_id == post_id, Post.image_url == image_url)))
+        .values(**values)
+        .execution_options(synchronize_session='fetch')
+    )
+    db.session.commit()
+
+
+def _with_urls(base_url: str, rows: list[dict]) -> list[dict]:
+    return [{'url': f"{base_url}{r['suffix']}", 'width': r['width'],
+             'height': r['height'], 'format': r['format']} for r in rows]
+
+
+class RenditionWorker:
+    """ProcessPoolExecutor + запись результата в БД в app context."""
+
+    def __init__(self, workers: int = RENDITION_WORKERS):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._futures: set[Future] = set()
+
+    def submit(self, post_id: int, image_url: str) -> None:
+        """Поставить копии поста в очередь. Вызывать в app context после commit."""
+        from flask import current_app
+        from models import db
+
+        app = current_app._get_current_object()
+        base_url = os.path.splitext(image_url)[0]
+        args = (os.path.join(app.static_folder, image_url),
+                os.path.join(app.static_folder, base_url), _ladder_exts(image_url))
+
+        if db.engine.url.database in (None, '', ':memory:'):
+            try:
+                renditions = _with_urls(base_url, render_renditions(*args))
+            except Exception as exc:
+                logger.warning(f"[Renditions] post {post_id} failed: {exc}")
+                renditions = None
+            _finish(post_id, image_url, renditions)
+            return
+
+        try:
+            future = self._submit(render_renditions, *args)
+        except Exception as exc:
+            logger.warning(f"[Renditions] post {post_id}: queueing failed: {exc}")
+            _finish(post_id, image_url, None)
+            return
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(lambda f: self._done(app, post_id, image_url, base_url, f))
+
+    def join(self) -> None:
+        """Дождаться всех поставленных задач (CLI, бенчмарки)."""
+        while True:
+            with self._lock:
+                pending = list(self._futures)
+            if not pending:
+                return
+            wait(pending)
+
+    def _submit(self, fn, *args) -> Future:
+        """submit в пул; сломанный пул (BrokenProcessPool, RuntimeError) — пересоздать один раз."""
+        try:
+            return self._pool().submit(fn, *args)
+        except (BrokenProcessPool, RuntimeError, OSError) as exc:
+            logger.warning(f"[Renditions] pool unavailable ({exc}), restarting it")
+            self._pool(restart=True)
+            return self._pool().submit(fn, *args)
+
+    def _pool(self, restart: bool = False) -> ProcessPoolExecutor:
+        with self._lock:
+            if restart and self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=False)
+                self._executor = None
+            if self._executor is None or self._pid != os.getpid():
+                # spawn: форк процесса с потоками и соединениями БД небезопасен
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+                self._pid = os.getpid()
+                self._futures = set()
+            return self._executor
+
+    def _done(self, app, post_id: int, image_url: str, base_url: str, future: Future) -> None:
+        from models import db
+
+        renditions = None
+        exc = future.exception()
+        if exc is not None:
+            logger.warning(f"[Renditions] post {post_id} failed: {exc}")
+        else:
+            renditions = _with_urls(base_url, future.result())
+        try:
+            with app.app_context():
+                try:
+                    _finish(post_id, image_url, renditions)
+                except Exception as e:
+                    db.session.rollback()
+                    logger.warning(f"[Renditions] post {post_id}: saving result failed: {e}")
+                finally:
+                    db.session.remove()
+        finally:
+            with self._lock:
+                self._futures.discard(future)
+
+
+_worker = RenditionWorker()
+
+
+# ── Хуки из API ───────────────────────────────────────────────────────────────
+
+def on_image_uploaded(post) -> None:
+    _worker.submit(post.id, post.image_url)
+
+
+def requeue(statuses=('pending', 'failed'), backfill: bool = False) -> int:
+    """
+    Заново поставить копии постов с данными статусами (backfill — и постов
+    с изображением, но без лестницы). Возвращает их число.
+    """
+    from models import ImageStatusEnum, Post, db
+
+    cond = Post.image_status.in_([ImageStatusEnum(s) for s in statuses])
+    if backfill:
+        cond = db.or_(cond, Post.image_renditions.is_(None))
+    rows = db.session.execute(
+        db.select(Post.id, Post.image_url)
+        .where(cond, Post.image_url.is_not(None), Post.post_kind.is_(None))
+    ).all()
+    for post_id, image_url in rows:
+        _worker.submit(post_id, image_url)
+    return len(rows)
+
+
+def main() -> None:
+    """python -m services.renditions [--backfill] — досчитать недостающие копии."""
+    from app import app
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backfill', action='store_true',
+                        help='и посты, загруженные до лестницы ширин')
+    args = parser.parse_args()
+
+    with app.app_context():
+        n = requeue(backfill=args.backfill)
+        _worker.join()
+    print(f"[Renditions] requeued {n} posts ({_worker.workers} workers, widths {RENDITION_WIDTHS})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+"""
+services/seen_filter.py
+───────────────────────
+Серверный список просмотренных постов пользователя.
+
+PostBitmap — сжатый bitmap post_id в стиле roaring: id делится на старшие
+и младшие 16 бит, на каждый старший блок — контейнер:
+  - разреженный: отсортированный uint16-массив (≤ ARRAY_MAX_CARD значений)
+  - плотный:     1024 × uint64 = 8 КБ битов
+Проверка пачки кандидатов — векторно (np.searchsorted / сдвиги по словам),
+без Python-цикла по id.
+
+SeenSet — два поколения (текущее и предыдущее); раз в SEEN_ROTATE_DAYS
+текущее становится предыдущим, а самое старое забывается. Объём не растёт
+бесконечно, давно виденные посты со временем снова могут попасть в ленту.
+
+Хранение: таблица seen_posts (байты поколений), в процессе — LRU с TTL
+(SEEN_CACHE_TTL): показы, записанные другим воркером, видны с этой задержкой.
+Обновляется через POST /api/posts/impressions.
+"""
+from __future__ import annotations
+
+import struct
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+import numpy as np
+
+ARRAY_MAX_CARD   = 4096    # больше — контейнер становится плотным (8 КБ)
+SEEN_ROTATE_DAYS = 14
+SEEN_CACHE_TTL   = 60.0
+SEEN_CACHE_SIZE  = 10_000
+IMPRESSIONS_MAX_BATCH = 500
+
+_WORDS = 1 << 10           # 65536 бит / 64
+_HEADER = struct.Struct('<IBI')   # старший блок, тип (0 — массив, 1 — биты), мощность
+
+
+class PostBitmap:
+    """Множество неотрицательных int (< 2³²) со сжатием по блокам 2¹⁶."""
+
+    __slots__ = ('_containers',)
+
+    def __init__(self):
+        # старшие 16 бит → np.uint16[] (отсортирован) | np.uint64[1024]
+        self._containers: dict[int, np.ndarray] = {}
+
+    def add_many(self, ids: Iterable[int]) -> None:
+        if not isinstance(ids, np.ndarray):
+            ids = np.fromiter(ids, dtype=np.int64)
+        ids = np.unique(ids.astype(np.int64))
+        if ids.size == 0:
+            return
+        highs = ids >> 16
+        bounds = np.flatnonzero(np.diff(highs)) + 1
+        for chunk in np.split(ids, bounds):
+            high = int(chunk[0] >> 16)
+            low = (chunk & 0xFFFF).astype(np.uint16)
+            cont = self._containers.get(high)
+            if cont is None:
+                cont = np.empty(0, dtype=np.uint16)
+            if cont.dtype == np.uint16:
+                merged = np.union1d(cont, low)
+                self._containers[high] = merged if merged.size <= ARRAY_MAX_CARD else _to_words(merged)
+            else:
+                _set_bits(cont, low)
+
+    def contains_many(self, ids: np.ndarray) -> np.ndarray:
+        """Маска bool той же длины, что ids."""
+        ids = np.asarray(ids, dtype=np.int64)
+        mask = np.zeros(ids.shape[0], dtype=bool)
+        if not self._containers or ids.size == 0:
+            return mask
+        highs = ids >> 16
+        lows = (ids & 0xFFFF).astype(np.uint16)
+        for high in np.unique(highs):
+            cont = self._containers.get(int(high))
+            if cont is None:
+                continue
+            sel = np.flatnonzero(highs == high)
+            low = lows[sel]
+            if cont.dtype == np.uint16:
+                pos = np.searchsorted(cont, low)
+                hit = pos < cont.size
+                hit[hit] = cont[pos[hit]] == low[hit]
+            else:
+                hit = ((cont[low >> 6] >> (low & 63).astype(np.uint64)) & np.uint64(1)).astype(bool)
+            mask[sel] = hit
+        return mask
+
+    def __contains__(self, post_id: int) -> bool:
+        return bool(self.contains_many(np.array([post_id]))[0])
+
+    def __len__(self) -> int:
+        return sum(
+            c.size if c.dtype == np.uint16 else int(np.unpackbits(c.view(np.uint8)).sum())
+            for c in self._containers.values()
+        )
+
+    def __or__(self, other: 'PostBitmap') -> 'PostBitmap':
+        out = PostBitmap()
+        for src in (self, other):
+            for high, cont in src._containers.items():
+                low = cont if cont.dtype == np.uint16 else _from_words(cont)
+                out.add_many((np.int64(high) << 16) | low.astype(np.int64))
+        return out
+
+    # ── Сериализация ─────────────────────────────────────────────────────────
+
+    def to_bytes(self) -> bytes:
+        parts = []
+        for high in sorted(self._containers):
+            cont = self._containers[high]
+            kind = 0 if cont.dtype == np.uint16 else 1
+            card = cont.size if kind == 0 else 0
+            parts.append(_HEADER.pack(high, kind, card))
+            parts.append(cont.astype('<u2' if kind == 0 else '<u8').tobytes())
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes]) -> 'PostBitmap':
+        bm = cls()
+        pos = 0
+        while data and pos < len(data):
+            high, kind, card = _HEADER.unpack_from(data, pos)
+            pos += _HEADER.size
+            if kind == 0:
+                bm._containers[high] = np.frombuffer(data, '<u2', card, pos).astype(np.uint16)
+                pos += 2 * card
+            else:
+                bm._containers[high] = np.frombuffer(data, '<u8', _WORDS, pos).astype(np.uint64)
+                pos += 8 * _WORDS
+        return bm
+
+
+def _to_words(low: np.ndarray) -> np.ndarray:
+    words = np.zeros(_WORDS, dtype=np.uint64)
+    _set_bits(words, low)
+    return words
+
+
+def _set_bits(words: np.ndarray, low: np.ndarray) -> None:
+    np.bitwise_or.at(words, low >> 6, np.uint64(1) << (low & 63).astype(np.uint64))
+
+
+def _from_words(words: np.ndarray) -> np.ndarray:
+    bits = np.unpackbits(words.view(np.uint8), bitorder='little')
+    return np.flatnonzero(bits).astype(np.uint16)
+
+
+class SeenSet:
+    """Два поколения PostBitmap с ротацией раз в SEEN_ROTATE_DAYS."""
+
+    __slots__ = ('current', 'previous', 'rotated_at')
+
+    def __init__(self, current: Optional[PostBitmap] = None,
+                 previous: Optional[PostBitmap] = None,
+                 rotated_at: Optional[datetime] = None):
+        self.current = current if current is not None else PostBitmap()
+        self.previous = previous if previous is not None else PostBitmap()
+        self.rotated_at = rotated_at or datetime.utcnow()
+
+    def maybe_rotate(self, now: Optional[datetime] = None) -> None:
+        now = now or datetime.utcnow()
+        if now - self.rotated_at >= timedelta(days=SEEN_ROTATE_DAYS):
+            self.previous, self.current = self.current, PostBitmap()
+            self.rotated_at = now
+
+    def contains_many(self, ids: np.ndarray) -> np.ndarray:
+        return self.current.contains_many(ids) | self.previous.contains_many(ids)
+
+    def __len__(self) -> int:
+        return len(self.current | self.previous)
+
+
+# ── Хранение ──────────────────────────────────────────────────────────────────
+
+_cache: OrderedDict[int, tuple[float, SeenSet]] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _load(user_id: int) -> SeenSet:
+    from models import SeenPosts, db
+
+    row = db.session.get(SeenPosts, user_id)
+    if row is None:
+        return SeenSet()
+    return SeenSet(PostBitmap.from_bytes(row.current), PostBitmap.from_bytes(row.previous),
+                   row.rotated_at)
+
+
+def _remember(user_id: int, seen: SeenSet) -> None:
+    with _cache_lock:
+        _cache[user_id] = (time.time(), seen)
+        _cache.move_to_end(user_id)
+        while len(_cache) > SEEN_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def get_seen(user_id: int) -> SeenSet:
+    """SeenSet пользователя (кеш с TTL, промах — одна строка по PK)."""
+    with _cache_lock:
+        hit = _cache.get(user_id)
+        if hit is not None and time.time() - hit[0] <= SEEN_CACHE_TTL:
+            _cache.move_to_end(user_id)
+            return hit[1]
+    seen = _load(user_id)
+    seen.maybe_rotate()
+    _remember(user_id, seen)
+    return seen
+
+
+def add_seen(user_id: int, post_ids: Iterable[int]) -> SeenSet:
+    """
+    Слить показы в строку пользователя без commit (коммитит вызывающий).
+    Строка сначала создаётся ON CONFLICT DO NOTHING,
+    потом читается под блокировкой (FOR UPDATE; в SQLite ту же роль играет
+    блокировка записи, взятая INSERT): параллельные писатели не теряют
+    показы друг друга и не падают на IntegrityError при первой записи.
+    """
+    from models import SeenPosts, db, dialect_insert
+
+    now = datetime.utcnow()
+    db.session.execute(
+        dialect_insert(SeenPosts)
+        .values(user_id=user_id, rotated_at=now, updated_at=now)
+        .on_conflict_do_nothing(index_elements=['user_id'])
+    )
+    row = db.session.execute(
+        db.select(SeenPosts).where(SeenPosts.user_id == user_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ).scalar_one()
+
+    seen = SeenSet(PostBitmap.from_bytes(row.current), PostBitmap.from_bytes(row.previous),
+                   row.rotated_at)
+    seen.maybe_rotate(now)
+    seen.current.add_many(post_ids)
+    row.current = seen.current.to_bytes()
+    row.previous = seen.previous.to_bytes()
+    row.rotated_at = seen.rotated_at
+    row.updated_at = now
+    db.session.flush()
+    return seen
+
+
+def remember_seen(user_id: int, seen: SeenSet) -> None:
+    """Положить закоммиченный SeenSet (из add_seen) в кеш процесса."""
+    _remember(user_id, seen)
+
+
+def mark_seen(user_id: int, post_ids: Iterable[int]) -> int:
+    """Добавить показы и сохранить. Возвращает число принятых id."""
+    from models import db
+
+    post_ids = list(post_ids)
+    seen = add_seen(user_id, post_ids)
+    db.session.commit()
+    _remember(user_id, seen)
+    return len(set(post_ids))
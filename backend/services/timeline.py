@@ -0,0 +1,390 @@
+"""
+services/timeline.py
+────────────────────
+Домашняя лента с fan-out on write: таблица timeline_entries
+(user_id, post_id, created_at).
+
+  - Новый пост автора раскладывается в ленты всех его подписчиков
+    (и самого автора) фоновым потоком — запрос публикации не ждёт
+  - Подписка досыпает последние TIMELINE_BACKFILL постов автора,
+    отписка вычищает их, удаление поста — его записи во всех лентах
+  - Вставки идут через ON CONFLICT DO NOTHING: повторный fan-out (ретрай,
+    пересборка) или гонка с подпиской не роняют пачку на IntegrityError
+  - Лента пользователя урезается до TIMELINE_MAX_ENTRIES последних записей;
+    урезание амортизировано — после fan-out у случайной 1/TIMELINE_TRIM_EVERY
+    части получателей, так что перерасход в среднем ≈ TIMELINE_TRIM_EVERY
+  - Чтение (?scope=following) — один диапазонный скан по
+    ix_timeline_entries_user_created
+
+Гибрид push/pull: автор с followers_count ≥ FANOUT_FOLLOWER_LIMIT
+в ленты подписчиков не раскладывается (один пост не превращается в
+миллионы INSERT). Его последние посты держит кеш AUTHOR_RECENT_POSTS
+на автора, а чтение сливает их с push-частью k-way merge по created_at.
+Автор, переросший порог, может встретиться в обеих частях — merge
+убирает дубли; опустившийся ниже порога — его pull-посты до этого
+момента в ленты не попадают (перестроить: python -m services.timeline).
+
+Сохранённые копии (post_kind='saved') — личные закладки, в ленты не идут.
+Задачи выполняются по порядку одним потоком: подписка и сразу отписка
+не перепутаются. Для in-memory SQLite (тесты) всё выполняется сразу
+в потоке запроса — соединение с такой базой потокам не поделить.
+
+Первичное заполнение после миграции: python -m services.timeline
+"""
+from __future__ import annotations
+
+import heapq
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from itertools import islice
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+TIMELINE_MAX_ENTRIES = int(os.environ.get('TIMELINE_MAX_ENTRIES', 800))
+TIMELINE_TRIM_EVERY  = 20
+TIMELINE_BACKFILL    = 50      # постов автора при подписке
+FANOUT_CHUNK         = 1000    # строк на один INSERT
+
+FANOUT_FOLLOWER_LIMIT = int(os.environ.get('TIMELINE_FANOUT_FOLLOWER_LIMIT', 10_000))
+AUTHOR_RECENT_POSTS      = 200    # глубина pull-части ленты на автора
+AUTHOR_RECENT_TTL        = 30.0   # секунд; новые посты других воркеров видны с этой задержкой
+AUTHOR_RECENT_CACHE_SIZE = 5000
+
+# author_id → (ts, [(created_at, post_id, mood), ...] новые сверху)
+_author_recent: OrderedDict[int, tuple[float, list[tuple[datetime, int, Optional[str]]]]] = OrderedDict()
+_author_recent_lock = threading.Lock()
+
+
+# ── Операции над таблицей (вызывать в app context) ───────────────────────────
+
+def fan_out(post_id: int) -> int:
+    """
+    Разложить пост по лентам подписчиков автора и его собственной.
+    Pull-автор (followers_count ≥ FANOUT_FOLLOWER_LIMIT) — только в свою.
+    """
+    from models import Post, TimelineEntry, User, db, follows
+
+    post = db.session.get(Post, post_id)
+    if post is None or post.post_kind == 'saved':
+        return 0
+
+    if _is_pull_author(db.session.get(User, post.user_id)):
+        followers = []
+        with _author_recent_lock:
+            _author_recent.pop(post.user_id, None)
+    else:
+        followers = db.session.execute(
+            db.select(follows.c.follower_id).where(follows.c.followed_id == post.user_id)
+        ).scalars().all()
+    recipients = [post.user_id, *followers]
+
+    for i in range(0, len(recipients), FANOUT_CHUNK):
+        db.session.execute(_insert_entries(TimelineEntry), [
+            {'user_id': uid, 'post_id': post.id, 'created_at': post.created_at}
+            for uid in recipients[i:i + FANOUT_CHUNK]
+        ])
+    db.session.commit()
+
+    for uid in recipients:
+        if random.randrange(TIMELINE_TRIM_EVERY) == 0:
+            trim(uid)
+    return len(recipients)
+
+
+def trim(user_id: int, keep: int = TIMELINE_MAX_ENTRIES) -> int:
+    """Оставить в ленте пользователя keep последних записей."""
+    from models import TimelineEntry, db
+
+    cutoff = db.session.execute(
+        db.select(TimelineEntry.created_at)
+        .where(TimelineEntry.user_id == user_id)
+        .order_by(TimelineEntry.created_at.desc())
+        .offset(keep).limit(1)
+    ).scalar()
+    if cutoff is None:
+        return 0
+    deleted = db.session.execute(
+        db.delete(TimelineEntry)
+        .where(TimelineEntry.user_id == user_id, TimelineEntry.created_at <= cutoff)
+    ).rowcount
+    db.session.commit()
+    return deleted
+
+
+def backfill_follow(follower_id: int, author_id: int, limit: int = TIMELINE_BACKFILL) -> int:
+    """Подписка: последние посты автора → лента подписчика (без дублей)."""
+    from models import Post, TimelineEntry, User, db
+
+    if _is_pull_author(db.session.get(User, author_id)):
+        return 0   # его посты подмешиваются при чтении
+    rows = db.session.execute(
+        db.select(Post.id, Post.created_at)
+        .where(Post.user_id == author_id, Post.post_kind.is_distinct_from('saved'))
+        .order_by(Post.created_at.desc())
+        .limit(limit)
+    ).all()
+    if not rows:
+        return 0
+    present = set(db.session.execute(
+        db.select(TimelineEntry.post_id).where(
+            TimelineEntry.user_id == follower_id,
+            TimelineEntry.post_id.in_([pid for pid, _ in rows]),
+        )
+    ).scalars())
+    fresh = [{'user_id': follower_id, 'post_id': pid, 'created_at': created}
+             for pid, created in rows if pid not in present]
+    if fresh:
+        db.session.execute(_insert_entries(TimelineEntry), fresh)
+    db.session.commit()
+    return len(fresh)
+
+
+def prune_unfollow(follower_id: int, author_id: int) -> int:
+    """Отписка: убрать посты автора из ленты бывшего подписчика."""
+    from models import Post, TimelineEntry, db
+
+    deleted = db.session.execute(
+        db.delete(TimelineEntry).where(
+            TimelineEntry.user_id == follower_id,
+            TimelineEntry.post_id.in_(db.select(Post.id).where(Post.user_id == author_id)),
+        )
+    ).rowcount
+    db.session.commit()
+    return deleted
+
+
+def prune_post(post_id: int) -> int:
+    """Удаление поста: убрать его из всех лент (в SQLite FK-каскада нет)."""
+    from models import TimelineEntry, db
+
+    deleted = db.session.execute(
+        db.delete(TimelineEntry).where(TimelineEntry.post_id == post_id)
+    ).rowcount
+    db.session.commit()
+    return deleted
+
+
+def rebuild(user_id: int, keep: int = TIMELINE_MAX_ENTRIES) -> int:
+    """Пересобрать ленту пользователя с нуля: свои посты + посты push-подписок."""
+    from models import Post, TimelineEntry, User, db, follows
+
+    authors = (
+        db.select(follows.c.followed_id)
+        .join(User, User.id == follows.c.followed_id)
+        .where(follows.c.follower_id == user_id, User.followers_count < FANOUT_FOLLOWER_LIMIT)
+    )
+    rows = db.session.execute(
+        db.select(Post.id, Post.created_at)
+        .where(
+            db.or_(Post.user_id == user_id, Post.user_id.in_(authors)),
+            Post.post_kind.is_distinct_from('saved'),
+        )
+        .order_by(Post.created_at.desc())
+        .limit(keep)
+    ).all()
+    db.session.execute(db.delete(TimelineEntry).where(TimelineEntry.user_id == user_id))
+    if rows:
+        db.session.execute(_insert_entries(TimelineEntry), [
+            {'user_id': user_id, 'post_id': pid, 'created_at': created} for pid, created in rows
+        ])
+    db.session.commit()
+    return len(rows)
+
+
+def _insert_entries(model):
+    """INSERT в timeline_entries, пропускающий уже существующие (user_id, post_id)."""
+    from models import dialect_insert
+
+    return dialect_insert(model).on_conflict_do_nothing(index_elements=['user_id', 'post_id'])
+
+
+def _is_pull_author(user) -> bool:
+    return user is not None and (user.followers_count or 0) >= FANOUT_FOLLOWER_LIMIT
+
+
+def _pull_author_ids(user_id: int) -> list[int]:
+    """Подписки пользователя, которые читаются через pull."""
+    from models import User, db, follows
+
+    return db.session.execute(
+        db.select(follows.c.followed_id)
+        .join(User, User.id == follows.c.followed_id)
+        .where(follows.c.follower_id == user_id, User.followers_count >= FANOUT_FOLLOWER_LIMIT)
+    ).scalars().all()
+
+
+def _recent_posts(author_ids: list[int]) -> dict[int, list]:
+    """Последние посты pull-авторов из кеша; промахи — одним запросом."""
+    from models import Post, db
+
+    now = time.time()
+    found, missing = {}, []
+    with _author_recent_lock:
+        for aid in author_ids:
+            hit = _author_recent.get(aid)
+            if hit is not None and now - hit[0] <= AUTHOR_RECENT_TTL:
+                _author_recent.move_to_end(aid)
+                found[aid] = hit[1]
+            else:
+                missing.append(aid)
+    if not missing:
+        return found
+
+    # Top-N на автора: окно ROW_NUMBER, а не N отдельных запросов
+    rn = db.func.row_number().over(
+        partition_by=Post.user_id,
+        order_by=(Post.created_at.desc(), Post.id.desc()),
+    ).label('rn')
+    ranked = (
+        db.select(Post.user_id, Post.created_at, Post.id, Post.mood, rn)
+        .where(Post.user_id.in_(missing), Post.post_kind.is_distinct_from('saved'))
+        .subquery()
+    )
+    fetched: dict[int, list] = {aid: [] for aid in missing}
+    for aid, created, pid, mood, _ in db.session.execute(
+        db.select(ranked)
+        .where(ranked.c.rn <= AUTHOR_RECENT_POSTS)
+        .order_by(ranked.c.user_id, ranked.c.rn)
+    ):
+        fetched[aid].append((created, pid, getattr(mood, 'value', mood)))
+
+    with _author_recent_lock:
+        for aid, items in fetched.items():
+            _author_recent[aid] = (now, items)
+            _author_recent.move_to_end(aid)
+        while len(_author_recent) > AUTHOR_RECENT_CACHE_SIZE:
+            _author_recent.popitem(last=False)
+    found.update(fetched)
+    return found
+
+
+def following_page(user_id: int, offset: int, limit: int,
+                   mood: Optional[str] = None) -> tuple[list[int], bool, int]:
+    """
+    Страница ленты подписок: (post_ids новые сверху, has_more, total).
+    Push-часть — диапазонный скан timeline_entries, pull-часть — кеш
+    последних постов авторов-«звёзд»; слияние — heapq.merge.
+    COUNT(*) по всей ленте не считается (страница стоила бы O(ленты)):
+    читается offset + limit + 1 записей, total — сколько известно на сейчас
+    (offset + страница, +1 если есть следующая).
+    """
+    from models import MoodEnum, Post, TimelineEntry, db
+
+    need = offset + limit + 1
+    push = (
+        db.select(TimelineEntry.created_at, TimelineEntry.post_id)
+        .where(TimelineEntry.user_id == user_id)
+    )
+    if mood:
+        push = push.join(Post, Post.id == TimelineEntry.post_id).where(Post.mood == MoodEnum(mood))
+    streams = [[tuple(r) for r in db.session.execute(
+        push.order_by(TimelineEntry.created_at.desc(), TimelineEntry.post_id.desc()).limit(need)
+    )]]
+
+    for items in _recent_posts(_pull_author_ids(user_id)).values():
+        if mood:
+            items = [it for it in items if it[2] == mood]
+        streams.append([(created, pid) for created, pid, _ in items[:need]])
+
+    seen: set[int] = set()
+    merged = (pid for _, pid in heapq.merge(*streams, reverse=True)
+              if not (pid in seen or seen.add(pid)))
+    ids = list(islice(merged, offset, need))
+    return ids[:limit], len(ids) > limit, offset + len(ids)
+
+
+# ── Фоновое выполнение ───────────────────────────────────────────────────────
+
+class FanoutWorker:
+    """Очередь задач (fn, args) + daemon-поток со своим app context."""
+
+    def __init__(self):
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def submit(self, fn, *args) -> None:
+        """Выполнить fn(*args) в фоне; для in-memory SQLite — сразу."""
+        from flask import current_app
+        from models import db
+
+        if db.engine.url.database in (None, '', ':memory:'):
+            fn(*args)
+            return
+        self._ensure_started()
+        self._queue.put((current_app._get_current_object(), fn, args))
+
+    def join(self) -> None:
+        """Дождаться пустой очереди (скрипты, бенчмарки)."""
+        self._queue.join()
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()   # очередь родителя после fork недействительна
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='timeline-fanout', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        from models import db
+
+        while True:
+            app, fn, args = self._queue.get()
+            try:
+                with app.app_context():
+                    try:
+                        fn(*args)
+                    except Exception as exc:
+                        db.session.rollback()
+                        logger.warning(f"[Timeline] {fn.__name__}{args} failed: {exc}")
+                    finally:
+                        db.session.remove()
+            finally:
+                self._queue.task_done()
+
+
+_worker = FanoutWorker()
+
+
+# ── Хуки из API ───────────────────────────────────────────────────────────────
+
+def on_post_created(post) -> None:
+    _worker.submit(fan_out, post.id)
+
+
+def on_follow(follower_id: int, author_id: int) -> None:
+    _worker.submit(backfill_follow, follower_id, author_id)
+
+
+def on_unfollow(follower_id: int, author_id: int) -> None:
+    _worker.submit(prune_unfollow, follower_id, author_id)
+
+
+def on_post_deleted(post_id: int) -> None:
+    _worker.submit(prune_post, post_id)
+
+
+def main() -> None:
+    """python -m services.timeline — пересобрать ленты всех пользователей."""
+    from app import app
+    from models import User, db
+
+    with app.app_context():
+        user_ids = db.session.execute(db.select(User.id)).scalars().all()
+        total = sum(rebuild(uid) for uid in user_ids)
+    print(f"[Timeline] rebuilt {len(user_ids)} timelines, {total} entries")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,400 @@
+"""
+services/trending.py
+────────────────────
+Трендовые посты: top-k в памяти на каждое окно × mood.
+
+Окно задаёт период полураспада затухающего счёта (веса событий — как у
+services/popularity.py). Счёт хранится в форме forward decay
+(log = ln(score) + λ·t), поэтому порядок постов не меняется со временем,
+а только от новых событий: top-k — min-heap размера TRENDING_K,
+новое событие стоит O(log k) на каждое окно.
+
+Источник событий — сами таблицы reaction / comment / post(saved): индекс
+дочитывает их по возрастанию id от запомненной отметки (не чаще
+TRENDING_SYNC_INTERVAL). Строка с меньшим id может закоммититься позже
+строки с бо́льшим, поэтому каждый проход перечитывает последние
+TRENDING_SYNC_OVERLAP id до отметки, а уже учтённые id из этого окна
+пропускает. Загрузка снимка, sync и запись снимка идут в фоновых потоках:
+запрос не ждёт их никогда — до первой загрузки top() отвечает пустым
+индексом, потом — текущим. Синхронно (sync()) индекс грузит только
+прогрев до fork (wsgi), in-memory SQLite (тесты) — тоже сразу. Воркеры gunicorn видят одни и те же
+события, а после рестарта индекс восстанавливается так:
+  - снимок TRENDING_PATH (пишется раз в TRENDING_PERSIST_INTERVAL)
+  - + события после отметок снимка
+  - без снимка — события за последние TRENDING_REBUILD_DAYS дней
+Снятые реакции / удалённые комментарии в журнале не видны и тренд
+не уменьшают — они уже давно затухают быстрее, чем копятся.
+Смена mood поста переносит его в TopK нового mood (on_post_mood_changed —
+в своём воркере, в остальных — со следующим событием поста); эндпоинт
+всё равно перепроверяет mood и visibility запросом.
+"""
+from __future__ import annotations
+
+import heapq
+import json
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from services.popularity import EVENT_WEIGHTS, POPULARITY_EPOCH
+
+logger = logging.getLogger(__name__)
+
+# Окно → период полураспада, часы
+TRENDING_WINDOWS: dict[str, float] = {
+    '1h':  1.0,
+    '24h': 24.0,
+    '7d':  168.0,
+}
+DEFAULT_WINDOW = '24h'
+
+TRENDING_K                = 200
+TRENDING_SYNC_INTERVAL    = float(os.environ.get('RECO_TRENDING_SYNC_INTERVAL', 5))
+TRENDING_SYNC_BATCH       = 5000
+TRENDING_SYNC_OVERLAP     = 500    # id до отметки, перечитываемых на случай позднего коммита
+TRENDING_PERSIST_INTERVAL = float(os.environ.get('RECO_TRENDING_PERSIST_INTERVAL', 300))
+TRENDING_REBUILD_DAYS     = 14
+TRENDING_PRUNE_SCORE      = 1e-3   # пост вне top-k с меньшим счётом забываем
+TRENDING_PATH = os.environ.get(
+    'RECO_TRENDING_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                 'instance', 'reco_trending.json'),
+)
+
+_SNAPSHOT_VERSION = 2   # 2: учтённые id окна перекрытия (applied)
+_LAMBDAS = {w: math.log(2.0) / h for w, h in TRENDING_WINDOWS.items()}
+
+
+def _hours(at: datetime) -> float:
+    return (at - POPULARITY_EPOCH).total_seconds() / 3600.0
+
+
+def _log_add(a: Optional[float], b: float) -> float:
+    """ln(eᵃ + eᵇ) без переполнения."""
+    if a is None:
+        return b
+    hi, lo = (a, b) if a >= b else (b, a)
+    return hi + math.log1p(math.exp(lo - hi))
+
+
+class TopK:
+    """
+    k лучших post_id по log-счёту. Счёт поста только растёт, поэтому
+    достаточно min-heap: устаревшие записи кучи (пост обновился) пропускаются
+    лениво и вычищаются перестройкой, когда куча разрастается.
+    """
+
+    __slots__ = ('k', '_heap', '_members')
+
+    def __init__(self, k: int):
+        self.k = k
+        self._heap: list[tuple[float, int]] = []
+        self._members: dict[int, float] = {}
+
+    def offer(self, post_id: int, log_score: float) -> None:
+        if post_id in self._members:
+            self._members[post_id] = log_score
+            heapq.heappush(self._heap, (log_score, post_id))
+            if len(self._heap) > 4 * self.k:
+                self._heap = [(s, p) for p, s in self._members.items()]
+                heapq.heapify(self._heap)
+            return
+        if len(self._members) < self.k:
+            self._members[post_id] = log_score
+            heapq.heappush(self._heap, (log_score, post_id))
+            return
+        self._drop_stale()
+        if log_score <= self._heap[0][0]:
+            return
+        _, evicted = heapq.heapreplace(self._heap, (log_score, post_id))
+        del self._members[evicted]
+        self._members[post_id] = log_score
+
+    def discard(self, post_id: int) -> None:
+        """Убрать пост (запись кучи станет устаревшей и вычистится лениво)."""
+        self._members.pop(post_id, None)
+
+    def __contains__(self, post_id: int) -> bool:
+        return post_id in self._members
+
+    def items(self) -> list[tuple[int, float]]:
+        """(post_id, log) по убыванию."""
+        return sorted(self._members.items(), key=lambda kv: (-kv[1], -kv[0]))
+
+    def _drop_stale(self) -> None:
+        heap, members = self._heap, self._members
+        while heap and members.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+
+
+class TrendingIndex:
+    """Затухающие счета постов по окнам + TopK на (окно, mood)."""
+
+    def __init__(self, path: str = TRENDING_PATH, k: int = TRENDING_K):
+        self.path = path
+        self.k = k
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()     # один sync за раз; БД читается без _lock
+        self._reset()
+        self._loaded = False
+        self._synced_at = 0.0
+        self._persisted_at = time.time()
+
+    def _reset(self) -> None:
+        self._scores: dict[str, dict[int, float]] = {w: {} for w in TRENDING_WINDOWS}
+        self._moods: dict[int, str] = {}
+        self._top: dict[tuple[str, str], TopK] = {}
+        self._marks = {'reaction': 0, 'comment': 0, 'save': 0}
+        # Учтённые id в окне (отметка − TRENDING_SYNC_OVERLAP, отметка]
+        self._applied: dict[str, set[int]] = {kind: set() for kind in self._marks}
+
+    # ── Чтение ────────────────────────────────────────────────────────────────
+
+    def top(self, window: str = DEFAULT_WINDOW, mood: Optional[str] = None,
+            limit: int = 20, now: Optional[datetime] = None) -> list[tuple[int, float]]:
+        """[(post_id, текущий счёт)] по убыванию. Вызывать в app context."""
+        self.refresh()
+        lam = _LAMBDAS[window]
+        t_now = _hours(now or datetime.utcnow())
+        with self._lock:
+            top = self._top.get((window, mood or ''))
+            items = top.items()[:limit] if top is not None else []
+        return [(pid, math.exp(log - lam * t_now)) for pid, log in items]
+
+    # ── Поступление событий ──────────────────────────────────────────────────
+
+    def add(self, post_id: int, mood: Optional[str], weight: float, at: datetime) -> None:
+        t = _hours(at)
+        lw = math.log(weight)
+        mood = mood or ''
+        with self._lock:
+            if mood:
+                self._set_mood(post_id, mood)
+            for window, lam in _LAMBDAS.items():
+                scores = self._scores[window]
+                log = _log_add(scores.get(post_id), lw + lam * t)
+                scores[post_id] = log
+                self._offer(window, '', post_id, log)
+                if mood:
+                    self._offer(window, mood, post_id, log)
+
+    def set_mood(self, post_id: int, mood: Optional[str]) -> None:
+        """Пост сменил mood: перенести его из TopK прежнего mood в TopK нового."""
+        with self._lock:
+            self._set_mood(post_id, mood or '')
+
+    def _set_mood(self, post_id: int, mood: str) -> None:
+        old = self._moods.get(post_id, '')
+        if old == mood:
+            return
+        if mood:
+            self._moods[post_id] = mood
+        else:
+            self._moods.pop(post_id, None)
+        for window in TRENDING_WINDOWS:
+            if old:
+                top = self._top.get((window, old))
+                if top is not None:
+                    top.discard(post_id)
+            log = self._scores[window].get(post_id)
+            if mood and log is not None:
+                self._offer(window, mood, post_id, log)
+
+    def _offer(self, window: str, mood: str, post_id: int, log: float) -> None:
+        top = self._top.get((window, mood))
+        if top is None:
+            top = self._top[(window, mood)] = TopK(self.k)
+        top.offer(post_id, log)
+
+    def refresh(self) -> None:
+        """
+        Запустить в фоне загрузку снимка (один раз) и дочитывание журнала,
+        при необходимости — запись снимка. Вызывать в app context; не ждёт.
+        """
+        from flask import current_app
+        from models import db
+
+        if ((not self._loaded or time.time() - self._synced_at >= TRENDING_SYNC_INTERVAL)
+                and self._sync_lock.acquire(blocking=False)):
+            # Sync уже идёт в другом потоке — отвечаем текущим индексом
+            if db.engine.url.database in (None, '', ':memory:'):
+                self._catch_up(None)
+            else:
+                threading.Thread(target=self._catch_up, args=(current_app._get_current_object(),),
+                                 name='trending-sync', daemon=True).start()
+        if self._loaded and time.time() - self._persisted_at >= TRENDING_PERSIST_INTERVAL:
+            self._persisted_at = time.time()
+            threading.Thread(target=self.persist, name='trending-persist', daemon=True).start()
+
+    def sync(self) -> int:
+        """Синхронно: загрузить снимок (если ещё нет) и дочитать события. Возвращает их число."""
+        with self._sync_lock:
+            self._load_once()
+            return self._sync()
+
+    def _catch_up(self, app) -> None:
+        """Тело refresh(): вызывается с захваченным _sync_lock и отпускает его."""
+        from models import db
+
+        try:
+            if app is None:
+                self._load_once()
+                self._sync()
+                return
+            with app.app_context():
+                try:
+                    self._load_once()
+                    self._sync()
+                except Exception as exc:
+                    db.session.rollback()
+                    logger.warning(f"[Trending] sync failed: {exc}")
+                finally:
+                    db.session.remove()
+        finally:
+            self._sync_lock.release()
+
+    def _load_once(self) -> None:
+        if not self._loaded:
+            self._load()
+            self._loaded = True
+
+    def _sync(self) -> int:
+        self._synced_at = time.time()
+        since = datetime.utcnow() - timedelta(days=TRENDING_REBUILD_DAYS)
+        total = 0
+        for kind in self._marks:
+            with self._lock:
+                mark = self._marks[kind]
+            after = max(mark - TRENDING_SYNC_OVERLAP, 0)
+            while True:
+                rows = self._fetch(kind, after, since if mark == 0 else None)
+                with self._lock:
+                    applied = self._applied[kind]
+                    for event_id, post_id, created_at, mood, visibility, post_kind in rows:
+                        if event_id in applied:
+                            continue
+                        applied.add(event_id)
+                        total += 1
+                        if post_kind is None and getattr(visibility, 'value', visibility) == 'public':
+                            self.add(post_id, getattr(mood, 'value', mood),
+                                     EVENT_WEIGHTS[kind], created_at)
+                    if rows:
+                        after = rows[-1][0]
+                        self._marks[kind] = max(self._marks[kind], after)
+                    if len(rows) < TRENDING_SYNC_BATCH:
+                        floor = self._marks[kind] - TRENDING_SYNC_OVERLAP
+                        self._applied[kind] = {i for i in applied if i > floor}
+                        break
+        return total
+
+    def _fetch(self, kind: str, after_id: int, since: Optional[datetime]) -> list:
+        from models import Comment, Post, Reaction, db
+
+        if kind == 'save':
+            original = db.aliased(Post)
+            stmt = (
+                db.select(Post.id, Post.original_post_id, Post.created_at,
+                          original.mood, original.visibility, original.post_kind)
+                .join(original, original.id == Post.original_post_id)
+                .where(Post.post_kind == 'saved', Post.id > after_id)
+            )
+            created = Post.created_at
+            order = Post.id
+        else:
+            event = Reaction if kind == 'reaction' else Comment
+            stmt = (
+                db.select(event.id, event.post_id, event.created_at,
+                          Post.mood, Post.visibility, Post.post_kind)
+                .join(Post, Post.id == event.post_id)
+                .where(event.id > after_id)
+            )
+            created = event.created_at
+            order = event.id
+        if since is not None:
+            stmt = stmt.where(created >= since)
+        return db.session.execute(stmt.order_by(order).limit(TRENDING_SYNC_BATCH)).all()
+
+    # ── Снимок на диске ──────────────────────────────────────────────────────
+
+    def persist(self) -> None:
+        """
+        Атомарно записать снимок; заодно забыть остывшие посты вне top-k.
+        Под блокировкой — только копия состояния, сериализация и запись вне её.
+        """
+        with self._lock:
+            self._persisted_at = time.time()
+            self._prune()
+            state = {
+                'version': _SNAPSHOT_VERSION,
+                'windows': TRENDING_WINDOWS,
+                'marks':   dict(self._marks),
+                'applied': {kind: sorted(ids) for kind, ids in self._applied.items()},
+                'moods':   dict(self._moods),
+                'scores':  {w: dict(scores) for w, scores in self._scores.items()},
+            }
+        data = json.dumps(state)
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, 'w') as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"[Trending] persist failed: {e}")
+
+    def _load(self) -> None:
+        """Прочитать снимок вне блокировки, применить — под ней."""
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            state = None
+        except (OSError, ValueError) as e:
+            logger.warning(f"[Trending] snapshot unreadable, rebuilding from events: {e}")
+            state = None
+        if state is not None and (state.get('version') != _SNAPSHOT_VERSION
+                                  or state.get('windows') != TRENDING_WINDOWS):
+            state = None   # другие окна — счета несопоставимы, перестраиваем из журнала
+        with self._lock:
+            self._reset()
+            if state is not None:
+                self._apply(state)
+
+    def _apply(self, state: dict) -> None:
+        self._marks.update({k: int(v) for k, v in state['marks'].items() if k in self._marks})
+        self._applied.update({k: set(map(int, ids)) for k, ids in state['applied'].items()
+                              if k in self._applied})
+        self._moods = {int(pid): m for pid, m in state['moods'].items()}
+        for window, scores in state['scores'].items():
+            self._scores[window] = {int(pid): log for pid, log in scores.items()}
+            for pid, log in self._scores[window].items():
+                self._offer(window, '', pid, log)
+                mood = self._moods.get(pid)
+                if mood:
+                    self._offer(window, mood, pid, log)
+
+    def _prune(self) -> None:
+        t_now = _hours(datetime.utcnow())
+        floor = math.log(TRENDING_PRUNE_SCORE)
+        for window, lam in _LAMBDAS.items():
+            scores = self._scores[window]
+            tops = [top for (w, _), top in self._top.items() if w == window]
+            cold = [pid for pid, log in scores.items()
+                    if log - lam * t_now < floor and not any(pid in top for top in tops)]
+            for pid in cold:
+                del scores[pid]
+        alive = set().union(*(scores.keys() for scores in self._scores.values()))
+        self._moods = {pid: m for pid, m in self._moods.items() if pid in alive}
+
+
+trending_index = TrendingIndex()
+
+
+# ── Хуки из API ───────────────────────────────────────────────────────────────
+
+def on_post_mood_changed(post_id: int, mood: Optional[str]) -> None:
+    trending_index.set_mood(post_id, mood)
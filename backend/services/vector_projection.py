@@ -0,0 +1,129 @@
+"""
+services/vector_projection.py
+─────────────────────────────
+PCA-проекция эмбеддингов постов/досок в пространство меньшей размерности.
+
+Обучается офлайн на векторах из базы и хранится как небольшая матрица
+(mean + components, 384 × 128 float32 ≈ 200 KB). Движок рекомендаций
+применяет её в момент попадания вектора в EmbeddingStore, поэтому все
+ядра сходства (вкус, доски, похожие объекты) работают на 64–128 измерениях.
+
+    cd backend && python -m services.vector_projection --dim 128
+    RECO_PCA_DIM=64 gunicorn ...   # усечь до 64 главных компонент
+
+Компоненты отсортированы по объяснённой дисперсии, так что проекция,
+обученная на 128 измерений, усекается до любого меньшего без переобучения.
+Файл помнит энкодер, на векторах которого обучен: если энкодер сменился,
+проекция не применяется до переобучения.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PCA_FIT_SAMPLE = 50_000   # векторов для обучения (ковариация 384×384 — дёшево)
+
+
+class PCAProjection:
+    """y = normalize((x − mean) · componentsᵀ[:, :dim])."""
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray,
+                 explained: Optional[np.ndarray] = None, encoder: str = ''):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)   # (max_dim, input_dim)
+        self.explained = (np.asarray(explained, dtype=np.float32) if explained is not None
+                          else np.zeros(self.components.shape[0], dtype=np.float32))
+        self.encoder = encoder
+
+    @property
+    def input_dim(self) -> int:
+        return self.components.shape[1]
+
+    @property
+    def max_dim(self) -> int:
+        return self.components.shape[0]
+
+    # ── Обучение / хранение ───────────────────────────────────────────────────
+
+    @classmethod
+    def fit(cls, X: np.ndarray, dim: int, encoder: str = '', seed: int = 0) -> 'PCAProjection':
+        X = np.asarray(X, dtype=np.float32)
+        if len(X) > PCA_FIT_SAMPLE:
+            X = X[np.random.default_rng(seed).choice(len(X), PCA_FIT_SAMPLE, replace=False)]
+        mean = X.mean(axis=0)
+        Xc = (X - mean).astype(np.float64)
+        eigvals, eigvecs = np.linalg.eigh(Xc.T @ Xc)
+        order = np.argsort(eigvals)[::-1]
+        eigvals, eigvecs = np.clip(eigvals[order], 0, None), eigvecs[:, order]
+        dim = max(1, min(dim, X.shape[1]))
+        explained = eigvals / max(eigvals.sum(), 1e-12)
+        return cls(mean, eigvecs[:, :dim].T, explained[:dim], encoder)
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        np.savez(path, mean=self.mean, components=self.components,
+                 explained=self.explained, encoder=np.array(self.encoder))
+
+    @classmethod
+    def load(cls, path: str) -> Optional['PCAProjection']:
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(data['mean'], data['components'], data['explained'], str(data['encoder']))
+
+    # ── Применение ────────────────────────────────────────────────────────────
+
+    def transform(self, X: np.ndarray, dim: Optional[int] = None) -> np.ndarray:
+        """(n, input_dim) → (n, dim) float32, строки L2-нормированы."""
+        comps = self.components if not dim else self.components[:min(dim, self.max_dim)]
+        Y = (np.asarray(X, dtype=np.float32) - self.mean) @ comps.T
+        norms = np.linalg.norm(Y, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (Y / norms).astype(np.float32)
+
+    def variance_kept(self, dim: Optional[int] = None) -> float:
+        return float(self.explained[:dim or self.max_dim].sum())
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CLI: обучение на постах и досках из базы
+# ─────────────────────────────────────────────────────────────────────────────
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Fit PCA projection for recommendation vectors')
+    parser.add_argument('--dim', type=int, default=128)
+    parser.add_argument('--limit', type=int, default=PCA_FIT_SAMPLE)
+    parser.add_argument('--out', default=None, help='по умолчанию RECO_PCA_PATH')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    from app import app
+    from models import Post, Board, VisibilityEnum
+    from services import recommendation_engine as engine
+
+    with app.app_context():
+        posts = (Post.query.filter(Post.visibility == VisibilityEnum.public)
+                 .order_by(Post.created_at.desc()).limit(args.limit).all())
+        boards = Board.query.filter_by(is_public=True).limit(args.limit).all()
+        engine._board_recent_posts(boards)
+        texts = [engine._post_text(p) for p in posts] + [engine._board_text(b) for b in boards]
+        # Обучаем на исходных (не спроецированных) векторах энкодера
+        X = engine._encode_texts(texts)
+
+    encoder = engine._encoder_name()
+    pca = PCAProjection.fit(X, args.dim, encoder=encoder)
+    out = args.out or engine.PCA_PATH
+    pca.save(out)
+    logger.info(f"[PCA] {len(X)} vectors ({encoder}, {X.shape[1]}d) → {pca.max_dim}d, "
+                f"variance kept {pca.variance_kept():.3f}; saved to {out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,8 @@ import imghdr
 from PIL import Image
 from werkzeug.utils import secure_filename
 from datetime import datetime
-from flask import current_app, url_for
+from urllib.parse import quote
+from flask import current_app, g, url_for
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
@@ -67,17 +68,12 @@ def save_avatar(file, username):
         
         filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
         
-        img = Image.open(file.stream)
-        
-        if img.mode not in ('RGB', 'RGBA'):
-            img = img.convert('RGB')
-        
-        data = list(img.getdata())
-        image_without_exif = Image.new(img.mode, img.size)
-        image_without_exif.putdata(data)
-        
-        image_without_exif.thumbnail((400, 400), Image.Resampling.LANCZOS)
-        image_without_exif.save(filepath, 'JPEG', quality=85, optimize=True)
+        # Уменьшение при декодировании + перекодирование без EXIF
+        from services.images import make_thumbnail, save_clean
+
+        file.stream.seek(0)
+        img = make_thumbnail(file.stream, (400, 400))
+        save_clean(img, filepath, 'JPEG', quality=85)
         
         return filename, None
         
@@ -101,13 +97,21 @@ def delete_avatar(filename):
         current_app.logger.error(f"Ошибка при удалении аватара {filename}: {e}")
 
 
+def _avatar_url_prefix():
+    """url_for('static', …) для папки аватаров — один раз за запрос"""
+    prefix = g.get('_avatar_url_prefix')
+    if prefix is None:
+        prefix = g._avatar_url_prefix = url_for('static', filename='uploads/avatars/')
+    return prefix
+
+
 def get_avatar_url(user):
-    """Возвращает URL аватара пользователя"""
-    if user.avatar and user.avatar != 'default_avatar.png':
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], user.avatar)
-        if os.path.exists(filepath):
-            return url_for('static', filename=f'uploads/avatars/{user.avatar}')
-    
+    """Возвращает URL аватара пользователя (без обращения к диску — см. services/avatars.py)"""
+    from services.avatars import has_custom_avatar
+
+    if has_custom_avatar(user, current_app.config['UPLOAD_FOLDER']):
+        return _avatar_url_prefix() + quote(user.avatar)
+
     return "data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 100 100'%3E%3Crect width='100' height='100' fill='%233b82f6'/%3E%3Ctext x='50' y='50' font-size='40' fill='white' text-anchor='middle' dy='.3em'%3E" + user.username[0].upper() + "%3C/text%3E%3C/svg%3E"
 
 
@@ -0,0 +1,105 @@
+"""
+wsgi.py — production entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+С preload_app=True модуль импортируется один раз в master-процессе:
+  1. app создаётся (app.py уже делает create_app при импорте)
+  2. warmup(): снимки холодного старта и индекс трендов — только данные;
+     энкодер до fork не загружается (пулы потоков torch/OpenMP не
+     переживают fork)
+  3. соединения БД закрываются — сокеты не должны переживать fork
+  4. gc.freeze(): всё созданное выше уходит в permanent generation,
+     GC воркеров не обходит эти объекты и не пачкает их страницы →
+     кеши остаются общими (copy-on-write) для всех воркеров
+
+После fork каждый воркер вызывает warmup_worker() (gunicorn.conf.py,
+post_worker_init): свежие посты/доски уходят в очередь его фонового
+энкодера, воркер сразу начинает принимать запросы. Модель энкодера у
+каждого воркера своя (общая на хост — только sidecar, см. README).
+
+RECO_PRELOAD=0 — пропустить прогрев (удобно для сравнения памяти в
+стартовом отчёте).
+"""
+import gc
+import logging
+import os
+import resource
+
+logger = logging.getLogger('gunicorn.error')
+
+
+def memory_snapshot() -> dict:
+    """
+    Память текущего процесса, MB:
+      rss     — резидентная (общие страницы считаются в каждом процессе)
+      pss     — пропорциональная доля (общие страницы делятся на N процессов)
+      shared  — страницы, общие с другими процессами (после fork — с master)
+      private — собственные страницы процесса
+    На не-Linux доступен только пиковый rss.
+    """
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1]) / 1024.0
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {'rss': round(peak / 1024.0, 1)}
+
+    shared  = fields.get('Shared_Clean', 0.0) + fields.get('Shared_Dirty', 0.0)
+    private = fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0)
+    return {
+        'rss':     round(fields.get('Rss', 0.0), 1),
+        'pss':     round(fields.get('Pss', 0.0), 1),
+        'shared':  round(shared, 1),
+        'private': round(private, 1),
+    }
+
+
+def format_memory(snap: dict) -> str:
+    return ' '.join(f'{k}={v}MB' for k, v in snap.items())
+
+
+def warmup_worker() -> None:
+    """Прогрев векторов в воркере после fork (не блокирует)."""
+    if os.environ.get('RECO_PRELOAD', '1') == '0':
+        return
+    from services.recommendation_engine import warmup_vectors
+
+    with application.app_context():
+        try:
+            queued = warmup_vectors()
+            logger.info(f"[wsgi] worker {os.getpid()}: {queued} objects queued for encoding")
+        except Exception as exc:
+            logger.warning(f"[wsgi] worker warmup failed: {exc}")
+        finally:
+            db.session.remove()
+
+
+_before = memory_snapshot()
+
+from app import app as application   # noqa: E402  (create_app выполняется один раз)
+from models import db                # noqa: E402
+
+if os.environ.get('RECO_PRELOAD', '1') != '0':
+    from services.recommendation_engine import warmup
+
+    with application.app_context():
+        try:
+            stats = warmup()
+            logger.info(f"[wsgi] warmup: {stats}")
+        except Exception as exc:
+            # Без прогрева приложение работает — воркеры догрузят всё лениво
+            logger.warning(f"[wsgi] warmup failed: {exc}")
+        finally:
+            db.session.remove()
+            db.engine.dispose()
+
+    gc.collect()
+    gc.freeze()
+
+logger.info(f"[wsgi] master memory before preload: {format_memory(_before)}")
+logger.info(f"[wsgi] master memory after preload:  {format_memory(memory_snapshot())}")